@@ -0,0 +1,151 @@
+"""
+本地复权模块
+
+K线只以不复权形式保存一份，另存一张紧凑的复权因子表(除权日, 价格乘数)。
+前复权、后复权序列在本地由累积因子向量化相乘得到，并按复权方式缓存，切换方式不产生网络请求。
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .fundamentals import CACHE_DIR, DATE_KEY
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+ADJUST_NONE = 'none'
+ADJUST_FORWARD = 'forward'  # 前复权：最新价格不变，调整历史价格
+ADJUST_BACKWARD = 'backward'  # 后复权：上市初价格不变，调整之后的价格
+ADJUST_MODES = (ADJUST_NONE, ADJUST_FORWARD, ADJUST_BACKWARD)
+PRICE_COLUMNS = ('open', 'close', 'high', 'low')
+PRICE_TICK = 0.01  # 复权价格的最小变动单位，推算因子时用于区分舍入误差和除权
+FACTORS_FILE = os.path.join(CACHE_DIR, 'factors.json')
+ADJUSTED_ENTRIES = 64  # 缓存的复权序列数量
+
+Factors = List[Tuple[str, float]]
+
+
+def derive_factors(raw: pd.Series, adjusted: pd.Series) -> Factors:
+    """由同一时段的不复权和前复权收盘价推算复权因子表
+
+    前复权价 = 不复权价 × 之后所有除权日乘数之积，相邻两日比值的变化超过价格舍入误差处即为除权日，
+    该日的乘数为前后两段比值(取中位数以消除舍入误差)之比。
+    """
+    both = pd.concat({'raw': raw, 'adjusted': adjusted}, axis=1, join='inner').dropna()
+    both = both[both['raw'] > 0]
+    if both.empty:
+        return []
+    ratio = both['adjusted'] / both['raw']
+    tolerance = PRICE_TICK / both['raw'] + PRICE_TICK / both['raw'].shift()
+    segments = (ratio.diff().abs() > tolerance).cumsum()
+    medians = ratio.groupby(segments).median()
+    starts = ratio.index.to_series().groupby(segments).first()
+    return [(starts[k].strftime('%Y-%m-%d'), round(float(medians[k - 1] / medians[k]), 6))
+            for k in medians.index[1:]]
+
+
+def adjust_factors(dates: np.ndarray, factors: Factors, mode: str) -> np.ndarray:
+    """各日期的价格乘数
+
+    前复权乘以该日之后所有除权日乘数之积，后复权除以该日及之前所有除权日乘数之积。
+    """
+    if mode not in ADJUST_MODES:
+        raise ValueError(f"未知的复权方式: {mode}")
+    if mode == ADJUST_NONE or not factors:
+        return np.ones(len(dates))
+    ex_dates = np.array([day for day, _ in factors], dtype='datetime64[D]')
+    cumulative = np.concatenate([[1.0], np.cumprod([ratio for _, ratio in factors])])
+    happened = np.searchsorted(ex_dates, dates.astype('datetime64[D]'), side='right')
+    if mode == ADJUST_FORWARD:
+        return cumulative[-1] / cumulative[happened]
+    return 1 / cumulative[happened]
+
+
+def adjust(df: pd.DataFrame, factors: Factors, mode: str) -> pd.DataFrame:
+    """返回复权后的K线，成交量不变"""
+    if df.empty or mode == ADJUST_NONE or not factors:
+        return df
+    multiplier = adjust_factors(df.index.values, factors, mode)
+    columns = [column for column in PRICE_COLUMNS if column in df.columns]
+    result = df.copy()
+    result[columns] = df[columns].to_numpy() * multiplier[:, None]
+    return result
+
+
+class Adjuster:
+    """按股票保存复权因子表(每个自然日最多获取一次)，按复权方式缓存复权后的K线"""
+
+    def __init__(self, provider=None, path: Optional[str] = FACTORS_FILE):
+        self.provider = provider
+        self.path = path
+        self._lock = threading.Lock()
+        self._factors: Dict[str, Dict] = {}
+        self._adjusted: 'OrderedDict[Hashable, pd.DataFrame]' = OrderedDict()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._factors = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("读取复权因子缓存失败: %s", e)
+
+    def factors(self, code: str, raw: Optional[pd.DataFrame] = None) -> Factors:
+        """一只股票的复权因子表，当日未获取过时向数据源获取(由已有的不复权日K线 raw 推算)，失败时沿用旧表"""
+        today = date.today().isoformat()
+        with self._lock:
+            entry = self._factors.get(code)
+        if (entry is None or entry.get(DATE_KEY) != today) and self.provider is not None:
+            try:
+                fetched = [tuple(item) for item in self.provider.factors(code, raw)]
+            except Exception as e:
+                logger.warning("获取%s的复权因子失败: %s", code, e)
+            else:
+                entry = {DATE_KEY: today, 'factors': fetched}
+                with self._lock:
+                    self._factors[code] = entry
+                self.save()
+        return [tuple(item) for item in entry['factors']] if entry else []
+
+    def set_factors(self, code: str, factors: Factors):
+        """直接设置复权因子表(离线数据)"""
+        with self._lock:
+            self._factors[code] = {DATE_KEY: date.today().isoformat(), 'factors': list(factors)}
+
+    def adjusted(self, code: str, df: pd.DataFrame, mode: str) -> pd.DataFrame:
+        """复权后的K线(df 为不复权日K线，也用于推算复权因子)，相同数据和方式只计算一次"""
+        if df.empty or mode == ADJUST_NONE:
+            return df
+        key = (code, mode, len(df), df.index[0], df.index[-1], float(df['close'].iloc[-1]))
+        with self._lock:
+            cached = self._adjusted.get(key)
+            if cached is not None:
+                self._adjusted.move_to_end(key)
+        registry.hit('adjusted_bars', cached is not None)
+        if cached is not None:
+            return cached
+        result = adjust(df, self.factors(code, df), mode)
+        with self._lock:
+            self._adjusted[key] = result
+            while len(self._adjusted) > ADJUSTED_ENTRIES:
+                self._adjusted.popitem(last=False)
+        return result
+
+    def save(self):
+        """将复权因子表写入文件"""
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self._factors, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(f"{self.path}.tmp", self.path)
+        except OSError as e:
+            logger.warning("写入复权因子缓存失败: %s", e)
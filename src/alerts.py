@@ -0,0 +1,233 @@
+"""
+预警规则引擎
+
+将大量用户规则(价格穿越、涨跌幅、放量、跳空、盘口价差和委比、指标穿越)按字段和比较方式编译成数组，
+每次刷新对整个行情快照做一次向量化计算，并对触发结果去重和冷却。
+"""
+import csv
+import json
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .metrics import registry
+from .orderbook import METRICS, OrderBook, depth_from_quotes, depth_metrics
+
+DEFAULT_COOLDOWN = 300.0  # 同一条规则两次触发之间的最小间隔(秒)
+
+# 快照字段，均由行情字典计算得到，盘口字段由五档盘口计算
+DEPTH_FIELDS = ('spread', 'spread_bps', 'imbalance')
+FIELDS = ('price', 'change_pct', 'volume', 'volume_ratio', 'gap_pct') + DEPTH_FIELDS
+OPERATORS = ('>', '<', 'cross_above', 'cross_below')
+
+
+class Rule(NamedTuple):
+    """一条预警规则
+
+    threshold 为数值，或指标名(如 ma20)表示与该指标比较。
+    """
+    code: str
+    field: str
+    op: str
+    threshold: Union[float, str]
+    cooldown: Optional[float] = None
+    name: str = ''
+
+
+class Alert(NamedTuple):
+    """一次触发的预警"""
+    rule: Rule
+    value: float
+    reference: float
+
+    def message(self) -> str:
+        rule = self.rule
+        label = rule.name or f"{rule.field} {rule.op} {rule.threshold}"
+        return f"{rule.code} {label}: {self.value:.2f} (阈值 {self.reference:.2f})"
+
+
+def load_rules(path: str) -> List[Rule]:
+    """从JSON(规则对象列表)或CSV(表头为Rule字段名)加载规则"""
+    if path.endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    rules = []
+    for row in rows:
+        threshold = row['threshold']
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            pass
+        cooldown = row.get('cooldown')
+        rules.append(Rule(row['code'], row['field'], row['op'], threshold,
+                          float(cooldown) if cooldown not in (None, '') else None,
+                          row.get('name') or ''))
+    return rules
+
+
+def change_rules(codes: Iterable[str], percent: float = 1.0) -> List[Rule]:
+    """涨跌幅超过 percent% 的默认规则"""
+    rules = []
+    for code in codes:
+        rules.append(Rule(code, 'change_pct', '>', percent, name=f"涨幅超过{percent}%"))
+        rules.append(Rule(code, 'change_pct', '<', -percent, name=f"跌幅超过{percent}%"))
+    return rules
+
+
+class _RuleGroup:
+    """字段、比较方式和参照物相同的一组规则"""
+
+    def __init__(self, field: str, op: str, reference: Optional[str]):
+        self.field = field
+        self.op = op
+        self.reference = reference  # 指标名，数值阈值时为None
+        self._rule_ids: List[int] = []
+        self._symbols: List[int] = []
+        self._thresholds: List[float] = []
+        self.rule_ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.symbols: np.ndarray = np.empty(0, dtype=np.int64)
+        self.thresholds: np.ndarray = np.empty(0, dtype=np.float64)
+
+    def add(self, rule_id: int, symbol: int, threshold: float):
+        self._rule_ids.append(rule_id)
+        self._symbols.append(symbol)
+        self._thresholds.append(threshold)
+
+    def freeze(self):
+        self.rule_ids = np.asarray(self._rule_ids, dtype=np.int64)
+        self.symbols = np.asarray(self._symbols, dtype=np.int64)
+        self.thresholds = np.asarray(self._thresholds, dtype=np.float64)
+
+
+class AlertEngine:
+    """向量化预警引擎"""
+
+    def __init__(self, rules: Iterable[Rule], cooldown: float = DEFAULT_COOLDOWN):
+        self.rules = list(rules)
+        self.codes: List[str] = []
+        self._index: Dict[str, int] = {}
+        groups: Dict[Tuple[str, str, Optional[str]], _RuleGroup] = {}
+        for rule_id, rule in enumerate(self.rules):
+            if rule.field not in FIELDS:
+                raise ValueError(f"未知字段: {rule.field}")
+            if rule.op not in OPERATORS:
+                raise ValueError(f"未知比较方式: {rule.op}")
+            symbol = self._index.setdefault(rule.code, len(self.codes))
+            if symbol == len(self.codes):
+                self.codes.append(rule.code)
+            reference = rule.threshold if isinstance(rule.threshold, str) else None
+            key = (rule.field, rule.op, reference)
+            if key not in groups:
+                groups[key] = _RuleGroup(rule.field, rule.op, reference)
+            groups[key].add(rule_id, symbol, np.nan if reference else float(rule.threshold))
+        self._groups = list(groups.values())
+        self._uses_depth = any(group.field in DEPTH_FIELDS for group in self._groups)
+        for group in self._groups:
+            group.freeze()
+        self._cooldowns = np.array([cooldown if rule.cooldown is None else rule.cooldown
+                                    for rule in self.rules], dtype=np.float64)
+        self._last_fired = np.full(len(self.rules), -np.inf)
+        self._active = np.zeros(len(self.rules), dtype=bool)  # 电平规则上次是否满足
+        self._previous = np.full(len(self.rules), np.nan)  # 穿越规则上一次的差值
+
+    def snapshot(self, quotes: Dict[str, Dict], avg_volume: Optional[Dict[str, float]] = None,
+                 book: Optional[OrderBook] = None) -> Dict[str, np.ndarray]:
+        """将行情字典转换为按字段排列的数组，缺失值为NaN
+
+        盘口字段优先取自 book(已由调用方更新)，否则由行情中的五档盘口计算；没有盘口规则时不计算。
+        """
+        rows = np.full((len(self.codes), 5), np.nan)
+        avg_volume = avg_volume or {}
+        for code, quote in quotes.items():
+            symbol = self._index.get(code)
+            if symbol is None:
+                continue
+            rows[symbol] = (quote.get('price', np.nan), quote.get('prev_close', np.nan),
+                            quote.get('open', np.nan), quote.get('volume', np.nan),
+                            avg_volume.get(code, np.nan))
+        price, prev_close, open_price, volume, average = rows.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            snapshot = {
+                'price': price,
+                'change_pct': np.where(prev_close > 0, (price - prev_close) / prev_close * 100, np.nan),
+                'volume': volume,
+                'volume_ratio': np.where(average > 0, volume / average, np.nan),
+                'gap_pct': np.where(prev_close > 0, (open_price - prev_close) / prev_close * 100, np.nan),
+            }
+        if self._uses_depth:
+            snapshot.update(self._depth_snapshot(quotes, book))
+        return snapshot
+
+    def _depth_snapshot(self, quotes: Dict[str, Dict], book: Optional[OrderBook]) -> Dict[str, np.ndarray]:
+        if book is not None:
+            return {field: book.column(field, self.codes) for field in DEPTH_FIELDS}
+        books = [(self._index[code], quote) for code, quote in quotes.items()
+                 if code in self._index and (quote.get('bids') or quote.get('asks'))]
+        metrics = np.full((len(self.codes), len(METRICS)), np.nan)
+        if books:
+            symbols = np.array([symbol for symbol, _ in books], dtype=np.int64)
+            metrics[symbols] = depth_metrics(depth_from_quotes(quote for _, quote in books))
+        return {field: metrics[:, METRICS.index(field)] for field in DEPTH_FIELDS}
+
+    def _indicator(self, indicators: Dict[str, Dict[str, float]], name: str) -> np.ndarray:
+        values = indicators.get(name, {})
+        return np.array([values.get(code, np.nan) for code in self.codes], dtype=np.float64)
+
+    def evaluate(
+        self,
+        quotes: Dict[str, Dict],
+        indicators: Optional[Dict[str, Dict[str, float]]] = None,
+        avg_volume: Optional[Dict[str, float]] = None,
+        now: Optional[float] = None,
+        book: Optional[OrderBook] = None,
+    ) -> List[Alert]:
+        """对行情快照计算全部规则，返回本次新触发且不在冷却期内的预警"""
+        now = time.monotonic() if now is None else now
+        indicators = indicators or {}
+        with registry.timer('alert_eval_seconds'):
+            snapshot = self.snapshot(quotes, avg_volume, book)
+            reference_cache: Dict[str, np.ndarray] = {}
+            fired_ids, fired_values, fired_refs = [], [], []
+            for group in self._groups:
+                values = snapshot[group.field][group.symbols]
+                if group.reference is None:
+                    reference = group.thresholds
+                else:
+                    if group.reference not in reference_cache:
+                        reference_cache[group.reference] = self._indicator(indicators, group.reference)
+                    reference = reference_cache[group.reference][group.symbols]
+                with np.errstate(invalid='ignore'):
+                    if group.op in ('>', '<'):
+                        met = values > reference if group.op == '>' else values < reference
+                        # 只在条件由不满足变为满足时触发
+                        was_active = self._active[group.rule_ids]
+                        hit = met & ~was_active
+                        self._active[group.rule_ids] = np.where(np.isnan(values), was_active, met)
+                    else:
+                        diff = values - reference
+                        before = self._previous[group.rule_ids]
+                        if group.op == 'cross_above':
+                            hit = (before <= 0) & (diff > 0)
+                        else:
+                            hit = (before >= 0) & (diff < 0)
+                        # 行情缺失时保留上一次差值
+                        self._previous[group.rule_ids] = np.where(np.isnan(diff), before, diff)
+                fired_ids.append(group.rule_ids[hit])
+                fired_values.append(values[hit])
+                fired_refs.append(reference[hit])
+            if not fired_ids:
+                return []
+            ids = np.concatenate(fired_ids)
+            values = np.concatenate(fired_values)
+            refs = np.concatenate(fired_refs)
+            ready = now - self._last_fired[ids] >= self._cooldowns[ids]
+            ids, values, refs = ids[ready], values[ready], refs[ready]
+            self._last_fired[ids] = now
+        if len(ids):
+            registry.counter('alerts_fired_total', '触发的预警次数').inc(len(ids))
+        return [Alert(self.rules[rule_id], float(value), float(ref))
+                for rule_id, value, ref in zip(ids, values, refs)]
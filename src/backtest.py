@@ -0,0 +1,284 @@
+"""
+向量化回测模块
+
+把多只股票的日K线对齐成 日期×股票 的数组面板，策略信号和持仓在整块数组上计算。
+成交遵循A股规则：收盘出信号、次日开盘成交(买入当日不能卖出，即T+1)，
+开盘涨停不能买入、跌停不能卖出，停牌日不成交。参数扫描分发到进程池并行执行。
+
+    python -m src.backtest -f codes.txt -s ma_cross -P fast=5,10 -P slow=20,60 -p 8
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .log import get_logger
+from .metrics import registry
+from .providers import FileProvider, Provider, default_provider
+
+logger = get_logger(__name__)
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+DEFAULT_DAYS = 2500  # 约10年日K线
+TRADING_DAYS = 252  # 年化用的年交易日数
+COMMISSION = 0.00025  # 单边佣金
+STAMP_TAX = 0.0005  # 卖出印花税
+
+# 涨跌幅限制：科创板、创业板20%，北交所30%，其余10%
+LIMIT_PCT = 0.1
+LIMIT_PREFIXES = {'sh688': 0.2, 'sz300': 0.2, 'sz301': 0.2, 'bj': 0.3}
+
+
+class Panel(NamedTuple):
+    """对齐的多股票日K线，各字段为 日期×股票 数组，缺失(未上市、停牌)为NaN"""
+    dates: np.ndarray
+    codes: List[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+
+class BacktestResult(NamedTuple):
+    """一次回测的结果"""
+    positions: np.ndarray  # 日期×股票 的持仓(布尔)
+    returns: np.ndarray  # 组合日收益率
+    stats: Dict[str, float]
+
+
+def panel_from_frames(frames: Dict[str, pd.DataFrame]) -> Panel:
+    """把 代码 -> 日K线DataFrame 按日期并集对齐成面板"""
+    codes = [code for code, df in frames.items() if not df.empty]
+    if not codes:
+        empty = np.empty((0, 0))
+        return Panel(np.array([], dtype='datetime64[D]'), [], *([empty] * len(PANEL_FIELDS)))
+    arrays = {}
+    for field in PANEL_FIELDS:
+        aligned = pd.concat({code: frames[code][field] for code in codes}, axis=1).sort_index()
+        arrays[field] = aligned.to_numpy(dtype=np.float64)
+    dates = aligned.index.values.astype('datetime64[D]')
+    return Panel(dates, codes, **arrays)
+
+
+def load_panel(codes: Iterable[str], provider: Optional[Provider] = None,
+               days: int = DEFAULT_DAYS) -> Panel:
+    """从数据源读取多只股票的日K线并对齐，取不到数据的股票被跳过"""
+    provider = provider or default_provider()
+    frames = {}
+    for code in codes:
+        df = provider.bars(code, 'daily', days)
+        if df.empty:
+            logger.warning("没有%s的日K线，跳过", code)
+            continue
+        frames[code] = df
+    return panel_from_frames(frames)
+
+
+def limit_pct(codes: Iterable[str]) -> np.ndarray:
+    """各股票的涨跌幅限制比例"""
+    result = []
+    for code in codes:
+        pct = LIMIT_PCT
+        for prefix, value in LIMIT_PREFIXES.items():
+            if code.startswith(prefix):
+                pct = value
+                break
+        result.append(pct)
+    return np.array(result)
+
+
+def _rolling(values: np.ndarray, window: int, how: str) -> np.ndarray:
+    return getattr(pd.DataFrame(values).rolling(window, min_periods=window), how)().to_numpy()
+
+
+def _shift(values: np.ndarray, fill=np.nan) -> np.ndarray:
+    """沿日期方向后移一行"""
+    shifted = np.empty_like(values)
+    shifted[0] = fill
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def ma_cross(panel: Panel, fast: int = 5, slow: int = 20) -> np.ndarray:
+    """快速均线在慢速均线之上时持有"""
+    return _rolling(panel.close, fast, 'mean') > _rolling(panel.close, slow, 'mean')
+
+
+def breakout(panel: Panel, window: int = 20, exit_window: int = 10) -> np.ndarray:
+    """收盘创 window 日新高时买入，跌破 exit_window 日新低时卖出"""
+    close = panel.close
+    entries = close > _shift(_rolling(close, window, 'max'))
+    exits = close < _shift(_rolling(close, exit_window, 'min'))
+    state = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    return pd.DataFrame(state).ffill().fillna(0.0).to_numpy() > 0
+
+
+STRATEGIES: Dict[str, Callable[..., np.ndarray]] = {
+    'ma_cross': ma_cross,
+    'breakout': breakout,
+}
+
+
+def simulate(
+    panel: Panel,
+    target: np.ndarray,
+    commission: float = COMMISSION,
+    stamp_tax: float = STAMP_TAX,
+) -> BacktestResult:
+    """按目标持仓回测
+
+    target[t] 为第t日收盘后希望持有的股票(布尔数组)，第t+1日开盘成交。
+    每只股票分配等额资金，组合收益为各股票收益的平均。
+    """
+    close = pd.DataFrame(panel.close).ffill().to_numpy()  # 停牌期间沿用最后收盘价
+    prev_close = _shift(close)
+    limit = limit_pct(panel.codes)
+    limit_up = np.round(prev_close * (1 + limit), 2)
+    limit_down = np.round(prev_close * (1 - limit), 2)
+    tradable = np.isfinite(panel.open) & np.isfinite(prev_close)
+    with np.errstate(invalid='ignore'):
+        can_buy = tradable & (panel.open < limit_up)
+        can_sell = tradable & (panel.open > limit_down)
+    want = _shift(np.asarray(target, dtype=bool), fill=False)
+
+    # 成交受前一日持仓影响，按日推进，每步对全部股票做数组运算
+    positions = np.zeros(want.shape, dtype=bool)
+    held = np.zeros(want.shape[1], dtype=bool)
+    for t in range(len(want)):
+        held = np.where(held, want[t] | ~can_sell[t], want[t] & can_buy[t])
+        positions[t] = held
+
+    previous = _shift(positions, fill=False)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gap = np.nan_to_num(panel.open / prev_close - 1)
+        intraday = np.nan_to_num(panel.close / panel.open - 1)
+    returns = (1 + previous * gap) * (1 + positions * intraday) - 1
+    bought = positions & ~previous
+    sold = previous & ~positions
+    returns -= bought * commission + sold * (commission + stamp_tax)
+    daily = returns.mean(axis=1) if returns.shape[1] else np.zeros(len(returns))
+    stats = summarize(daily)
+    stats['trades'] = float(bought.sum() + sold.sum())
+    return BacktestResult(positions, daily, stats)
+
+
+def summarize(daily: np.ndarray) -> Dict[str, float]:
+    """由组合日收益率计算总收益、年化收益、波动率、夏普比率和最大回撤"""
+    if len(daily) == 0:
+        return {'total_return': 0.0, 'annual_return': 0.0, 'volatility': 0.0,
+                'sharpe': 0.0, 'max_drawdown': 0.0}
+    equity = np.cumprod(1 + daily)
+    std = daily.std()
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    return {
+        'total_return': float(equity[-1] - 1),
+        'annual_return': float(equity[-1] ** (TRADING_DAYS / len(daily)) - 1),
+        'volatility': float(std * np.sqrt(TRADING_DAYS)),
+        'sharpe': float(daily.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        'max_drawdown': float(drawdown.max()),
+    }
+
+
+def run(panel: Panel, strategy: str, **params) -> BacktestResult:
+    """用内置策略回测一组参数"""
+    return simulate(panel, STRATEGIES[strategy](panel, **params))
+
+
+def param_grid(grid: Dict[str, Iterable]) -> List[Dict]:
+    """参数网格的全部组合"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in product(*(list(v) for v in grid.values()))]
+
+
+_worker_panel: Optional[Panel] = None  # 进程池中每个子进程只接收一次面板
+
+
+def _init_worker(panel: Panel):
+    global _worker_panel
+    _worker_panel = panel
+
+
+def _run_params(task: Tuple[str, Dict]) -> Tuple[Dict, Dict[str, float]]:
+    strategy, params = task
+    return params, run(_worker_panel, strategy, **params).stats
+
+
+def sweep(
+    panel: Panel,
+    strategy: str,
+    grid: Dict[str, Iterable],
+    processes: Optional[int] = None,
+    sort_by: str = 'sharpe',
+) -> List[Tuple[Dict, Dict[str, float]]]:
+    """参数扫描，返回按 sort_by 降序排列的 (参数, 统计) 列表
+
+    processes 为1时在本进程执行，否则分发到进程池，面板在子进程启动时传入一次。
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知策略: {strategy}")
+    tasks = [(strategy, params) for params in param_grid(grid)]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    with registry.timer('backtest_sweep_seconds', strategy=strategy):
+        if processes <= 1:
+            _init_worker(panel)
+            results = [_run_params(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(processes, multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(panel,)) as pool:
+                chunksize = max(1, len(tasks) // (processes * 4))
+                results = list(pool.map(_run_params, tasks, chunksize=chunksize))
+    return sorted(results, key=lambda item: item[1][sort_by], reverse=True)
+
+
+def _parse_param(text: str) -> Tuple[str, List]:
+    name, _, values = text.partition('=')
+    parsed = []
+    for value in values.split(','):
+        try:
+            parsed.append(int(value))
+        except ValueError:
+            parsed.append(float(value))
+    return name.strip(), parsed
+
+
+def main():
+    """主函数"""
+    from .dashboard import read_codes
+
+    parser = argparse.ArgumentParser(description="多股票向量化回测")
+    parser.add_argument("-c", "--codes", help="股票代码列表,使用逗号分隔", type=str)
+    parser.add_argument("-f", "--file", help="股票代码文件,每行一个代码", type=str)
+    parser.add_argument("-s", "--strategy", help="策略名称", choices=sorted(STRATEGIES), default='ma_cross')
+    parser.add_argument("-P", "--param", help="策略参数及取值,如 fast=5,10,20,可重复", action='append',
+                        default=[])
+    parser.add_argument("-n", "--days", help="回测的日K线数量", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("-d", "--data-dir", help="本地K线目录,默认从网络获取", type=str)
+    parser.add_argument("-p", "--processes", help="参数扫描的进程数", type=int, default=None)
+    parser.add_argument("--top", help="显示排名前N的参数组合", type=int, default=10)
+    args = parser.parse_args()
+    codes = read_codes(args.codes, args.file)
+    if args.data_dir and not codes:
+        codes = FileProvider(args.data_dir).codes()
+    if not codes:
+        parser.error("请通过 -c 或 -f 指定股票代码")
+
+    provider = FileProvider(args.data_dir) if args.data_dir else None
+    panel = load_panel(codes, provider, args.days)
+    grid = dict(_parse_param(text) for text in args.param)
+    results = sweep(panel, args.strategy, grid, args.processes)
+    print(f"{len(panel.codes)}只股票, {len(panel.dates)}个交易日, {len(results)}组参数")
+    print(f"{'参数':<30}{'总收益':>10}{'年化':>10}{'夏普':>8}{'最大回撤':>10}{'交易次数':>10}")
+    for params, stats in results[:args.top]:
+        label = ' '.join(f"{k}={v}" for k, v in params.items()) or '(默认)'
+        print(f"{label:<30}{stats['total_return']:>10.2%}{stats['annual_return']:>10.2%}"
+              f"{stats['sharpe']:>8.2f}{stats['max_drawdown']:>10.2%}{stats['trades']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
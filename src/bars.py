@@ -0,0 +1,174 @@
+"""
+多周期K线金字塔模块
+
+以持有的最细粒度K线为基础，在本地聚合出5分钟、15分钟、30分钟、60分钟、
+日、周、月各级K线，所有周期只需一次下载。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .metrics import registry
+
+# 金字塔层级，由细到粗
+INTRADAY_LEVELS: Dict[str, int] = {'5m': 5, '15m': 15, '30m': 30, '60m': 60}
+PERIOD_LEVELS: Dict[str, str] = {'weekly': 'W', 'monthly': 'M'}
+LEVELS: List[str] = list(INTRADAY_LEVELS) + ['daily'] + list(PERIOD_LEVELS)
+
+# 聚合规则
+OHLCV_AGG = {
+    'open': 'first',
+    'close': 'last',
+    'high': 'max',
+    'low': 'min',
+    'volume': 'sum',
+    'amount': 'sum',
+}
+
+# A股交易时段(自零点起的分钟数)
+MORNING_OPEN = 9 * 60 + 30
+MORNING_CLOSE = 11 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+SESSION_MINUTES = MORNING_CLOSE - MORNING_OPEN  # 上午交易分钟数
+
+
+def parse_klines(klines: List[str]) -> pd.DataFrame:
+    """将东方财富K线字符串列表解析为DataFrame(日期作为索引)"""
+    rows = [line.split(',') for line in klines]
+    rows = [parts for parts in rows if len(parts) >= 6]
+    if not rows:
+        return pd.DataFrame()
+
+    width = min(len(parts) for parts in rows)
+    columns = ['date', 'open', 'close', 'high', 'low', 'volume', 'amount'][:min(width, 7)]
+    raw = pd.DataFrame([parts[:len(columns)] for parts in rows], columns=columns)
+
+    df = raw[columns[1:]].astype(float)
+    df.index = pd.DatetimeIndex(pd.to_datetime(raw['date']), name='date')
+    return df
+
+
+def _aggregate(df: pd.DataFrame, keys, labels: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """按分组键向量化聚合OHLCV数据"""
+    agg = {col: func for col, func in OHLCV_AGG.items() if col in df.columns}
+    grouped = df.groupby(keys, sort=True)
+    out = grouped.agg(agg)
+    if labels is None:
+        # 以组内最后一个交易时间作为标签
+        labels = df.index.to_series().groupby(keys, sort=True).max().values
+    out.index = pd.DatetimeIndex(labels, name='date')
+    return out[[col for col in df.columns if col in agg]]
+
+
+def _intraday_labels(index: pd.DatetimeIndex, minutes: int) -> pd.DatetimeIndex:
+    """计算分钟K线所属的聚合区间结束时间(按交易时段对齐，如60分钟为10:30/11:30/14:00/15:00)"""
+    clock = index.hour * 60 + index.minute
+    # 以K线结束时间换算为当日已交易分钟数
+    traded = np.where(
+        clock <= MORNING_CLOSE,
+        clock - MORNING_OPEN,
+        clock - AFTERNOON_OPEN + SESSION_MINUTES,
+    )
+    bucket = np.maximum(np.ceil(np.asarray(traded, dtype=float) / minutes), 1)
+    end = bucket * minutes
+    end_clock = np.where(
+        end <= SESSION_MINUTES,
+        MORNING_OPEN + end,
+        AFTERNOON_OPEN + end - SESSION_MINUTES,
+    )
+    return index.normalize() + pd.to_timedelta(end_clock, unit='min')
+
+
+class BarPyramid:
+    """单只股票的多周期K线金字塔"""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.resolution: Optional[int] = None  # 分钟K线基础粒度
+        self._intraday = pd.DataFrame()
+        self._daily = pd.DataFrame()
+        self._levels: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def empty(self) -> bool:
+        """是否没有任何K线数据"""
+        return self._intraday.empty and self._daily.empty
+
+    def load(
+        self,
+        daily: Optional[pd.DataFrame] = None,
+        intraday: Optional[pd.DataFrame] = None,
+        resolution: int = 5,
+    ):
+        """装载基础数据，清空已聚合的各级缓存"""
+        if daily is not None:
+            self._daily = daily.sort_index()
+        if intraday is not None:
+            self._intraday = intraday.sort_index()
+            self.resolution = resolution
+        self._levels.clear()
+
+    def level(self, name: str) -> pd.DataFrame:
+        """获取某一级别的K线数据"""
+        if name not in LEVELS:
+            raise ValueError(f"不支持的K线级别: {name}")
+        registry.hit('pyramid_level', name in self._levels)
+        if name not in self._levels:
+            self._levels[name] = self._build(name)
+        return self._levels[name]
+
+    def window(
+        self, name: str, start: Optional[datetime] = None, bars: Optional[int] = None
+    ) -> pd.DataFrame:
+        """获取某一级别从start开始、或最近bars根的K线数据"""
+        df = self.level(name)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if bars is not None:
+            df = df.tail(bars)
+        return df
+
+    def last_session(self, name: str) -> pd.DataFrame:
+        """获取分钟级别最近一个交易日的K线数据"""
+        df = self.level(name)
+        if df.empty:
+            return df
+        return df[df.index.normalize() == df.index[-1].normalize()]
+
+    def _build(self, name: str) -> pd.DataFrame:
+        """从下一级数据完整聚合出某一级别"""
+        if name in INTRADAY_LEVELS:
+            return self._build_intraday(self._intraday, name)
+        if name == 'daily':
+            return self._build_daily()
+        return self._build_period(self.level('daily'), name)
+
+    def _build_intraday(self, source: pd.DataFrame, name: str) -> pd.DataFrame:
+        minutes = INTRADAY_LEVELS[name]
+        if source.empty or self.resolution is None or minutes < self.resolution:
+            return pd.DataFrame()
+        if minutes == self.resolution:
+            return source
+        labels = _intraday_labels(source.index, minutes)
+        return _aggregate(source, labels, labels.unique())
+
+    def _build_daily(self) -> pd.DataFrame:
+        if self._intraday.empty:
+            return self._daily
+        days = self._intraday.index.normalize()
+        derived = _aggregate(self._intraday, days, days.unique())
+        if self._daily.empty:
+            return derived
+        # 分钟数据覆盖日K中最新(可能未收盘)及之后的交易日
+        newer = derived[derived.index >= self._daily.index[-1]]
+        older = self._daily[~self._daily.index.isin(newer.index)]
+        return pd.concat([older, newer[older.columns.intersection(newer.columns)]]).sort_index()
+
+    @staticmethod
+    def _build_period(source: pd.DataFrame, name: str) -> pd.DataFrame:
+        if source.empty:
+            return pd.DataFrame()
+        periods = source.index.to_period(PERIOD_LEVELS[name])
+        return _aggregate(source, periods)
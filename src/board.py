@@ -0,0 +1,262 @@
+"""
+共享内存行情看板
+
+发布进程把每只股票的最新行情写入 multiprocessing.shared_memory 中的定长记录表，
+每条记录带顺序锁版本号(写入前后各加一，奇数表示正在写入)；
+同机的其他进程以只读方式挂载，直接读共享内存，不加锁、不经过进程间通信。
+
+启动发布进程:
+    python -m src.board -c sh600000,sz000001 [-f codes.txt] [-i 1.0] [-p 4]
+"""
+import argparse
+import atexit
+import signal
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .log import get_logger
+from .quotes import DEPTH_LEVELS, format_sina, request_codes
+
+logger = get_logger(__name__)
+
+BOARD_NAME = 'stock_quote_board'
+BOARD_CAPACITY = 8192  # 最多容纳的股票数量
+BOARD_MAGIC = 0x424B5453  # "STKB"
+READ_RETRIES = 100  # 读到正在写入的记录时的最大重试次数
+QUOTE_HOST = 'hq.sinajs.cn'
+VALUE_FIELDS = ('open', 'prev_close', 'price', 'high', 'low', 'bid', 'ask', 'volume', 'amount')
+
+_created = set()  # 本进程创建的看板，资源跟踪器中只登记一次
+
+HEADER_DTYPE = np.dtype([('magic', '<u4'), ('capacity', '<u4'), ('count', '<u4'), ('reserved', '<u4')])
+SLOT_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('values', '<f8', (len(VALUE_FIELDS),)),
+    ('bids', '<f8', (DEPTH_LEVELS, 2)),
+    ('asks', '<f8', (DEPTH_LEVELS, 2)),
+    ('code', 'S12'),
+    ('name', 'S36'),
+    ('date', 'S10'),
+    ('time', 'S8'),
+], align=True)
+
+
+class BoardResponse:
+    """从看板生成的新浪格式响应，可替代 requests.Response 的常用属性"""
+
+    status_code = 200
+
+    def __init__(self, text: str):
+        self.text = text
+        self.encoding = 'gbk'
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode('gbk', errors='replace')
+
+    def raise_for_status(self):
+        pass
+
+
+class QuoteBoard:
+    """共享内存行情表，发布进程可写，其他进程只读"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, writable: bool):
+        self._shm = shm
+        self.writable = writable
+        self._header = np.ndarray((1,), HEADER_DTYPE, buffer=shm.buf)
+        if self._header['magic'][0] != BOARD_MAGIC:
+            raise ValueError(f"共享内存 {shm.name} 不是行情看板")
+        self.capacity = int(self._header['capacity'][0])
+        self.slots = np.ndarray((self.capacity,), SLOT_DTYPE, buffer=shm.buf,
+                                offset=HEADER_DTYPE.itemsize)
+        self._seq = self.slots['seq']
+        if not writable:
+            self.slots.flags.writeable = False
+        self._index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: str = BOARD_NAME, capacity: int = BOARD_CAPACITY) -> 'QuoteBoard':
+        """创建看板；同名看板已存在时复用，已挂载的读取方不受影响"""
+        try:
+            shm = shared_memory.SharedMemory(
+                name, create=True, size=HEADER_DTYPE.itemsize + SLOT_DTYPE.itemsize * capacity)
+        except FileExistsError:
+            return cls(shared_memory.SharedMemory(name), writable=True)
+        _created.add(shm._name)
+        header = np.ndarray((1,), HEADER_DTYPE, buffer=shm.buf)
+        header['capacity'] = capacity
+        header['count'] = 0
+        header['magic'] = BOARD_MAGIC
+        return cls(shm, writable=True)
+
+    @classmethod
+    def attach(cls, name: str = BOARD_NAME) -> 'QuoteBoard':
+        """以只读方式挂载已有看板，看板不存在时抛出 FileNotFoundError"""
+        shm = shared_memory.SharedMemory(name)
+        # 读取方退出时不能由资源跟踪器删除发布方的共享内存
+        if shm._name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, writable=False)
+
+    @property
+    def count(self) -> int:
+        """已登记的股票数量"""
+        return int(self._header['count'][0])
+
+    def codes(self) -> List[str]:
+        """已登记的股票代码"""
+        return [code.decode('ascii') for code in self.slots['code'][:self.count]]
+
+    def _slot(self, code: str, register: bool = False) -> Optional[int]:
+        slot = self._index.get(code)
+        if slot is not None:
+            return slot
+        with self._lock:
+            count = self.count
+            for i in range(len(self._index), count):
+                self._index[self.slots['code'][i].decode('ascii')] = i
+            slot = self._index.get(code)
+            if slot is None and register:
+                if count >= self.capacity:
+                    raise ValueError(f"行情看板已满({self.capacity})")
+                slot = count
+                self.slots['code'][slot] = code.encode('ascii')
+                self._index[code] = slot
+                self._header['count'] = count + 1
+        return slot
+
+    def publish(self, quotes: Dict[str, Dict]) -> int:
+        """写入一批行情，返回写入的条数"""
+        if not self.writable:
+            raise PermissionError("只读挂载的看板不能写入")
+        slots = self.slots
+        for code, quote in quotes.items():
+            slot = self._slot(code, register=True)
+            self._seq[slot] += 1  # 奇数: 写入中
+            slots['values'][slot] = [quote.get(field, np.nan) for field in VALUE_FIELDS]
+            slots['bids'][slot] = quote.get('bids') or 0.0
+            slots['asks'][slot] = quote.get('asks') or 0.0
+            slots['name'][slot] = quote.get('name', '').encode('utf-8')[:36]
+            slots['date'][slot] = quote.get('date', '').encode('ascii')[:10]
+            slots['time'][slot] = quote.get('time', '').encode('ascii')[:8]
+            self._seq[slot] += 1
+        return len(quotes)
+
+    def read(self, code: str) -> Optional[Dict]:
+        """读取一只股票的最新行情，未登记或持续被写入时返回None"""
+        slot = self._slot(code)
+        if slot is None:
+            return None
+        for _ in range(READ_RETRIES):
+            before = int(self._seq[slot])
+            if before == 0:
+                return None
+            if before & 1:
+                continue
+            record = self.slots[slot].copy()
+            if int(self._seq[slot]) == before:
+                return _record_to_quote(code, record)
+        return None
+
+    def read_many(self, codes: Iterable[str]) -> Dict[str, Dict]:
+        """读取多只股票的最新行情"""
+        quotes = {}
+        for code in codes:
+            quote = self.read(code)
+            if quote is not None:
+                quotes[code] = quote
+        return quotes
+
+    def values(self) -> np.ndarray:
+        """全部记录数值列的只读视图(不复制)，列顺序见 VALUE_FIELDS，不保证单条记录一致"""
+        view = self.slots['values'][:self.count]
+        view.flags.writeable = False
+        return view
+
+    def response(self, url: str) -> BoardResponse:
+        """按新浪行情接口地址(…/list=代码,…)生成响应文本"""
+        codes = request_codes(url)
+        quotes = self.read_many(code[2:] if code.startswith('s_') else code for code in codes)
+        return BoardResponse(format_sina(codes, quotes))
+
+    def close(self):
+        self.slots = self._seq = self._header = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+def _record_to_quote(code: str, record) -> Dict:
+    quote: Dict = {'code': code, 'name': record['name'].decode('utf-8', errors='ignore')}
+    quote.update(zip(VALUE_FIELDS, record['values'].tolist()))
+    quote['bids'] = [tuple(level) for level in record['bids'].tolist()]
+    quote['asks'] = [tuple(level) for level in record['asks'].tolist()]
+    quote['date'] = record['date'].decode('ascii')
+    quote['time'] = record['time'].decode('ascii')
+    prev_close = quote['prev_close']
+    quote['change'] = round(quote['price'] - prev_close, 3) if prev_close else 0.0
+    quote['change_pct'] = round(quote['change'] / prev_close * 100, 2) if prev_close else 0.0
+    return quote
+
+
+def use_board(name: str = BOARD_NAME) -> QuoteBoard:
+    """挂载看板，并让本进程发往新浪行情接口的请求改从看板读取"""
+    from . import fetch
+
+    board = QuoteBoard.attach(name)
+    fetch.serve_locally(QUOTE_HOST, board.response)
+    logger.info("行情改从共享内存看板 %s 读取(%d只股票)", name, board.count)
+    return board
+
+
+def run_publisher(codes: List[str], interval: float, processes: int = 0, name: str = BOARD_NAME,
+                  market_hours: bool = False):
+    """运行发布进程，直到收到 SIGTERM 或 Ctrl+C，market_hours 为True时休市期间暂停轮询"""
+    from .dashboard import QuotePoller
+
+    board = QuoteBoard.create(name, max(BOARD_CAPACITY, len(codes)))
+    atexit.register(board.unlink)
+    if processes > 1:
+        from .sharding import ShardedPoller
+        poller = ShardedPoller(codes, board.publish, interval, processes, market_hours=market_hours)
+    else:
+        poller = QuotePoller(codes, board.publish, interval, market_hours=market_hours)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    poller.start()
+    logger.info("行情看板 %s 已启动，发布%d只股票", name, len(codes))
+    try:
+        while not stopped.is_set() and poller.is_alive():
+            stopped.wait(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.stop()
+
+
+def main():
+    """主函数"""
+    from .dashboard import read_codes
+
+    parser = argparse.ArgumentParser(description="共享内存行情看板发布进程")
+    parser.add_argument("-c", "--codes", help="股票代码列表,使用逗号分隔", type=str)
+    parser.add_argument("-f", "--file", help="股票代码文件,每行一个代码", type=str)
+    parser.add_argument("-i", "--interval", help="刷新间隔(秒)", type=float, default=1.0)
+    parser.add_argument("-p", "--processes", help="分片轮询的进程数,大于1时启用", type=int, default=0)
+    parser.add_argument("-n", "--name", help="共享内存名称", default=BOARD_NAME)
+    parser.add_argument("-m", "--market-hours", help="只在交易时段轮询", action='store_true')
+    args = parser.parse_args()
+    codes = read_codes(args.codes, args.file)
+    if not codes:
+        parser.error("请通过 -c 或 -f 指定股票代码")
+    run_publisher(codes, args.interval, args.processes, args.name, args.market_hours)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+实时行情看板
+
+全屏显示数百只股票的最新价、涨跌、成交量、成交额、买卖一价以及五档盘口的价差和委比。
+刷新由行情轮询线程驱动，每次只重绘数值发生变化的单元格。
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rich.console import Console
+from rich.control import Control
+from rich.text import Text
+
+from .log import get_logger
+from .orderbook import OrderBook
+from .quotes import fetch_quotes
+from .trading_calendar import poll_interval
+
+logger = get_logger(__name__)
+
+# (字段, 表头, 宽度)
+COLUMNS: List[Tuple[str, str, int]] = [
+    ('code', '代码', 9),
+    ('name', '名称', 10),
+    ('price', '最新价', 9),
+    ('change_pct', '涨跌幅', 8),
+    ('change', '涨跌额', 8),
+    ('volume', '成交量(手)', 12),
+    ('amount', '成交额(万)', 12),
+    ('bid', '买一', 9),
+    ('ask', '卖一', 9),
+    ('spread', '价差', 7),
+    ('imbalance', '委比', 8),
+]
+COLUMN_GAP = 1
+HEADER_ROWS = 2  # 状态行 + 表头行
+REFRESH_INTERVAL = 1.0  # 默认刷新间隔(秒)
+
+Cell = Tuple[str, str]  # (文本, 样式)
+
+
+class Dashboard:
+    """按单元格差量重绘的行情看板"""
+
+    def __init__(self, codes: List[str], console: Optional[Console] = None):
+        self.codes = list(codes)
+        self.console = console or Console(highlight=False)
+        self.rows = {code: i for i, code in enumerate(self.codes)}
+        self.book = OrderBook(self.codes)
+        self._cells: Dict[Tuple[int, int], Cell] = {}
+        self._offsets = []
+        offset = 0
+        for _, _, width in COLUMNS:
+            self._offsets.append(offset)
+            offset += width + COLUMN_GAP
+        self.updates = 0
+
+    @property
+    def visible_rows(self) -> int:
+        """终端可显示的股票行数"""
+        return max(0, self.console.size.height - HEADER_ROWS)
+
+    def start(self):
+        """进入全屏模式并绘制表头和代码列"""
+        self.console.set_alt_screen(True)
+        self.console.show_cursor(False)
+        self.console.clear()
+        self._cells.clear()
+        with self.console:
+            for col, (_, title, width) in enumerate(COLUMNS):
+                self._write(1, col, (title, 'bold cyan'))
+            for code, row in self.rows.items():
+                if row < self.visible_rows:
+                    self._paint(row, 0, (code, ''))
+            self._status(0)
+
+    def stop(self):
+        """退出全屏模式"""
+        self.console.show_cursor(True)
+        self.console.set_alt_screen(False)
+
+    def update(self, quotes: Dict[str, Dict]) -> int:
+        """应用一批行情，仅重绘变化的单元格，返回重绘的单元格数"""
+        painted = 0
+        limit = self.visible_rows
+        self.book.update(quotes)
+        with self.console:
+            for code, quote in quotes.items():
+                row = self.rows.get(code)
+                if row is None or row >= limit:
+                    continue
+                quote = dict(quote, **self.book.metrics_for(code))
+                for col, cell in enumerate(format_quote(quote)):
+                    painted += self._paint(row, col, cell)
+            self.updates += 1
+            self._status(painted)
+        return painted
+
+    def _paint(self, row: int, col: int, cell: Cell) -> int:
+        if self._cells.get((row, col)) == cell:
+            return 0
+        self._cells[(row, col)] = cell
+        self._write(row + HEADER_ROWS, col, cell)
+        return 1
+
+    def _write(self, y: int, col: int, cell: Cell):
+        text, style = cell
+        width = COLUMNS[col][2]
+        rendered = Text(text, style=style, no_wrap=True)
+        rendered.truncate(width, overflow='ellipsis', pad=True)
+        self.console.control(Control.move_to(self._offsets[col], y))
+        self.console.print(rendered, end='', soft_wrap=True)
+
+    def _status(self, painted: int):
+        status = (f"{datetime.now().strftime('%H:%M:%S')}  共{len(self.codes)}只  "
+                  f"第{self.updates}次刷新  重绘{painted}格  按Ctrl+C退出")
+        rendered = Text(status, style='dim', no_wrap=True)
+        rendered.truncate(self.console.width, pad=True)
+        self.console.control(Control.move_to(0, 0))
+        self.console.print(rendered, end='', soft_wrap=True)
+
+
+def format_quote(quote: Dict) -> List[Cell]:
+    """将行情格式化为一行单元格"""
+    change = quote.get('change', 0.0)
+    color = 'red' if change > 0 else ('green' if change < 0 else '')
+    cells: List[Cell] = []
+    for field, _, width in COLUMNS:
+        value = quote.get(field)
+        if field in ('code', 'name'):
+            cells.append((str(value or ''), ''))
+        elif value is None or value != value:
+            # 没有盘口或单边无挂单
+            cells.append(('--'.rjust(width), 'dim'))
+        elif field == 'imbalance':
+            style = 'red' if value > 0 else ('green' if value < 0 else '')
+            cells.append((f"{value * 100:+.1f}%".rjust(width), style))
+        elif field == 'change_pct':
+            cells.append((f"{value:+.2f}%".rjust(width), color))
+        elif field == 'change':
+            cells.append((f"{value:+.2f}".rjust(width), color))
+        elif field == 'volume':
+            cells.append((f"{value / 100:.0f}".rjust(width), ''))
+        elif field == 'amount':
+            cells.append((f"{value / 10000:.2f}".rjust(width), ''))
+        elif field == 'price':
+            cells.append((f"{value:.2f}".rjust(width), color))
+        else:
+            cells.append((f"{value:.2f}".rjust(width), ''))
+    return cells
+
+
+class QuotePoller(threading.Thread):
+    """按固定间隔批量拉取行情，只把发生变化的行情交给回调"""
+
+    def __init__(
+        self,
+        codes: List[str],
+        on_update: Callable[[Dict[str, Dict]], None],
+        interval: float = REFRESH_INTERVAL,
+        fetcher: Callable[[List[str]], Dict[str, Dict]] = fetch_quotes,
+        market_hours: bool = False,
+    ):
+        super().__init__(daemon=True)
+        self.codes = list(codes)
+        self.on_update = on_update
+        self.interval = interval
+        self.fetcher = fetcher
+        self.market_hours = market_hours
+        self._last: Dict[str, Dict] = {}
+        self._stop_event = threading.Event()
+
+    def poll_once(self):
+        """拉取一轮行情并回调变化部分"""
+        quotes = self.fetcher(self.codes)
+        changed = {code: q for code, q in quotes.items() if self._last.get(code) != q}
+        self._last.update(changed)
+        if changed:
+            self.on_update(changed)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error("拉取行情出错: %s", e)
+            interval = poll_interval(self.interval, self.market_hours)
+            self._stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def run_dashboard(codes: List[str], interval: float = REFRESH_INTERVAL, processes: int = 0,
+                  market_hours: bool = False):
+    """运行看板直到用户按Ctrl+C，processes 大于1时使用多进程分片轮询，market_hours 为True时休市期间暂停轮询"""
+    dashboard = Dashboard(codes)
+    if processes > 1:
+        from .sharding import ShardedPoller
+        poller = ShardedPoller(codes, dashboard.update, interval, processes, market_hours=market_hours)
+    else:
+        poller = QuotePoller(codes, dashboard.update, interval, market_hours=market_hours)
+    dashboard.start()
+    poller.start()
+    try:
+        while poller.is_alive():
+            poller.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.stop()
+        dashboard.stop()
+
+
+def read_codes(codes: Optional[str], path: Optional[str]) -> List[str]:
+    """从逗号分隔的参数和/或文件(每行一个代码)读取股票代码"""
+    result = [c.strip() for c in codes.split(',')] if codes else []
+    if path:
+        with open(path, encoding='utf-8') as f:
+            result.extend(line.strip() for line in f)
+    return [c for c in result if c]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="实时行情看板")
+    parser.add_argument("-c", "--codes", help="股票代码列表,使用逗号分隔", type=str)
+    parser.add_argument("-f", "--file", help="股票代码文件,每行一个代码", type=str)
+    parser.add_argument("-i", "--interval", help="刷新间隔(秒)", type=float,
+                        default=REFRESH_INTERVAL)
+    parser.add_argument("-p", "--processes", help="分片轮询的进程数,大于1时启用", type=int, default=0)
+    parser.add_argument("-m", "--market-hours", help="只在交易时段轮询", action='store_true')
+    args = parser.parse_args()
+    codes = read_codes(args.codes, args.file)
+    if not codes:
+        parser.error("请通过 -c 或 -f 指定股票代码")
+    run_dashboard(codes, args.interval, args.processes, args.market_hours)
+
+
+if __name__ == "__main__":
+    main()
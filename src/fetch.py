@@ -0,0 +1,512 @@
+"""
+网络请求公共模块
+
+行情和K线请求统一经过此模块发出：相同的并发请求只向上游发送一次，
+每个请求都有截止时间、超时对冲、有限次数的抖动退避重试，并按主机熔断；
+发往同一主机的请求共享令牌桶限速和AIMD自适应并发控制。
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from . import profiling
+from .metrics import registry
+
+RequestKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# 请求策略常量
+CONNECT_TIMEOUT = 3.05  # 连接超时(秒)
+READ_TIMEOUT = 5.0  # 读取超时(秒)
+REQUEST_DEADLINE = 8.0  # 单次请求(含重试)的总截止时间(秒)
+MAX_RETRIES = 2  # 最大重试次数
+BACKOFF_BASE = 0.2  # 退避基准时间(秒)
+BACKOFF_MAX = 2.0  # 最大退避时间(秒)
+HEDGE_MIN_DELAY = 0.2  # 对冲请求的最小等待时间(秒)
+HEDGE_MIN_SAMPLES = 20  # 计算p95所需的最少样本数
+LATENCY_WINDOW = 200  # 每个主机保留的延迟样本数
+BREAKER_FAILURES = 5  # 连续失败多少次后熔断
+BREAKER_RESET = 30.0  # 熔断后多久尝试恢复(秒)
+LAST_KNOWN_SIZE = 1024  # 保留的最近成功结果数量
+RETRY_STATUS = (429, 500, 502, 503, 504)  # 需要重试的HTTP状态码
+OVERLOAD_STATUS = (403, 429)  # 表示上游限流的HTTP状态码
+
+# 限速和并发控制常量
+HOST_RATES = {  # 每个主机每秒允许的请求数
+    'hq.sinajs.cn': 20.0,
+    'push2his.eastmoney.com': 10.0,
+}
+DEFAULT_RATE = 10.0
+RATE_BURST = 2.0  # 令牌桶容量为每秒速率的倍数
+CONCURRENCY_INITIAL = 3  # 初始并发数
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = 32
+LATENCY_TARGET = 1.0  # 延迟低于该值(秒)才增加并发
+ERROR_RATE_LIMIT = 0.05  # 错误率低于该值才增加并发
+ERROR_DECAY = 0.1  # 错误率指数平均系数
+DECREASE_FACTOR = 0.5  # 限流时并发数的乘性减少系数
+
+
+class CircuitOpenError(Exception):
+    """主机熔断中且没有可用的最近结果"""
+
+
+class _Call:
+    """一次进行中的请求"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """请求合并器：相同键的并发调用共享同一次执行及其结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0  # 总调用次数
+        self.dedup_hits = 0  # 被合并的调用次数
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """执行func，若相同键的调用正在进行则等待其结果"""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.dedup_hits += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'upstream': self.calls - self.dedup_hits,
+                'dedup_hits': self.dedup_hits,
+                'in_flight': len(self._calls),
+            }
+
+
+class LatencyTracker:
+    """记录每个主机最近的请求延迟"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self.window = window
+
+    def record(self, host: str, latency: float):
+        with self._lock:
+            samples = self._samples.setdefault(host, deque(maxlen=self.window))
+            samples.append(latency)
+
+    def percentile(self, host: str, q: float) -> Optional[float]:
+        """返回延迟分位数，样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+class CircuitBreaker:
+    """单个主机的熔断器：连续失败后打开，冷却期后放行一次探测请求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self._lock = threading.Lock()
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """当前是否允许向该主机发出请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._consecutive = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, burst: float):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """取一个令牌，超时未取到返回False"""
+        expires = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_time = (1 - self._tokens) / self.rate
+            if expires is not None:
+                wait_time = min(wait_time, expires - time.monotonic())
+                if wait_time <= 0:
+                    return False
+            time.sleep(wait_time)
+
+
+class AdaptiveConcurrency:
+    """AIMD并发控制：延迟和错误率正常时加性增加并发，遇到限流或超时乘性减少"""
+
+    def __init__(
+        self,
+        initial: int = CONCURRENCY_INITIAL,
+        minimum: int = CONCURRENCY_MIN,
+        maximum: int = CONCURRENCY_MAX,
+        latency_target: float = LATENCY_TARGET,
+    ):
+        self._cond = threading.Condition()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self._limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.error_rate = 0.0
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发数"""
+        return int(self._limit)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """占用一个并发名额，超时未取到返回False"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < self.limit, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, ok: bool, overloaded: bool = False):
+        """释放名额，并根据本次请求结果调整并发数"""
+        with self._cond:
+            self.in_flight -= 1
+            self.error_rate += ERROR_DECAY * ((0.0 if ok else 1.0) - self.error_rate)
+            if overloaded:
+                self._limit = max(self.minimum, self._limit * DECREASE_FACTOR)
+            elif ok and latency <= self.latency_target and self.error_rate < ERROR_RATE_LIMIT:
+                # 每轮约增加一个并发
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+
+class HostLimiter:
+    """单个主机的限速器和并发控制器"""
+
+    def __init__(self, rate: float, initial: int = CONCURRENCY_INITIAL):
+        self.bucket = TokenBucket(rate, rate * RATE_BURST)
+        self.concurrency = AdaptiveConcurrency(initial)
+
+    def acquire(self, timeout: float) -> bool:
+        """先取令牌再占用并发名额"""
+        expires = time.monotonic() + timeout
+        if not self.bucket.acquire(timeout):
+            return False
+        return self.concurrency.acquire(max(0.0, expires - time.monotonic()))
+
+    def release(self, latency: float, ok: bool, overloaded: bool = False):
+        self.concurrency.release(latency, ok, overloaded)
+
+
+_limiters: Dict[str, HostLimiter] = {}
+_limiters_lock = threading.Lock()
+_rate_share = 1.0  # 本进程可使用的主机速率比例
+
+
+def share_rates(processes: int):
+    """多个进程同时请求同一主机时，本进程只使用每个主机速率的 1/processes"""
+    global _rate_share
+    with _limiters_lock:
+        _rate_share = 1.0 / max(1, processes)
+        for host, host_limiter in _limiters.items():
+            host_limiter.bucket.rate = HOST_RATES.get(host, DEFAULT_RATE) * _rate_share
+            host_limiter.bucket.capacity = host_limiter.bucket.rate * RATE_BURST
+
+
+def limiter(host: str) -> HostLimiter:
+    """获取主机共享的限速器"""
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = HostLimiter(HOST_RATES.get(host, DEFAULT_RATE) * _rate_share)
+        return _limiters[host]
+
+
+def concurrency_limit(url: str) -> int:
+    """某个接口所在主机当前允许的并发数"""
+    return limiter(urlsplit(url).netloc.lower()).concurrency.limit
+
+
+class FetchPolicy:
+    """请求策略：截止时间、p95对冲、抖动退避重试和按主机熔断"""
+
+    def __init__(
+        self,
+        deadline: float = REQUEST_DEADLINE,
+        retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_BASE,
+        max_backoff: float = BACKOFF_MAX,
+        hedge_min_delay: float = HEDGE_MIN_DELAY,
+        breaker_failures: int = BREAKER_FAILURES,
+        breaker_reset: float = BREAKER_RESET,
+    ):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._last_known: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=CONCURRENCY_MAX * 2, thread_name_prefix='fetch')
+        self.counters = {'requests': 0, 'retries': 0, 'hedged': 0, 'failures': 0, 'stale_served': 0}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """获取主机对应的熔断器"""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            return self._breakers[host]
+
+    def execute(
+        self,
+        key: Hashable,
+        host: str,
+        send: Callable[[float], Any],
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """在截止时间内执行send(timeout)，失败或熔断时返回该请求最近一次成功的结果"""
+        expires = time.monotonic() + (deadline or self.deadline)
+        breaker = self.breaker(host)
+        error: BaseException = CircuitOpenError(f"{host} 已熔断")
+        self._count('requests')
+
+        for attempt in range(self.retries + 1):
+            remaining = expires - time.monotonic()
+            if remaining <= 0 or not breaker.allow():
+                break
+            if attempt:
+                self._count('retries')
+            try:
+                started = time.monotonic()
+                result = self._hedged(send, host, remaining)
+            except Exception as e:
+                error = e
+                self._count('failures')
+                breaker.record_failure()
+                # 指数退避加全随机抖动，不超过剩余时间
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                time.sleep(max(0.0, min(delay, expires - time.monotonic())))
+                continue
+
+            self.latency.record(host, time.monotonic() - started)
+            breaker.record_success()
+            with self._lock:
+                self._last_known[key] = result
+                self._last_known.move_to_end(key)
+                while len(self._last_known) > LAST_KNOWN_SIZE:
+                    self._last_known.popitem(last=False)
+            return result
+
+        with self._lock:
+            stale = self._last_known.get(key)
+        if stale is not None:
+            self._count('stale_served')
+            return stale
+        raise error
+
+    def _hedged(self, send: Callable[[float], Any], host: str, remaining: float) -> Any:
+        """发出请求，超过p95延迟仍未返回时再发一个对冲请求，取先成功者"""
+        expires = time.monotonic() + remaining
+        timeout = min(READ_TIMEOUT, remaining)
+        p95 = self.latency.percentile(host, 0.95)
+        hedge_delay = max(self.hedge_min_delay, p95) if p95 is not None else None
+
+        pending = {self._executor.submit(send, timeout)}
+        if hedge_delay is not None and hedge_delay < remaining:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count('hedged')
+                pending.add(self._executor.submit(send, timeout))
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, expires - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise TimeoutError(f"请求{host}超过截止时间")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """请求策略统计"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.counters)
+            stats['open_circuits'] = [
+                host for host, b in self._breakers.items() if b.state != CircuitBreaker.CLOSED
+            ]
+        return stats
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> RequestKey:
+    """生成请求键：(接口地址, 排序后的查询参数)"""
+    parts = urlsplit(url)
+    endpoint = f"{parts.scheme}://{parts.netloc.lower()}{parts.path}"
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((k, str(v)) for k, v in params.items())
+    return endpoint, tuple(sorted(query))
+
+
+# 全局请求合并器和请求策略
+coalescer = SingleFlight()
+policy = FetchPolicy()
+
+# 主机 -> 本地数据源，命中时不发出网络请求
+_local_sources: Dict[str, Callable[[str], Any]] = {}
+
+
+def serve_locally(host: str, handler: Optional[Callable[[str], Any]]):
+    """让发往 host 的请求改由 handler(url) 返回的本地响应处理，handler 为None时恢复网络请求"""
+    if handler is None:
+        _local_sources.pop(host, None)
+    else:
+        _local_sources[host] = handler
+
+
+def get(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    encoding: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> requests.Response:
+    """发送GET请求：合并相同的并发请求，按主机限速，并按请求策略处理超时、重试和熔断"""
+    key = request_key(url, params)
+    host = urlsplit(url).netloc.lower()
+    endpoint = key[0]
+    local = _local_sources.get(host)
+    if local is not None:
+        return local(url)
+
+    def send(timeout: float) -> requests.Response:
+        host_limiter = limiter(host)
+        if not host_limiter.acquire(timeout):
+            raise TimeoutError(f"等待{host}请求配额超时")
+        started = time.monotonic()
+        ok = overloaded = False
+        try:
+            response = requests.get(
+                url, headers=headers, params=params,
+                timeout=(min(CONNECT_TIMEOUT, timeout), timeout),
+            )
+            registry.counter('fetch_requests_total', '上游请求次数',
+                             endpoint=endpoint, status=str(response.status_code)).inc()
+            registry.histogram('fetch_latency_seconds', '上游请求延迟',
+                               endpoint=endpoint).observe(time.monotonic() - started)
+            registry.counter('fetch_bytes_total', '上游响应字节数',
+                             endpoint=endpoint).inc(len(response.content))
+            overloaded = response.status_code in OVERLOAD_STATUS
+            if response.status_code in RETRY_STATUS:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            if encoding:
+                response.encoding = encoding
+            response.content  # 预先读取响应体，供多个调用方共享
+            ok = not overloaded
+            return response
+        except requests.RequestException as e:
+            registry.counter('fetch_errors_total', '上游请求失败次数',
+                             endpoint=endpoint, error=type(e).__name__).inc()
+            overloaded = overloaded or isinstance(e, requests.Timeout)
+            raise
+        finally:
+            host_limiter.release(time.monotonic() - started, ok, overloaded)
+
+    with profiling.phase(f'fetch:{endpoint}'):
+        return coalescer.do(key, lambda: policy.execute(key, host, send, deadline))
+
+
+def dedup_stats() -> Dict[str, int]:
+    """全局请求合并统计"""
+    return coalescer.stats()
+
+
+def _collect_metrics() -> Dict[str, float]:
+    """导出请求合并和请求策略的统计"""
+    values: Dict[str, float] = {
+        'fetch_coalesced_calls_total': coalescer.calls,
+        'fetch_dedup_hits_total': coalescer.dedup_hits,
+    }
+    for name, value in policy.stats().items():
+        if isinstance(value, int):
+            values[f'fetch_policy_{name}_total'] = value
+    return values
+
+
+registry.register_collector(_collect_metrics)
@@ -0,0 +1,184 @@
+"""
+基本面数据模块
+
+按股票代码缓存市盈率、市值等基本面数据，缓存按自然日过期并在后台线程刷新，
+查询只读缓存、从不等待网络；也可以从本地文件(JSON或CSV)加载，用于离线使用。
+"""
+import csv
+import json
+import os
+import queue
+import threading
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+FUNDAMENTALS_API = "http://push2.eastmoney.com/api/qt/stock/get"
+CACHE_DIR = os.environ.get('STOCK_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.stock_cache'))
+CACHE_FILE = os.path.join(CACHE_DIR, 'fundamentals.json')
+SOURCE_ENV = 'STOCK_FUNDAMENTALS_FILE'  # 离线基本面文件路径的环境变量
+DATE_KEY = '_date'  # 缓存条目的获取日期
+
+# 东方财富字段 -> (名称, 换算系数)
+EASTMONEY_FIELDS = {
+    'f58': ('name', None),
+    'f162': ('pe_ratio', 1),
+    'f167': ('pb_ratio', 1),
+    'f116': ('market_cap', 1e-8),  # 元 -> 亿
+    'f117': ('float_market_cap', 1e-8),
+    'f55': ('eps', 1),
+    'f173': ('roe', 1),
+}
+
+
+def secid(code: str) -> str:
+    """将 sh600000 形式的代码转换为东方财富的 1.600000"""
+    market = "1" if code.startswith("sh") else "0"
+    return f"{market}.{code[2:]}"
+
+
+def fetch_eastmoney(code: str) -> Dict:
+    """从东方财富获取一只股票的基本面数据"""
+    from . import fetch  # 延迟导入，离线使用时不需要网络依赖
+
+    params = {'secid': secid(code), 'fltt': '2', 'fields': ','.join(EASTMONEY_FIELDS)}
+    response = fetch.get(FUNDAMENTALS_API, params=params)
+    data = (response.json() or {}).get('data') or {}
+    result = {}
+    for field, (name, scale) in EASTMONEY_FIELDS.items():
+        value = data.get(field)
+        if value in (None, '-', ''):
+            continue
+        result[name] = value if scale is None else round(float(value) * scale, 2)
+    return result
+
+
+def load_source(path: str) -> Dict[str, Dict]:
+    """加载离线基本面文件
+
+    JSON文件为 {代码: {字段: 值}}；CSV文件首行为表头，需包含 code 列。
+    """
+    if path.endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as f:
+            return {row.pop('code'): _parse_row(row) for row in csv.DictReader(f)}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _parse_row(row: Dict[str, str]) -> Dict:
+    result = {}
+    for key, value in row.items():
+        if value in (None, ''):
+            continue
+        try:
+            result[key] = float(value)
+        except ValueError:
+            result[key] = value
+    return result
+
+
+class FundamentalsProvider:
+    """带按日过期缓存和后台刷新的基本面数据源"""
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = CACHE_FILE,
+        source_path: Optional[str] = None,
+        fetcher: Optional[Callable[[str], Dict]] = fetch_eastmoney,
+    ):
+        self.cache_path = cache_path
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = {}
+        self._source: Dict[str, Dict] = {}
+        self._pending: set = set()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                self._cache = load_source(cache_path)
+            except (OSError, ValueError) as e:
+                logger.warning("读取基本面缓存失败: %s", e)
+        source_path = source_path or os.environ.get(SOURCE_ENV)
+        if source_path:
+            self._source = load_source(source_path)
+
+    def get(self, code: str) -> Dict:
+        """立即返回已有的基本面数据(可能为空或已过期)，过期时安排后台刷新"""
+        with self._lock:
+            cached = self._cache.get(code)
+            fresh = cached is not None and cached.get(DATE_KEY) == date.today().isoformat()
+        registry.hit('fundamentals', fresh)
+        if not fresh:
+            self._schedule(code)
+        result = dict(self._source.get(code, {}))
+        if cached:
+            result.update(cached)
+        result.pop(DATE_KEY, None)
+        return result
+
+    def refresh(self, code: str) -> Dict:
+        """同步获取并缓存一只股票的基本面数据"""
+        data = self.fetcher(code)
+        if data:
+            entry = dict(data)
+            entry[DATE_KEY] = date.today().isoformat()
+            with self._lock:
+                self._cache[code] = entry
+            self.save()
+        return data
+
+    def save(self):
+        """将缓存写入文件"""
+        if not self.cache_path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self._cache, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("写入基本面缓存失败: %s", e)
+
+    def _schedule(self, code: str):
+        if self.fetcher is None:
+            return
+        with self._lock:
+            if code in self._pending:
+                return
+            self._pending.add(code)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._queue.put(code)
+
+    def _run(self):
+        while True:
+            code = self._queue.get()
+            try:
+                self.refresh(code)
+            except Exception as e:
+                logger.warning("获取%s基本面数据失败: %s", code, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(code)
+
+
+_provider: Optional[FundamentalsProvider] = None
+_provider_lock = threading.Lock()
+
+
+def provider() -> FundamentalsProvider:
+    """获取全局基本面数据源"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = FundamentalsProvider()
+        return _provider
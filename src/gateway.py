@@ -0,0 +1,330 @@
+"""
+本地行情网关
+
+一个asyncio进程按固定间隔向新浪拉取所有被关注股票的行情，并缓存东方财富K线，
+以与上游相同的接口路径提供给任意数量的本地客户端，上游请求量与客户端数量无关：
+
+    GET /list=sh600000,sz000001           新浪格式行情(来自最近一次轮询)
+    GET /api/qt/stock/kline/get?...       东方财富K线(按查询串缓存)
+    GET /snapshot?codes=sh600000          JSON行情快照
+    GET /ws                               WebSocket，按股票订阅，只推送变化的字段
+
+WebSocket 客户端发送 {"op": "subscribe", "codes": [...]} 或 {"op": "unsubscribe", ...}，
+收到 {"type": "snapshot", "code": ..., "quote": {...}} 和 {"type": "update", "code": ..., "changes": {...}}。
+
+启动网关:
+    python -m src.gateway [-c sh600000,...] [-i 1.0] [--host 127.0.0.1] [--port 8686]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .log import get_logger
+from .metrics import registry
+from .quotes import fetch_quotes, format_sina, request_codes
+from .trading_calendar import poll_interval
+
+logger = get_logger(__name__)
+
+GATEWAY_HOST = '127.0.0.1'
+GATEWAY_PORT = 8686
+REFRESH_INTERVAL = 1.0  # 行情轮询间隔(秒)
+KLINE_TTL = 60.0  # K线缓存时间(秒)
+KLINE_UPSTREAM = "http://push2his.eastmoney.com"
+MAX_REQUEST_BYTES = 64 * 1024
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_TEXT, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x8, 0x9, 0xA
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 502: 'Bad Gateway'}
+
+
+def encode_frame(payload: bytes, opcode: int = WS_TEXT, mask: bool = False) -> bytes:
+    """编码一个WebSocket帧，客户端发出的帧需要掩码"""
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('>H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('>Q', length)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """读取一个WebSocket帧，返回(操作码, 负载)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', await reader.readexactly(8))[0]
+    if length > MAX_REQUEST_BYTES:
+        raise ValueError("WebSocket帧过大")
+    key = await reader.readexactly(4) if second & 0x80 else b''
+    payload = await reader.readexactly(length)
+    return opcode, _apply_mask(payload, key) if key else payload
+
+
+class _Subscriber:
+    """一个WebSocket客户端，待发送的变化按股票合并，慢客户端不会积压消息"""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.codes: Set[str] = set()
+        self.pending: Dict[str, Tuple[str, Dict]] = {}
+        self.ready = asyncio.Event()
+
+    def push(self, code: str, kind: str, fields: Dict):
+        if code in self.pending:
+            previous_kind, previous = self.pending[code]
+            kind = 'snapshot' if previous_kind == 'snapshot' else kind
+            fields = {**previous, **fields}
+        self.pending[code] = (kind, fields)
+        self.ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            pending, self.pending = self.pending, {}
+            for code, (kind, fields) in pending.items():
+                key = 'quote' if kind == 'snapshot' else 'changes'
+                message = json.dumps({'type': kind, 'code': code, key: fields}, ensure_ascii=False)
+                self.writer.write(encode_frame(message.encode('utf-8')))
+            await self.writer.drain()
+
+
+class Gateway:
+    """行情网关：统一轮询上游，向HTTP和WebSocket客户端分发缓存数据"""
+
+    def __init__(
+        self,
+        codes: Iterable[str] = (),
+        interval: float = REFRESH_INTERVAL,
+        kline_ttl: float = KLINE_TTL,
+        fetcher: Callable[[List[str]], Dict[str, Dict]] = fetch_quotes,
+        kline_fetcher: Optional[Callable[[str], bytes]] = None,
+        market_hours: bool = False,
+    ):
+        self.tracked: Set[str] = set(codes)
+        self.interval = interval
+        self.market_hours = market_hours
+        self.kline_ttl = kline_ttl
+        self.fetcher = fetcher
+        self.kline_fetcher = kline_fetcher or _fetch_kline
+        self.snapshot: Dict[str, Dict] = {}
+        self.subscribers: Dict[str, Set[_Subscriber]] = {}
+        self._clients: Set[_Subscriber] = set()
+        self._klines: Dict[str, Tuple[float, bytes]] = {}
+        self._kline_calls: Dict[str, asyncio.Future] = {}
+
+    async def refresh(self, codes: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """拉取一轮行情，更新快照并推送变化，返回各股票变化的字段"""
+        codes = sorted(self.tracked) if codes is None else codes
+        if not codes:
+            return {}
+        loop = asyncio.get_running_loop()
+        quotes = await loop.run_in_executor(None, self.fetcher, codes)
+        changes = {}
+        for code, quote in quotes.items():
+            previous = self.snapshot.get(code, {})
+            changed = {key: value for key, value in quote.items() if previous.get(key) != value}
+            self.snapshot[code] = quote
+            if changed:
+                changes[code] = changed
+                for subscriber in self.subscribers.get(code, ()):
+                    subscriber.push(code, 'update', changed)
+        return changes
+
+    async def poll_forever(self):
+        """按固定间隔轮询上游，market_hours 为True时休市期间暂停(客户端首次请求的股票仍会立即拉取)"""
+        while True:
+            started = time.monotonic()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("网关拉取行情出错: %s", e)
+            interval = poll_interval(self.interval, self.market_hours)
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def quotes_for(self, codes: List[str]) -> Dict[str, Dict]:
+        """返回缓存行情；首次请求的股票加入轮询并立即拉取一次"""
+        wanted = [code[2:] if code.startswith('s_') else code for code in codes]
+        missing = [code for code in wanted if code not in self.snapshot]
+        self.tracked.update(wanted)
+        if missing:
+            await self.refresh(missing)
+        return {code: self.snapshot[code] for code in wanted if code in self.snapshot}
+
+    async def kline(self, query: str) -> bytes:
+        """返回K线响应，同一查询串在有效期内只请求上游一次"""
+        cached = self._klines.get(query)
+        if cached and time.monotonic() - cached[0] < self.kline_ttl:
+            registry.hit('gateway_kline', True)
+            return cached[1]
+        registry.hit('gateway_kline', False)
+        call = self._kline_calls.get(query)
+        if call is None:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(None, self.kline_fetcher, query)
+            self._kline_calls[query] = call
+            try:
+                body = await call
+                self._klines[query] = (time.monotonic(), body)
+                return body
+            finally:
+                del self._kline_calls[query]
+        return await asyncio.shield(call)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            for line in header_lines:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            registry.counter('gateway_requests_total', '网关请求次数',
+                             path=urlsplit(target).path.split('=')[0]).inc()
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self._websocket(reader, writer, headers)
+                return
+            status, content_type, body = await self._route(method, target)
+            writer.write(
+                f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError,
+                KeyError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str) -> Tuple[int, str, bytes]:
+        parts = urlsplit(target)
+        if method != 'GET':
+            return 400, 'text/plain', b'GET only'
+        if 'list=' in target and parts.path.startswith('/list'):
+            codes = request_codes(target)
+            quotes = await self.quotes_for(codes)
+            return 200, 'text/plain; charset=gbk', format_sina(codes, quotes).encode('gbk', errors='replace')
+        if parts.path == '/api/qt/stock/kline/get':
+            try:
+                return 200, 'application/json', await self.kline(parts.query)
+            except Exception as e:
+                logger.warning("网关获取K线出错: %s", e)
+                return 502, 'text/plain', str(e).encode('utf-8')
+        if parts.path == '/snapshot':
+            codes = ','.join(parse_qs(parts.query).get('codes', [])).split(',')
+            quotes = await self.quotes_for([code for code in codes if code])
+            return 200, 'application/json', json.dumps(quotes, ensure_ascii=False).encode('utf-8')
+        return 404, 'text/plain', b'not found'
+
+    async def _websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         headers: Dict[str, str]):
+        accept = base64.b64encode(
+            hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode('ascii')).digest()).decode('ascii')
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        subscriber = _Subscriber(writer)
+        sender = asyncio.ensure_future(subscriber.send_loop())
+        self._clients.add(subscriber)
+        registry.gauge('gateway_subscribers', '网关WebSocket客户端数').set(len(self._clients))
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == WS_CLOSE:
+                    writer.write(encode_frame(b'', WS_CLOSE))
+                    break
+                if opcode == WS_PING:
+                    writer.write(encode_frame(payload, WS_PONG))
+                elif opcode == WS_TEXT:
+                    await self._on_message(subscriber, payload)
+        finally:
+            sender.cancel()
+            self._clients.discard(subscriber)
+            registry.gauge('gateway_subscribers').set(len(self._clients))
+            for code in subscriber.codes:
+                self.subscribers.get(code, set()).discard(subscriber)
+
+    async def _on_message(self, subscriber: _Subscriber, payload: bytes):
+        try:
+            message = json.loads(payload.decode('utf-8'))
+            codes = [str(code) for code in message.get('codes', [])]
+        except (ValueError, AttributeError):
+            return
+        if message.get('op') == 'subscribe':
+            subscriber.codes.update(codes)
+            for code in codes:
+                self.subscribers.setdefault(code, set()).add(subscriber)
+            for code, quote in (await self.quotes_for(codes)).items():
+                subscriber.push(code, 'snapshot', quote)
+        elif message.get('op') == 'unsubscribe':
+            subscriber.codes.difference_update(codes)
+            for code in codes:
+                self.subscribers.get(code, set()).discard(subscriber)
+
+    async def serve(self, host: str = GATEWAY_HOST, port: int = GATEWAY_PORT):
+        """启动网关并一直运行"""
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_BYTES)
+        poller = asyncio.ensure_future(self.poll_forever())
+        logger.info("行情网关已启动: http://%s:%d", host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            poller.cancel()
+
+
+def _fetch_kline(query: str) -> bytes:
+    from . import fetch
+
+    return fetch.get(f"{KLINE_UPSTREAM}/api/qt/stock/kline/get?{query}").content
+
+
+def main():
+    """主函数"""
+    from .dashboard import read_codes
+
+    parser = argparse.ArgumentParser(description="本地行情网关")
+    parser.add_argument("-c", "--codes", help="预先轮询的股票代码,使用逗号分隔", type=str)
+    parser.add_argument("-f", "--file", help="预先轮询的股票代码文件,每行一个代码", type=str)
+    parser.add_argument("-i", "--interval", help="轮询间隔(秒)", type=float, default=REFRESH_INTERVAL)
+    parser.add_argument("--host", help="监听地址", default=GATEWAY_HOST)
+    parser.add_argument("--port", help="监听端口", type=int, default=GATEWAY_PORT)
+    parser.add_argument("-m", "--market-hours", help="只在交易时段轮询", action='store_true')
+    args = parser.parse_args()
+    gateway = Gateway(read_codes(args.codes, args.file), args.interval, market_hours=args.market_hours)
+    try:
+        asyncio.run(gateway.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+日志模块
+
+提供分级、按消息限频、经队列异步输出的日志，调试输出在未开启时几乎没有开销。
+日志级别可通过命令行参数或环境变量 STOCK_LOG_LEVEL 设置。
+"""
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple, Union
+
+LOGGER_NAME = 'stock'
+LEVEL_ENV = 'STOCK_LOG_LEVEL'
+DEFAULT_LEVEL = 'INFO'
+RATE_LIMIT_INTERVAL = 5.0  # 同一条消息两次输出之间的最小间隔(秒)
+RATE_LIMIT_KEYS = 4096  # 超过该数量时清理已过期的限频记录
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s - %(message)s'
+DATE_FORMAT = '%H:%M:%S'
+
+
+class RateLimitFilter(logging.Filter):
+    """按消息模板和参数限频(如不同股票代码的同一条警告分别限频)，被忽略的条数附在下一次输出的消息后"""
+
+    def __init__(self, interval: float = RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last: Dict[Tuple[str, int, object, str], Tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg, repr(record.args))
+        now = time.monotonic()
+        with self._lock:
+            if len(self._last) > RATE_LIMIT_KEYS:
+                self._last = {k: v for k, v in self._last.items() if v[1] or now - v[0] < self.interval}
+            last, suppressed = self._last.get(key, (float('-inf'), 0))
+            if now - last < self.interval:
+                self._last[key] = (last, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (期间忽略{suppressed}条相同消息)"
+        return True
+
+
+_listener: Optional[QueueListener] = None
+_rate_filter: Optional[RateLimitFilter] = None
+_setup_lock = threading.Lock()
+
+
+def setup(
+    level: Union[str, int, None] = None,
+    rate_interval: Optional[float] = None,
+) -> logging.Logger:
+    """配置日志级别和限频间隔，首次调用时启动后台输出线程"""
+    global _listener, _rate_filter
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is None:
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            _rate_filter = RateLimitFilter()
+            handler = QueueHandler(records)
+            handler.addFilter(_rate_filter)
+            output = logging.StreamHandler(sys.stderr)
+            output.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+            _listener = QueueListener(records, output)
+            _listener.start()
+            atexit.register(_listener.stop)
+            logger.addHandler(handler)
+            logger.propagate = False
+            if level is None:
+                level = os.environ.get(LEVEL_ENV, DEFAULT_LEVEL)
+    if level is not None:
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if rate_interval is not None:
+        _rate_filter.interval = rate_interval
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取模块日志记录器"""
+    if _listener is None:
+        setup()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
@@ -0,0 +1,214 @@
+"""
+进程内指标模块
+
+记录请求次数和延迟分布、传输字节数、解析耗时、缓存命中率、
+工作队列深度和绘图帧耗时，可在退出时打印汇总表或导出为Prometheus文本格式。
+"""
+import atexit
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# 默认直方图分桶(秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """只增计数器"""
+    kind = 'counter'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """可任意设置的瞬时值"""
+    kind = 'gauge'
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Histogram:
+    """固定分桶直方图"""
+    kind = 'histogram'
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为+Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """按分桶上界估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[Tuple[str, LabelKey], object] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def _get(self, factory: Callable[[], object], name: str, labels: Dict[str, str], help_text: str):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, factory())
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        return metric
+
+    def counter(self, name: str, help_text: str = '', **labels: str) -> Counter:
+        return self._get(Counter, name, labels, help_text)
+
+    def gauge(self, name: str, help_text: str = '', **labels: str) -> Gauge:
+        return self._get(Gauge, name, labels, help_text)
+
+    def histogram(self, name: str, help_text: str = '', **labels: str) -> Histogram:
+        return self._get(Histogram, name, labels, help_text)
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]):
+        """注册在导出时调用的采集函数，返回 指标名 -> 数值"""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """记录代码块耗时(秒)到直方图"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - started)
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """记录函数耗时的装饰器"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def hit(self, cache: str, hit: bool):
+        """记录一次缓存命中或未命中"""
+        self.counter('cache_requests_total', '缓存访问次数',
+                     cache=cache, result='hit' if hit else 'miss').inc()
+
+    def _snapshot(self) -> List[Tuple[str, LabelKey, object]]:
+        with self._lock:
+            items = [(name, labels, metric) for (name, labels), metric in self._metrics.items()]
+        for collector in self._collectors:
+            for name, value in collector().items():
+                gauge = Gauge()
+                gauge.set(value)
+                items.append((name, (), gauge))
+        return sorted(items, key=lambda item: (item[0], item[1]))
+
+    def to_prometheus(self) -> str:
+        """导出为Prometheus文本格式"""
+        lines: List[str] = []
+        typed = set()
+        for name, labels, metric in self._snapshot():
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                bounds = [str(b) for b in metric.buckets] + ['+Inf']
+                for bound, count in zip(bounds, metric.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """写出Prometheus文本文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+    def summary(self) -> str:
+        """生成汇总表"""
+        rows = [('指标', '标签', '次数/值', '平均', 'p50', 'p95', 'p99')]
+        for name, labels, metric in self._snapshot():
+            label_text = ','.join(f"{k}={v}" for k, v in labels)
+            if isinstance(metric, Histogram):
+                mean = metric.sum / metric.count if metric.count else 0.0
+                rows.append((name, label_text, str(metric.count), f"{mean * 1000:.1f}ms",
+                             *(f"≤{metric.quantile(q) * 1000:.0f}ms" for q in (0.5, 0.95, 0.99))))
+            else:
+                rows.append((name, label_text, f"{metric.value:g}", '', '', '', ''))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows]
+        lines.insert(1, '-' * len(lines[0]))
+        return '\n'.join(lines)
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+
+def install_exit_dump(summary: bool = False, path: Optional[str] = None):
+    """程序退出时打印汇总表和/或写出Prometheus文件"""
+    def dump():
+        if summary:
+            print("\n指标汇总:")
+            print(registry.summary())
+        if path:
+            registry.write_prometheus(path)
+            print(f"指标已写入: {path}")
+
+    if summary or path:
+        atexit.register(dump)
@@ -4,6 +4,8 @@
 import argparse
 import sys
 
+from . import board, log, metrics, profiling, snapshot
+from .adjust import ADJUST_FORWARD, ADJUST_MODES
 from .modern_stock import ModernStock
 
 
@@ -24,10 +26,79 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "-t", "--threads",
-        help="线程数量",
+        help="初始线程数量",
         type=int,
         default=3
     )
+    parser.add_argument(
+        "--max-threads",
+        help="根据上游响应情况自适应扩充的最大线程数量",
+        type=int,
+        default=32
+    )
+    parser.add_argument(
+        "--log-level",
+        help="日志级别: DEBUG、INFO、WARNING、ERROR(默认读取环境变量STOCK_LOG_LEVEL或INFO)",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--metrics",
+        help="退出时打印指标汇总表",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="退出时将指标以Prometheus文本格式写入该文件",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--profile",
+        help="记录各阶段和每次请求的墙钟时间与CPU时间，退出时打印报告",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--profile-memory",
+        help="剖析时用tracemalloc记录各阶段的内存峰值",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--profile-cprofile",
+        help="剖析时用cProfile包裹整个运行，并将结果写入该文件",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--profile-folded",
+        help="剖析时将阶段耗时以火焰图折叠栈格式写入该文件",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--adjust",
+        help="日线及以上周期的复权方式(运行时按 a 键切换)",
+        choices=ADJUST_MODES,
+        default=ADJUST_FORWARD
+    )
+    parser.add_argument(
+        "--gateway",
+        help="本地行情网关地址(如 http://127.0.0.1:8686，先运行 python -m src.gateway)",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        help="不读取也不保存上次运行的状态快照(默认启动时先显示快照，再用新数据校正)",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--board",
+        help="从本机共享内存行情看板读取实时行情(先运行 python -m src.board)，可指定看板名称",
+        nargs="?",
+        const=board.BOARD_NAME,
+        default=None
+    )
     return parser.parse_args()
 
 def check_code_format(code: str) -> bool:
@@ -45,6 +116,7 @@ def check_code_format(code: str) -> bool:
 def main():
     """主函数"""
     args = parse_args()
+    log.setup(args.log_level)
     codes = args.codes.split(",")
     
     # 检查股票代码格式
@@ -55,10 +127,25 @@ def main():
         sys.exit(1)
         
     print(f"正在查询股票: {', '.join(codes)}")
+    if args.board:
+        try:
+            board.use_board(args.board)
+        except FileNotFoundError:
+            print(f"错误: 行情看板 {args.board} 不存在，请先运行 python -m src.board")
+            sys.exit(1)
+    metrics.install_exit_dump(summary=args.metrics, path=args.metrics_file)
+    if args.profile:
+        profiling.install(
+            memory=args.profile_memory,
+            cprofile_path=args.profile_cprofile,
+            folded_path=args.profile_folded,
+        )
     
     # 初始化ModernStock对象并显示股票数据
     try:
-        stock = ModernStock(codes[0], args.threads)
+        stock = ModernStock(codes[0], args.threads, args.max_threads, args.gateway,
+                            snapshot_path=None if args.no_snapshot else snapshot.snapshot_path('modern_main'))
+        stock.adjust_mode = args.adjust
         stock.display_stocks(codes)
     except KeyboardInterrupt:
         print("\n程序已被用户中断")
@@ -3,7 +3,6 @@
 参考了主流金融App的设计理念
 """
 from datetime import datetime, timedelta
-import json
 import os
 import random
 import threading
@@ -20,9 +19,16 @@ from matplotlib.gridspec import GridSpec
 from matplotlib.patches import FancyBboxPatch
 import numpy as np
 import pandas as pd
-import requests
 from scipy.interpolate import make_interp_spline
 
+from . import fetch, fundamentals, profiling, snapshot, stats, trading_calendar
+from .adjust import ADJUST_FORWARD, ADJUST_MODES, ADJUST_NONE, Adjuster
+from .bars import INTRADAY_LEVELS, BarPyramid
+from .log import get_logger
+from .metrics import registry
+from .providers import KLINE_LIMIT, Provider, default_provider
+from .startup import POLL_INTERVAL_MS, StartupPipeline, interactive_backend
+
 # 强制使用合适的后端
 os.environ['MPLBACKEND'] = 'MacOSX'  # MacOS系统
 # os.environ['MPLBACKEND'] = 'TkAgg'   # 其他系统
@@ -35,8 +41,37 @@ plt.rcParams['axes.unicode_minus'] = False
 MAX_FIELDS = 32
 MAX_HISTORY = 100
 UPDATE_INTERVAL = 6  # 更新间隔(秒)
+QUOTE_API = "http://hq.sinajs.cn"  # 实时行情接口
 PLOT_WIDTH = 0.8  # K线图宽度
 PLOT_WIDTH_SHADOW = 0.2  # K线图影线宽度
+DAILY_BARS = 30  # 默认显示的日K线数量
+PYRAMID_DAILY_BARS = KLINE_LIMIT  # K线金字塔一次性下载的日K线数量(API上限)
+PYRAMID_RESOLUTION = 5  # K线金字塔的分钟K线基础粒度
+PYRAMID_INTRADAY_BARS = 48 * 10  # 约10个交易日的5分钟K线
+
+# 时间周期按钮 -> (金字塔级别, 回看天数, 图表周期标识)
+TIMEFRAME_LEVELS = {
+    "1天": ("5m", None, "intraday"),
+    "1周": ("30m", 7, "weekly"),
+    "1个月": ("daily", 30, "monthly"),
+    "3个月": ("daily", 90, "3month"),
+    "6个月": ("daily", 180, "6month"),
+    "年初至今": ("daily", "ytd", "ytd"),
+    "1年": ("daily", 365, "1year"),
+    "2年": ("daily", 730, "2year"),
+    "5年": ("weekly", 1825, "5year"),
+    "10年": ("weekly", 3650, "10year"),
+    "全部": ("weekly", None, "all"),
+}
+
+logger = get_logger(__name__)
+
+
+def _format_value(value, spec: str, suffix: str = '', scale: float = 1) -> str:
+    """格式化详情表中的数值，缺失时显示--"""
+    if not isinstance(value, (int, float)):
+        return '--'
+    return f"{value * scale:{spec}}{suffix}"
 
 class Worker(threading.Thread):
     """工作线程类"""
@@ -48,6 +83,7 @@ class Worker(threading.Thread):
     def run(self):
         while True:
             func, args = self.queue.get()
+            registry.gauge('worker_queue_depth', '工作队列中等待的任务数').set(self.queue.qsize())
             try:
                 func(*args)
             finally:
@@ -55,10 +91,24 @@ class Worker(threading.Thread):
 
 class ModernStock:
     """现代股票数据处理类 - 参考主流股票App的界面设计"""
-    def __init__(self, code: str, thread_num: int = 3):
-        """初始化股票数据处理对象"""
+    def __init__(
+        self,
+        code: str,
+        thread_num: int = 3,
+        max_threads: int = fetch.CONCURRENCY_MAX,
+        base_url: Optional[str] = None,
+        provider: Optional[Provider] = None,
+        snapshot_path: Optional[str] = None,
+    ):
+        """初始化股票数据处理对象，base_url 指向本地行情网关时行情和K线都经网关获取，
+        provider 为自定义数据源(默认为带缓存的网络数据源链)，snapshot_path 为状态快照目录(为空时不使用快照)"""
         self.code = code
+        self.snapshot_path = snapshot_path
+        self.restored = False  # 当前显示的是快照中的数据，新数据到达后校正
+        self.quote_api = base_url.rstrip('/') if base_url else QUOTE_API
+        self.provider = provider or default_provider(base_url)
         self.queue = Queue()
+        self.max_threads = max(max_threads, thread_num)
         self.threads = [Worker(self.queue) for _ in range(thread_num)]
         for thread in self.threads:
             thread.start()
@@ -69,10 +119,19 @@ class ModernStock:
         self.current_name = ""
         self.current_prices: Dict[str, float] = {}
         self.change_pcts: Dict[str, float] = {}
+        self.codes: List[str] = []
         self.stock_info = {}
+        self.quote_infos: Dict[str, Dict] = {}
         
         # 日K线数据
         self.daily_data: Dict[str, pd.DataFrame] = {}
+        # 每只股票的多周期K线金字塔
+        self.pyramids: Dict[str, BarPyramid] = {}
+        self._pyramid_locks: Dict[str, threading.Lock] = {}
+        # 复权：金字塔保存不复权数据，复权后的金字塔按 (代码, 复权方式) 缓存
+        self.adjust_mode = ADJUST_FORWARD
+        self.adjuster = Adjuster(self.provider)
+        self.adjusted_pyramids: Dict[Tuple[str, str], Tuple[pd.DataFrame, BarPyramid]] = {}
         
         # 背景颜色和图表样式
         self.bg_color = '#f5f5f5'  # 浅灰色背景
@@ -92,6 +151,13 @@ class ModernStock:
         self.active_timeframe = "1天"
         self.current_timeframe = "daily"  # 初始化时间周期为日K
 
+        # 时间周期K线按 (代码, 周期, 复权方式) 缓存，后台加载的结果经就绪队列交给GUI线程
+        self.timeframe_frames: Dict[Tuple[str, str, str], Tuple[pd.DataFrame, str]] = {}
+        self._timeframe_ready: Queue = Queue()
+        self._timeframe_generation = 0  # 每次点击加一，旧的加载结果不再显示
+        self._timeframe_loading: Optional[int] = None  # 正在等待显示的加载
+        self._timeframe_timer = None
+
     def create_figure(self):
         """创建现代风格图表"""
         # 创建图表和布局
@@ -126,6 +192,10 @@ class ModernStock:
         
         # 设置窗口标题
         self.fig.canvas.manager.set_window_title('股票K线图 - 现代界面')
+        self.fig.canvas.mpl_connect('key_press_event', self._on_key)
+        self.fig.canvas.mpl_connect('motion_notify_event', self._on_hover)
+        self.fig.canvas.mpl_connect('motion_notify_event', self._on_hover_k)
+        self.fig.canvas.mpl_connect('button_press_event', self._on_click)
         
         # 初始提示文本
         self.ax.text(0.5, 0.5, '正在加载数据...', 
@@ -139,110 +209,33 @@ class ModernStock:
     ) -> Tuple[int, Optional[Tuple[str, float, float]]]:
         """获取股票数据"""
         try:
-            url = f"http://hq.sinajs.cn/list={code}"
-            response = requests.get(url, headers={
-                'Referer': 'http://finance.sina.com.cn',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.159 Safari/537.36'
-            })
-            response.encoding = 'gbk'
-            
-            data_str = response.text
-            if "var hq_str_" not in data_str:
-                print(f"API返回格式不正确: {data_str[:100]}")
-                return code_index, None
-                
-            # 从返回结果中提取数据字符串
-            data_parts = data_str.split('="')
-            if len(data_parts) < 2:
-                return code_index, None
-                
-            data = data_parts[1].split('",')[0].split(',')
-            
-            if len(data) < 32:  # 确保数据完整
-                print(f"数据不完整，长度为{len(data)}")
-                return code_index, None
-                
-            name = data[0]
-            open_price = float(data[1])
-            yesterday_close = float(data[2])
-            current_price = float(data[3])
-            high_price = float(data[4])
-            low_price = float(data[5])
-            volume = float(data[8])
-            turnover = float(data[9])
-            
-            change = round((current_price - yesterday_close) / yesterday_close * 100, 2)
-            
-            # 存储更多股票信息用于显示
-            self.stock_info = {
-                'name': name,
-                'price': current_price,
-                'change': change,
-                'open': open_price,
-                'high': high_price,
-                'low': low_price,
-                'prev_close': yesterday_close,
-                'volume': volume,
-                'turnover': turnover,
-                'code': code
-            }
-            
-            return code_index, (name, current_price, change)
+            quote = self.provider.quotes([code]).get(code)
         except Exception as e:
-            print(f"获取实时数据出错: {e}")
+            logger.error("获取实时数据出错: %s", e)
             return code_index, None
-            
+        if quote is None:
+            logger.warning("无法获取%s的实时数据", code)
+            return code_index, None
+
+        # 存储更多股票信息用于显示
+        self.stock_info = {
+            'name': quote['name'],
+            'price': quote['price'],
+            'change': quote['change_pct'],
+            'open': quote['open'],
+            'high': quote['high'],
+            'low': quote['low'],
+            'prev_close': quote['prev_close'],
+            'volume': quote['volume'],
+            'turnover': quote['amount'],
+            'code': code
+        }
+        self.quote_infos[code] = self.stock_info
+        return code_index, (quote['name'], quote['price'], quote['change_pct'])
+
     def get_daily_k_data(self, code: str) -> pd.DataFrame:
         """获取日K线数据"""
-        try:
-            # 提取股票代码
-            stock_code = code[2:]  # 去掉sh或sz前缀
-            
-            # 东方财富网API接口，提供更可靠的历史K线数据
-            market = "1" if code.startswith("sh") else "0"
-            url = f"http://push2his.eastmoney.com/api/qt/stock/kline/get?secid={market}.{stock_code}&fields1=f1,f2,f3,f4,f5,f6&fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&klt=101&fqt=0&end=20500101&lmt=30"
-            
-            print(f"请求日K线数据URL: {url}")
-            
-            response = requests.get(url)
-            data = response.json()
-            
-            if 'data' not in data or data['data'] is None or 'klines' not in data['data']:
-                print(f"无法获取K线数据: {json.dumps(data)[:200]}")
-                return pd.DataFrame()
-            
-            klines = data['data']['klines']
-            print(f"成功获取到{len(klines)}条K线数据记录")
-            
-            # 解析K线数据
-            ohlc_data = []
-            for line in klines:
-                parts = line.split(',')
-                if len(parts) >= 6:
-                    date = parts[0]
-                    ohlc_data.append({
-                        'date': datetime.strptime(date, '%Y-%m-%d'),
-                        'open': float(parts[1]),
-                        'close': float(parts[2]),
-                        'high': float(parts[3]),
-                        'low': float(parts[4]),
-                        'volume': float(parts[5])
-                    })
-            
-            # 创建DataFrame
-            df = pd.DataFrame(ohlc_data)
-            
-            if not df.empty:
-                # 设置日期为索引
-                df.set_index('date', inplace=True)
-                print("日K线数据列:", df.columns.tolist())
-                print(f"数据范围: {df.index.min()} 到 {df.index.max()}")
-            
-            return df
-        except Exception as e:
-            print(f"获取日K线数据出错: {str(e)}")
-            # 返回空DataFrame
-            return pd.DataFrame()
+        return self.get_k_data_by_period(code, bars=DAILY_BARS)
 
     def display_stock_header(self):
         """显示股票标题和信息"""
@@ -368,10 +361,6 @@ class ModernStock:
                                   transform=self.timeframe_ax.transAxes,
                                   zorder=2)
                                   
-        # 添加互动提示（仅作为视觉效果，实际功能需要事件处理）
-        self.fig.canvas.mpl_connect('motion_notify_event', self._on_hover)
-        self.fig.canvas.mpl_connect('button_press_event', self._on_click)
-        
     def _on_hover(self, event):
         """鼠标悬停效果（仅视觉效果）"""
         # 实际实现需与GUI框架集成
@@ -393,294 +382,302 @@ class ModernStock:
             
             if 0 <= selected_index < len(timeframes):
                 selected_timeframe = timeframes[selected_index]
-                print(f"选择了时间周期: {selected_timeframe}")
-                
-                # 加载相应周期的数据
-                self.load_timeframe_data(selected_timeframe)
-                
-                # 重新显示时间周期按钮，更新高亮显示
-                self.active_timeframe = selected_timeframe
-                self.display_timeframe_buttons()
-                
-                # 更新图表
-                self.plot_daily_k()
-                
-                # 刷新图表
-                self.fig.canvas.draw()
-    
+                logger.debug("选择了时间周期: %s", selected_timeframe)
+                self.request_timeframe(selected_timeframe)
+
     def load_timeframe_data(self, timeframe):
-        """加载对应时间周期的数据"""
+        """同步加载对应时间周期的数据(均从本地K线金字塔读取)"""
         if not self.stock_info:
             return
             
         # 获取第一个股票代码
         first_code = next(iter(self.price_history.keys()))
         
-        # 根据选择的时间周期获取不同的数据
         try:
-            # 设置日期范围
-            end_date = datetime.now()
-            
-            if timeframe == "1天":
-                # 日内分时数据（模拟，实际应使用分时API）
-                print(f"加载{first_code}的分时数据")
-                # 获取当天的日K数据
-                df = self.get_daily_k_data(first_code)
-                
-                # 创建模拟的分时数据（每5分钟一个数据点）
-                now = datetime.now()
-                today_start = datetime(now.year, now.month, now.day, 9, 30)  # 交易开始时间9:30
-                today_end = datetime(now.year, now.month, now.day, 15, 0)   # 交易结束时间15:00
-                
-                # 计算当天的开盘价和昨收价
-                if not df.empty:
-                    today_open = df.iloc[-1]['open']
-                    yesterday_close = df.iloc[-2]['close'] if len(df) > 1 else df.iloc[-1]['open']
-                    today_close = self.current_prices[first_code]
-                    today_high = df.iloc[-1]['high']
-                    today_low = df.iloc[-1]['low']
-                else:
-                    # 如果没有数据，则使用当前价格模拟
-                    today_open = self.current_prices[first_code] * 0.98
-                    yesterday_close = self.current_prices[first_code] * 0.97
-                    today_close = self.current_prices[first_code]
-                    today_high = today_close * 1.02
-                    today_low = today_open * 0.98
-                
-                # 生成交易时间序列（上午9:30-11:30，下午13:00-15:00，每5分钟一个点）
-                trading_times = []
-                current_time = today_start
-                while current_time <= datetime(now.year, now.month, now.day, 11, 30):
-                    trading_times.append(current_time)
-                    current_time += timedelta(minutes=5)
-                
-                current_time = datetime(now.year, now.month, now.day, 13, 0)
-                while current_time <= today_end:
-                    trading_times.append(current_time)
-                    current_time += timedelta(minutes=5)
-                
-                # 生成价格数据（在开盘价和收盘价之间模拟波动）
-                intraday_data = []
-                price_range = today_high - today_low
-                for i, t in enumerate(trading_times):
-                    # 根据时间生成一个合理的价格波动
-                    progress = i / (len(trading_times) - 1) if len(trading_times) > 1 else 0.5
-                    # 添加一些随机波动，但保持整体趋势
-                    random_factor = 0.5 + random.random()  # 0.5到1.5之间的随机数
-                    if today_close > today_open:
-                        # 上涨趋势
-                        price = today_open + progress * (today_close - today_open) * random_factor
-                    else:
-                        # 下跌趋势
-                        price = today_open - progress * (today_open - today_close) * random_factor
-                    
-                    # 确保价格在当日最高价和最低价之间
-                    price = max(min(price, today_high), today_low)
-                    
-                    intraday_data.append({
-                        'date': t,
-                        'open': price * 0.998,
-                        'close': price,
-                        'high': price * 1.002,
-                        'low': price * 0.997,
-                        'volume': random.randint(100000, 1000000)
-                    })
-                
-                # 创建分时数据DataFrame
-                intraday_df = pd.DataFrame(intraday_data)
-                if not intraday_df.empty:
-                    intraday_df.set_index('date', inplace=True)
-                    print(f"生成了{len(intraday_df)}个5分钟分时数据点")
-                    print(f"分时数据范围: {intraday_df.index.min().strftime('%H:%M')} 到 {intraday_df.index.max().strftime('%H:%M')}")
-                
-                self.daily_data[first_code] = intraday_df
-                self.current_timeframe = "intraday"
-                
-            elif timeframe == "1周":
-                # 过去7天数据，使用半小时的粒度
-                start_date = end_date - timedelta(days=7)
-                print(f"加载{first_code}的1周数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                # 获取每日K线数据
-                daily_df = self.get_daily_k_data(first_code).loc[start_date:]
-                
-                # 创建半小时粒度数据
-                half_hour_data = []
-                
-                # 对每一天创建半小时数据点
-                for day, row in daily_df.iterrows():
-                    day_start = datetime(day.year, day.month, day.day, 9, 30)
-                    day_end = datetime(day.year, day.month, day.day, 15, 0)
-                    
-                    # 交易时段分别为9:30-11:30和13:00-15:00
-                    current_time = day_start
-                    while current_time <= datetime(day.year, day.month, day.day, 11, 30):
-                        half_hour_data.append({
-                            'date': current_time,
-                            'open': row['open'] * (0.995 + 0.01 * random.random()),
-                            'close': row['close'] * (0.995 + 0.01 * random.random()),
-                            'high': row['high'] * (0.998 + 0.004 * random.random()),
-                            'low': row['low'] * (0.998 + 0.004 * random.random()),
-                            'volume': row['volume'] / 16 * (0.8 + 0.4 * random.random())
-                        })
-                        current_time += timedelta(minutes=30)
-                    
-                    current_time = datetime(day.year, day.month, day.day, 13, 0)
-                    while current_time <= day_end:
-                        half_hour_data.append({
-                            'date': current_time,
-                            'open': row['open'] * (0.995 + 0.01 * random.random()),
-                            'close': row['close'] * (0.995 + 0.01 * random.random()),
-                            'high': row['high'] * (0.998 + 0.004 * random.random()),
-                            'low': row['low'] * (0.998 + 0.004 * random.random()),
-                            'volume': row['volume'] / 16 * (0.8 + 0.4 * random.random())
-                        })
-                        current_time += timedelta(minutes=30)
-                
-                # 创建分时数据DataFrame
-                half_hour_df = pd.DataFrame(half_hour_data)
-                if not half_hour_df.empty:
-                    half_hour_df.set_index('date', inplace=True)
-                    print(f"生成了{len(half_hour_df)}个半小时数据点覆盖7天")
-                    print(f"数据范围: {half_hour_df.index.min()} 到 {half_hour_df.index.max()}")
-                    self.daily_data[first_code] = half_hour_df
-                else:
-                    # 如果生成失败，使用原始的日K线数据
-                    self.daily_data[first_code] = daily_df
-                
-                self.current_timeframe = "weekly"
-                
-            elif timeframe == "1个月":
-                # 过去30天数据
-                start_date = end_date - timedelta(days=30)
-                print(f"加载{first_code}的1个月数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=30)
-                self.current_timeframe = "monthly"
-                
-            elif timeframe == "3个月":
-                # 过去90天数据
-                start_date = end_date - timedelta(days=90)
-                print(f"加载{first_code}的3个月数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=90)
-                self.current_timeframe = "3month"
-                
-            elif timeframe == "6个月":
-                # 过去180天数据
-                start_date = end_date - timedelta(days=180)
-                print(f"加载{first_code}的6个月数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=180)
-                self.current_timeframe = "6month"
-                
-            elif timeframe == "年初至今":
-                # 当年年初至今数据
+            df, current_timeframe = self.timeframe_frame(first_code, timeframe, self.adjust_mode)
+        except Exception as e:
+            logger.exception("加载%s周期数据出错: %s", timeframe, e)
+            return
+        self.daily_data[first_code] = df
+        self.current_timeframe = current_timeframe
+
+    def timeframe_frame(self, code: str, timeframe: str, mode: str) -> Tuple[pd.DataFrame, str]:
+        """某个时间周期的K线和图表周期标识，结果按 (代码, 周期, 复权方式) 缓存，可在工作线程中调用"""
+        key = (code, timeframe, mode)
+        cached = self.timeframe_frames.get(key)
+        registry.hit('timeframe', cached is not None)
+        if cached is None:
+            cached = self.timeframe_frames[key] = self._build_timeframe(code, timeframe, mode)
+        return cached
+
+    def _build_timeframe(self, code: str, timeframe: str, mode: str) -> Tuple[pd.DataFrame, str]:
+        level, days, current_timeframe = TIMEFRAME_LEVELS[timeframe]
+        pyramid = self.get_pyramid(code)
+        
+        if timeframe == "1天":
+            df = pyramid.last_session(level)
+            if df.empty:
+                # 没有分钟数据时根据日K线模拟分时走势
+                df = self._simulate_intraday_data(code, pyramid.level("daily"))
+        else:
+            if level in INTRADAY_LEVELS and pyramid.level(level).empty:
+                # 没有分钟数据时退回到日K线
+                logger.info("%s暂无分钟K线数据，使用日K线代替", code)
+                level = "daily"
+            
+            if level not in INTRADAY_LEVELS:
+                pyramid = self._adjusted_pyramid(code, pyramid, mode)
+            
+            # 以最新一根K线为终点设置日期范围，避开周末和节假日
+            frame = pyramid.level(level)
+            end_date = frame.index[-1].to_pydatetime() if not frame.empty else datetime.now()
+            if days == "ytd":
                 start_date = datetime(end_date.year, 1, 1)
-                print(f"加载{first_code}的年初至今数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, start_date=start_date)
-                self.current_timeframe = "ytd"
-                
-            elif timeframe == "1年":
-                # 过去365天数据
-                start_date = end_date - timedelta(days=365)
-                print(f"加载{first_code}的1年数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=365)
-                self.current_timeframe = "1year"
-                
-            elif timeframe == "2年":
-                # 过去730天数据
-                start_date = end_date - timedelta(days=730)
-                print(f"加载{first_code}的2年数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=730)
-                self.current_timeframe = "2year"
-                
-            elif timeframe == "5年":
-                # 过去1825天数据
-                start_date = end_date - timedelta(days=1825)
-                print(f"加载{first_code}的5年数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=1825)
-                self.current_timeframe = "5year"
-                
-            elif timeframe == "10年":
-                # 过去3650天数据
-                start_date = end_date - timedelta(days=3650)
-                print(f"加载{first_code}的10年数据，从{start_date.strftime('%Y-%m-%d')}到{end_date.strftime('%Y-%m-%d')}")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=3650)
-                self.current_timeframe = "10year"
-                
-            elif timeframe == "全部":
-                # 所有历史数据
-                print(f"加载{first_code}的全部历史数据")
-                self.daily_data[first_code] = self.get_k_data_by_period(first_code, days=10000)  # 很大的天数，获取尽可能多的数据
-                self.current_timeframe = "all"
-                
+            elif days:
+                start_date = end_date - timedelta(days=days)
+            else:
+                start_date = None
+            df = pyramid.window(level, start=start_date)
+        
+        logger.debug("加载%s的%s数据(%s级别): %d条", code, timeframe, level, len(df))
+        return df, current_timeframe
+
+    def request_timeframe(self, timeframe: str):
+        """切换时间周期：已缓存时立即显示，否则在工作线程中加载，期间保留旧图并显示加载提示
+
+        连续点击时只显示最后一次点击的结果，尚未开始的旧加载直接取消。
+        """
+        self.active_timeframe = timeframe
+        self._timeframe_generation += 1
+        self._timeframe_loading = None
+        if not self.stock_info or not self.price_history:
+            return
+        code = next(iter(self.price_history.keys()))
+        cached = self.timeframe_frames.get((code, timeframe, self.adjust_mode))
+        if cached is not None:
+            registry.hit('timeframe', True)
+            self._show_timeframe(code, *cached)
+            self._prefetch_adjacent(code, timeframe)
+            return
+
+        self._timeframe_loading = self._timeframe_generation
+        self._show_loading(timeframe)
+        self._submit(self._load_timeframe, (self._timeframe_generation, code, timeframe, self.adjust_mode))
+        if self._timeframe_timer is None:
+            self._timeframe_timer = self.fig.canvas.new_timer(interval=POLL_INTERVAL_MS)
+            self._timeframe_timer.add_callback(self._poll_timeframe)
+        self._timeframe_timer.start()
+
+    def _load_timeframe(self, generation: int, code: str, timeframe: str, mode: str):
+        """在工作线程中加载时间周期K线，已被后续点击取代时不再加载"""
+        if generation != self._timeframe_generation:
+            registry.counter('timeframe_cancelled_total', '被后续点击取代而取消的周期加载').inc()
+            return
+        try:
+            result = self.timeframe_frame(code, timeframe, mode)
         except Exception as e:
-            print(f"加载{timeframe}周期数据出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-    def get_k_data_by_period(self, code, days=None, start_date=None):
-        """根据时间周期获取K线数据"""
+            logger.exception("加载%s周期数据出错: %s", timeframe, e)
+            result = None
+        self._timeframe_ready.put((generation, code, timeframe, result))
+
+    def _prefetch(self, code: str, timeframe: str, mode: str):
+        """在工作线程中预取时间周期K线，有前台加载等待时让路"""
+        if self._timeframe_loading is not None or (code, timeframe, mode) in self.timeframe_frames:
+            return
         try:
-            # 提取股票代码
-            stock_code = code[2:]  # 去掉sh或sz前缀
-            
-            # 设置市场代码
-            market = "1" if code.startswith("sh") else "0"
-            
-            # 根据日期范围设置URL
-            if days:
-                # 使用天数参数
-                lmt = min(days, 5000)  # API限制，避免请求过大
+            self.timeframe_frame(code, timeframe, mode)
+        except Exception as e:
+            logger.debug("预取%s周期数据失败: %s", timeframe, e)
+
+    def _prefetch_adjacent(self, code: str, timeframe: str):
+        """工作队列空闲时预取相邻的时间周期，使大多数点击直接从内存显示"""
+        if self.queue.qsize():
+            return
+        timeframes = list(TIMEFRAME_LEVELS)
+        index = timeframes.index(timeframe)
+        for neighbour in timeframes[max(index - 1, 0):index + 2]:
+            if (code, neighbour, self.adjust_mode) not in self.timeframe_frames:
+                self._submit(self._prefetch, (code, neighbour, self.adjust_mode))
+
+    def _poll_timeframe(self):
+        """定时器回调：显示最后一次点击的加载结果，旧结果只留在缓存中"""
+        while not self._timeframe_ready.empty():
+            generation, code, timeframe, result = self._timeframe_ready.get()
+            if generation != self._timeframe_loading:
+                continue
+            self._timeframe_loading = None
+            if result is None:
+                self._show_loading(timeframe, failed=True)
             else:
-                # 默认获取30天数据
-                lmt = 30
-                
-            # 东方财富网API接口
-            url = f"http://push2his.eastmoney.com/api/qt/stock/kline/get?secid={market}.{stock_code}&fields1=f1,f2,f3,f4,f5,f6&fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&klt=101&fqt=0&end=20500101&lmt={lmt}"
-            
-            print(f"请求K线数据URL: {url}")
-            
-            response = requests.get(url)
-            data = response.json()
-            
-            if 'data' not in data or data['data'] is None or 'klines' not in data['data']:
-                print(f"无法获取K线数据: {json.dumps(data)[:200]}")
-                return pd.DataFrame()
-            
-            klines = data['data']['klines']
-            print(f"成功获取到{len(klines)}条K线数据记录")
-            
-            # 解析K线数据
-            ohlc_data = []
-            for line in klines:
-                parts = line.split(',')
-                if len(parts) >= 6:
-                    date = parts[0]
-                    ohlc_data.append({
-                        'date': datetime.strptime(date, '%Y-%m-%d'),
-                        'open': float(parts[1]),
-                        'close': float(parts[2]),
-                        'high': float(parts[3]),
-                        'low': float(parts[4]),
-                        'volume': float(parts[5])
-                    })
-            
-            # 创建DataFrame
-            df = pd.DataFrame(ohlc_data)
-            
-            if not df.empty:
-                # 设置日期为索引
-                df.set_index('date', inplace=True)
-                
-                # 如果指定了开始日期，筛选数据
-                if start_date:
-                    df = df[df.index >= start_date]
-                
-                print(f"数据范围: {df.index.min()} 到 {df.index.max()}")
-            
-            return df
+                self._show_timeframe(code, *result)
+                self._prefetch_adjacent(code, timeframe)
+        if self._timeframe_loading is None and self._timeframe_timer is not None:
+            self._timeframe_timer.stop()
+
+    def _show_timeframe(self, code: str, df: pd.DataFrame, current_timeframe: str):
+        """在GUI线程中显示加载好的时间周期K线"""
+        self.daily_data[code] = df
+        self.current_timeframe = current_timeframe
+        self.plot_daily_k()
+        self.fig.canvas.draw_idle()
+
+    def _show_loading(self, timeframe: str, failed: bool = False):
+        """高亮新选中的周期按钮，在保留的旧图上显示加载提示"""
+        self.display_timeframe_buttons()
+        if self.ax is not None:
+            self.ax.text(0.99, 0.97, f"{timeframe} {'加载失败' if failed else '加载中...'}",
+                         horizontalalignment='right', verticalalignment='top',
+                         transform=self.ax.transAxes, fontsize=10, color=self.text_color,
+                         bbox=dict(facecolor='white', edgecolor=self.grid_color, alpha=0.8))
+        self.fig.canvas.draw_idle()
+
+    def _adjusted_pyramid(self, code: str, pyramid: BarPyramid, mode: Optional[str] = None) -> BarPyramid:
+        """按复权方式(默认当前方式)复权后的日、周、月K线金字塔，复权在本地完成，切换方式不重新下载"""
+        mode = mode or self.adjust_mode
+        if mode == ADJUST_NONE:
+            return pyramid
+        daily = self.adjuster.adjusted(code, pyramid.level('daily'), mode)
+        source, adjusted = self.adjusted_pyramids.get((code, mode), (None, None))
+        if source is not daily:
+            adjusted = BarPyramid(code)
+            adjusted.load(daily=daily)
+            self.adjusted_pyramids[(code, mode)] = (daily, adjusted)
+        return adjusted
+
+    def set_adjust_mode(self, mode: str):
+        """切换复权方式并重新加载当前时间周期"""
+        if mode not in ADJUST_MODES:
+            raise ValueError(f"未知的复权方式: {mode}")
+        self.adjust_mode = mode
+        logger.info("复权方式: %s", mode)
+        if self.fig is not None:
+            self.request_timeframe(self.active_timeframe)
+        elif self.stock_info and self.price_history:
+            self.load_timeframe_data(self.active_timeframe)
+
+    def _on_key(self, event):
+        """按 a 键在不复权、前复权、后复权之间切换"""
+        if event.key == 'a':
+            index = ADJUST_MODES.index(self.adjust_mode)
+            self.set_adjust_mode(ADJUST_MODES[(index + 1) % len(ADJUST_MODES)])
+
+    def get_pyramid(self, code: str) -> BarPyramid:
+        """获取股票的K线金字塔，首次访问时一次性下载日K线和分钟K线(同一代码只下载一次)"""
+        with self._pyramid_locks.setdefault(code, threading.Lock()):
+            pyramid = self.pyramids.get(code)
+            if pyramid is None:
+                pyramid = self.pyramids[code] = BarPyramid(code)
+            registry.hit('kline_download', not pyramid.empty)
+            if pyramid.empty:
+                daily = self.get_k_data_by_period(code, bars=PYRAMID_DAILY_BARS)
+                intraday = self.get_intraday_k_data(code)
+                pyramid.load(daily=daily, intraday=intraday, resolution=PYRAMID_RESOLUTION)
+                self._update_stats(code)
+            return pyramid
+
+    def _update_stats(self, code: str):
+        """增量更新统计缓存，个股日K线取自数据源缓存，不再重复下载"""
+        try:
+            stats.cache().refresh([code], self.provider)
         except Exception as e:
-            print(f"获取特定周期K线数据出错: {str(e)}")
-            # 返回空DataFrame
-            return pd.DataFrame()
+            logger.warning("更新%s的统计数据失败: %s", code, e)
+
+    def get_intraday_k_data(
+        self, code: str, klt: int = PYRAMID_RESOLUTION, lmt: int = PYRAMID_INTRADAY_BARS
+    ) -> pd.DataFrame:
+        """获取分钟K线数据"""
+        df = self.provider.bars(code, f"{klt}m", lmt)
+        logger.debug("获取到%d条%d分钟K线数据记录", len(df), klt)
+        return df
+
+    def _simulate_intraday_data(self, first_code: str, df: pd.DataFrame) -> pd.DataFrame:
+        """无分钟数据时，根据日K线模拟当天的5分钟分时数据"""
+        now = datetime.now()
+        today_start = datetime(now.year, now.month, now.day, 9, 30)  # 交易开始时间9:30
+        today_end = datetime(now.year, now.month, now.day, 15, 0)   # 交易结束时间15:00
+        
+        # 计算当天的开盘价和昨收价
+        if not df.empty:
+            today_open = df.iloc[-1]['open']
+            yesterday_close = df.iloc[-2]['close'] if len(df) > 1 else df.iloc[-1]['open']
+            today_close = self.current_prices[first_code]
+            today_high = df.iloc[-1]['high']
+            today_low = df.iloc[-1]['low']
+        else:
+            # 如果没有数据，则使用当前价格模拟
+            today_open = self.current_prices[first_code] * 0.98
+            yesterday_close = self.current_prices[first_code] * 0.97
+            today_close = self.current_prices[first_code]
+            today_high = today_close * 1.02
+            today_low = today_open * 0.98
+        
+        # 生成交易时间序列（上午9:30-11:30，下午13:00-15:00，每5分钟一个点）
+        trading_times = []
+        current_time = today_start
+        while current_time <= datetime(now.year, now.month, now.day, 11, 30):
+            trading_times.append(current_time)
+            current_time += timedelta(minutes=5)
+        
+        current_time = datetime(now.year, now.month, now.day, 13, 0)
+        while current_time <= today_end:
+            trading_times.append(current_time)
+            current_time += timedelta(minutes=5)
+        
+        # 生成价格数据（在开盘价和收盘价之间模拟波动）
+        intraday_data = []
+        for i, t in enumerate(trading_times):
+            # 根据时间生成一个合理的价格波动
+            progress = i / (len(trading_times) - 1) if len(trading_times) > 1 else 0.5
+            # 添加一些随机波动，但保持整体趋势
+            random_factor = 0.5 + random.random()  # 0.5到1.5之间的随机数
+            if today_close > today_open:
+                # 上涨趋势
+                price = today_open + progress * (today_close - today_open) * random_factor
+            else:
+                # 下跌趋势
+                price = today_open - progress * (today_open - today_close) * random_factor
+            
+            # 确保价格在当日最高价和最低价之间
+            price = max(min(price, today_high), today_low)
+            
+            intraday_data.append({
+                'date': t,
+                'open': price * 0.998,
+                'close': price,
+                'high': price * 1.002,
+                'low': price * 0.997,
+                'volume': random.randint(100000, 1000000)
+            })
+        
+        # 创建分时数据DataFrame
+        intraday_df = pd.DataFrame(intraday_data)
+        if not intraday_df.empty:
+            intraday_df.set_index('date', inplace=True)
+            logger.debug("生成了%d个5分钟模拟分时数据点", len(intraday_df))
+        return intraday_df
+            
+    def get_k_data_by_period(self, code, days=None, start_date=None, bars=None):
+        """根据时间周期获取K线数据
+
+        bars 为K线数量；days(回看的自然日数)或 start_date 按交易日历换算为区间内的交易日数，只请求所需的K线。
+        """
+        if bars is None:
+            if days and start_date is None:
+                start_date = datetime.now() - timedelta(days=days)
+            if start_date:
+                trading = trading_calendar.calendar()
+                bars = int(trading.count(start_date, trading.last_session()))
+            else:
+                bars = DAILY_BARS
+        df = self.provider.bars(code, 'daily', max(1, min(bars, KLINE_LIMIT)))
+        if df.empty:
+            logger.warning("无法获取%s的K线数据", code)
+            return df
+        # 如果指定了开始日期，筛选数据
+        if start_date:
+            df = df[df.index >= start_date]
+        logger.debug("数据范围: %s 到 %s", df.index.min(), df.index.max())
+        return df
 
     def display_stock_details(self):
         """显示股票详细信息表格"""
@@ -691,8 +688,11 @@ class ModernStock:
         self.details_ax.clear()
         self.details_ax.axis('off')
         
-        # 获取股票信息
+        # 获取股票信息，基本面数据只读缓存，未就绪时显示"--"
         info = self.stock_info
+        code = info.get('code', self.code)
+        basics = fundamentals.provider().get(code)
+        basics.update(stats.cache().get(code))  # 52周极值、均量和贝塔系数来自统计缓存
         
         # 计算表格位置和尺寸
         left_items = [
@@ -700,17 +700,17 @@ class ModernStock:
             ('今日最高价', f"{info.get('high', 0):.2f}"),
             ('今日最低价', f"{info.get('low', 0):.2f}"),
             ('成交量', f"{int(info.get('volume', 0)/10000)}万"),
-            ('市盈率', f"{482.11:.2f}"),
-            ('市值', f"{1003}亿")
+            ('市盈率', _format_value(basics.get('pe_ratio'), '.2f')),
+            ('市值', _format_value(basics.get('market_cap'), '.0f', '亿'))
         ]
         
         right_items = [
-            ('52周最高价', f"{59.37:.2f}"),
-            ('52周最低价', f"{32.66:.2f}"),
-            ('平均成交量', f"{5630}万"),
-            ('收益率', f"{0.21}%"),
-            ('贝塔系数', f"{0.72}"),
-            ('每股收益', f"{0.09}")
+            ('52周最高价', _format_value(basics.get('week52_high'), '.2f')),
+            ('52周最低价', _format_value(basics.get('week52_low'), '.2f')),
+            ('平均成交量', _format_value(basics.get('avg_volume'), '.0f', '万手', 1e-4)),
+            ('净资产收益率', _format_value(basics.get('roe'), '.2f', '%')),
+            ('贝塔系数', _format_value(basics.get('beta'), '.2f')),
+            ('每股收益', _format_value(basics.get('eps'), '.2f'))
         ]
         
         # 绘制表格项目
@@ -737,6 +737,7 @@ class ModernStock:
         # 添加分隔线
         self.spacer_ax.axhline(y=0.5, color='#dddddd', linestyle='-', linewidth=1)
 
+    @registry.timed('render_seconds', frame='plot_daily_k')
     def plot_daily_k(self):
         """绘制现代风格日K线图"""
         if not hasattr(self, 'fig') or self.fig is None:
@@ -754,7 +755,7 @@ class ModernStock:
             
             # 如果没有日K线数据，尝试获取
             if first_code not in self.daily_data or self.daily_data[first_code].empty:
-                self.daily_data[first_code] = self.get_daily_k_data(first_code)
+                self.daily_data[first_code] = self.get_pyramid(first_code).window('daily', bars=DAILY_BARS)
                 
             df = self.daily_data[first_code]
             
@@ -901,9 +902,6 @@ class ModernStock:
             # 添加垂直参考线，初始不可见
             self.vline = self.ax.axvline(x=0, color='#1E88E5', linestyle='-', alpha=0.3, visible=False)
             
-            # 注册鼠标事件
-            self.fig.canvas.mpl_connect('motion_notify_event', self._on_hover_k)
-            
             # 显示价格信息和时间周期选择
             self.display_stock_header()
             self.display_timeframe_buttons()
@@ -913,15 +911,15 @@ class ModernStock:
             plt.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.10, hspace=0.1)
             
         except Exception as e:
-            print(f"绘制K线图出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("绘制K线图出错: %s", e)
             
+    @registry.timed('render_seconds', frame='hover')
     def _on_hover_k(self, event):
         """鼠标在K线图上悬停时的事件处理"""
         import numpy as np
         
-        if not hasattr(self, 'df') or not event.inaxes or event.inaxes != self.ax:
+        if (not hasattr(self, 'df') or not hasattr(self, 'hover_annotation')
+                or not event.inaxes or event.inaxes != self.ax):
             # 如果鼠标移出图表区域，隐藏所有交互元素
             if hasattr(self, 'hover_annotation'):
                 self.hover_annotation.set_visible(False)
@@ -1021,68 +1019,193 @@ class ModernStock:
         # 更新画布
         self.fig.canvas.draw_idle()
 
-    def __add_work(self, code: str, code_index: int):
-        """添加工作任务"""
-        self.queue.put((self.value_get, (code, code_index)))
+    def _scale_workers(self):
+        """有积压任务时，按行情接口当前允许的并发数扩充工作线程"""
+        target = min(self.max_threads, fetch.concurrency_limit(self.quote_api))
+        while len(self.threads) < target and self.queue.qsize() > 0:
+            thread = Worker(self.queue)
+            thread.start()
+            self.threads.append(thread)
 
-    def display_stocks(self, codes: List[str], interval: float = UPDATE_INTERVAL):
-        """显示股票数据"""
-        print("程序启动中，正在初始化...")
-        print("正在准备加载数据...")
-        
-        for code in codes:
-            self.price_history[code] = []
-            self.time_history[code] = []
-            
-            # 初始化加载日K线数据
-            try:
-                print(f"初始化加载{code}的日K线数据...")
-                self.daily_data[code] = self.get_daily_k_data(code)
-                if self.daily_data[code].empty:
-                    print(f"警告: 未能获取到{code}的日K线数据")
-                else:
-                    print(f"成功加载了{len(self.daily_data[code])}条日K线数据")
-            except Exception as e:
-                print(f"初始加载{code}日K线数据失败: {str(e)}")
+    def _submit(self, func, args: tuple):
+        """把任务交给工作线程"""
+        self.queue.put((func, args))
+        registry.gauge('worker_queue_depth', '工作队列中等待的任务数').set(self.queue.qsize())
+        self._scale_workers()
 
-        print("\n数据加载中...")
-        
-        # 获取实时价格数据（只获取一次）
-        for i, code in enumerate(codes):
-            self.__add_work(code, i)
-        self.queue.join()
+    def _load_daily(self, code: str) -> pd.DataFrame:
+        """在工作线程中下载K线金字塔并取最近的日K线"""
+        return self.get_pyramid(code).window('daily', bars=DAILY_BARS)
 
-        # 获取并处理价格数据
-        for code in codes:
-            result = self.value_get(code, 0)
-            if result[1]:
-                _, (name, price, change) = result
-                self.current_name = name
+    def _apply_startup_results(self, block: bool = False):
+        """在主线程中取出已到达的K线和行情，只重绘数据到达的面板"""
+        pipeline = self._startup
+        first_code = self.codes[0]
+        chart, header = False, False
+        for kind, key, result in pipeline.drain(block):
+            if kind == 'kline':
+                if result is None or result.empty:
+                    logger.warning("未能获取到%s的日K线数据", key)
+                    if key in self.daily_data:
+                        continue  # 保留快照中的数据
+                if key == first_code and self.restored and result is not None and not result.empty:
+                    self._reconcile_snapshot(key)
+                    pipeline.mark('reconciled')
+                    continue
+                self.daily_data[key] = result if result is not None else pd.DataFrame()
+                chart = chart or key == first_code
+                continue
+            code = self.codes[key]
+            quote = result[1] if result else None
+            if quote:
+                name, price, change = quote
                 self.current_prices[code] = price
                 self.change_pcts[code] = change
                 self.price_history[code].append(price)
                 self.time_history[code].append(datetime.now())
+                if code == first_code:
+                    self.current_name = name
+                    self.stock_info = self.quote_infos.get(code, self.stock_info)
+                    header = True
+        if chart:
+            with profiling.phase('plot_daily_k'):
+                self.plot_daily_k()
+            pipeline.mark('chart')
+        elif header:
+            self.display_stock_header()
+            self.display_stock_details()
+            pipeline.mark('header')
+        if chart or header:
+            self.fig.canvas.draw_idle()
+        if pipeline.done and not self._startup_saved:
+            self._startup_saved = True
+            pipeline.mark('complete')
+            self._save_figure()
 
-        print("\n准备生成K线图...")
-        
-        # 在绘图前创建图表
-        self.create_figure()
-        
-        # 更新图表
-        self.plot_daily_k()
-        
-        # 保存图表为图片文件
+    def _reconcile_snapshot(self, code: str):
+        """K线金字塔下载完成后丢弃快照中的周期K线，按当前周期重新加载"""
+        for key in [key for key in self.timeframe_frames if key[0] == code]:
+            del self.timeframe_frames[key]
+        self.restored = False
+        if interactive_backend():
+            self.request_timeframe(self.active_timeframe)
+        else:
+            self.load_timeframe_data(self.active_timeframe)
+            self.plot_daily_k()
+
+    def save_snapshot(self):
+        """保存当前状态快照(在GUI线程中调用)"""
+        if not self.snapshot_path or not self.stock_info:
+            return
+        frames, timeframes = {}, {}
+        for (code, timeframe, mode), (df, current_timeframe) in list(self.timeframe_frames.items()):
+            key = f"timeframe|{code}|{timeframe}|{mode}"
+            frames[key] = df
+            timeframes[key] = current_timeframe
+        for code, df in list(self.daily_data.items()):
+            if not df.empty:
+                frames[f"display|{code}"] = df
+        state = {
+            'codes': self.codes,
+            'current_name': self.current_name,
+            'stock_info': self.stock_info,
+            'quote_infos': self.quote_infos,
+            'current_prices': self.current_prices,
+            'change_pcts': self.change_pcts,
+            'active_timeframe': self.active_timeframe,
+            'current_timeframe': self.current_timeframe,
+            'timeframes': timeframes,
+        }
+        snapshot.save(self.snapshot_path, state, frames)
+
+    def _restore_snapshot(self) -> bool:
+        """读取上次运行的状态快照，第一只股票相同时恢复行情、K线和当前周期"""
+        if not self.snapshot_path:
+            return False
+        loaded = snapshot.load(self.snapshot_path)
+        if loaded is None:
+            return False
+        state, frames = loaded
+        if not state['codes'] or state['codes'][0] != self.codes[0]:
+            return False
+        codes = set(self.codes)
+        for name in ('quote_infos', 'current_prices', 'change_pcts'):
+            getattr(self, name).update({code: value for code, value in state[name].items() if code in codes})
+        self.current_name = state['current_name']
+        self.stock_info = state['stock_info']
+        self.active_timeframe = state['active_timeframe']
+        self.current_timeframe = state['current_timeframe']
+        for key, df in frames.items():
+            kind, code, *rest = key.split('|')
+            if code not in codes:
+                continue
+            if kind == 'display':
+                self.daily_data[code] = df
+            else:
+                self.timeframe_frames[(code, *rest)] = (df, state['timeframes'][key])
+        self.restored = not self.daily_data.get(self.codes[0], pd.DataFrame()).empty
+        return self.restored
+
+    def _save_figure(self):
+        """保存图表为图片文件"""
         try:
             filename = f"{self.current_name}_日K线图_现代界面.png"
-            plt.savefig(filename, facecolor=self.bg_color)
+            with profiling.phase('savefig'):
+                self.fig.savefig(filename, facecolor=self.bg_color)
             print(f"\n图表已保存为文件: {filename}")
-            print(f"请在当前目录查看该文件以查看K线图。")
         except Exception as save_error:
-            print(f"保存图表时出错: {save_error}")
-        
+            logger.error("保存图表时出错: %s", save_error)
+
+    def display_stocks(self, codes: List[str], interval: float = UPDATE_INTERVAL):
+        """显示股票数据
+
+        所有代码的K线和行情同时提交给工作线程，图表立即显示占位内容，
+        每个面板在其数据到达后单独绘制。
+        """
+        logger.info("程序启动中，正在初始化...")
+        self.codes = list(codes)
+        for code in codes:
+            self.price_history[code] = []
+            self.time_history[code] = []
+
+        # 先恢复快照再提交任务，避免先到达的行情被快照中的旧行情覆盖
+        with profiling.phase('snapshot_load'):
+            restored = self._restore_snapshot()
+
+        with profiling.phase('startup_submit'):
+            self._startup = StartupPipeline(self._submit)
+            self._startup_saved = False
+            self._startup.start(
+                [('kline', code, self._load_daily, (code,)) for code in codes]
+                + [('quote', i, self.value_get, (code, i)) for i, code in enumerate(codes)]
+            )
+
+        # 图表立即创建，有快照时按快照绘制，否则显示占位提示
+        with profiling.phase('create_figure'):
+            self.create_figure()
+        self._startup.mark('figure')
+        if restored:
+            with profiling.phase('plot_daily_k'):
+                self.plot_daily_k()
+            self._startup.mark('snapshot')
+
         print("\n尝试显示图表窗口...")
-        print("如果窗口未显示，请查看已保存的图片文件。")
         print("按Ctrl+C终止程序。")
+
+        if not interactive_backend():
+            # 非交互后端没有事件循环，等待全部数据到达后绘制并保存
+            while not self._startup.done:
+                self._apply_startup_results(block=True)
+            self.save_snapshot()
+            return
+
+        timer = self.fig.canvas.new_timer(interval=POLL_INTERVAL_MS)
+        timer.add_callback(self._poll_startup, timer)
+        timer.start()
+        if self.snapshot_path:
+            snapshot_timer = self.fig.canvas.new_timer(interval=snapshot.SNAPSHOT_INTERVAL_MS)
+            snapshot_timer.add_callback(self.save_snapshot)
+            snapshot_timer.start()
         
         # 尝试显示图表，阻塞直到窗口关闭
         try:
@@ -1090,5 +1213,14 @@ class ModernStock:
         except KeyboardInterrupt:
             print("\n程序已被用户终止")
         except Exception as e:
-            print(f"显示图表时出错: {e}")
-            print(f"请直接查看保存的图片文件: {filename}")
\ No newline at end of file
+            logger.error("显示图表时出错: %s", e)
+        self.save_snapshot()
+
+    def _poll_startup(self, timer):
+        """定时器回调：渲染已到达的数据，全部到达后停止"""
+        try:
+            self._apply_startup_results()
+        except Exception as e:
+            logger.exception("渲染启动数据出错: %s", e)
+        if self._startup.done:
+            timer.stop()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+五档盘口跟踪
+
+按股票把最新五档盘口保存在一个 股票×买卖×档位×(价, 量) 的数组中，每批行情更新后只对更新的股票
+向量化计算买卖价差、中间价、委比和按挂单量加权的盘口均价，并为每只股票保留有限长度的盘口历史用于回放。
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import registry
+from .quotes import DEPTH_LEVELS
+
+DEPTH_HISTORY = 120  # 每只股票保留的盘口历史条数
+BID, ASK = 0, 1
+PRICE, VOLUME = 0, 1
+
+# 盘口指标
+METRICS = ('spread', 'mid', 'spread_bps', 'imbalance', 'weighted_price', 'bid_volume', 'ask_volume')
+
+
+def depth_from_quotes(quotes: Iterable[Dict]) -> np.ndarray:
+    """由行情字典(含 bids/asks 价量列表)构造 行情×买卖×档位×(价, 量) 数组，缺失档位为0"""
+    quotes = list(quotes)
+    depth = np.zeros((len(quotes), 2, DEPTH_LEVELS, 2))
+    for i, quote in enumerate(quotes):
+        for side, key in ((BID, 'bids'), (ASK, 'asks')):
+            levels = quote.get(key)
+            if levels:
+                depth[i, side, :len(levels)] = levels[:DEPTH_LEVELS]
+    return depth
+
+
+def depth_metrics(depth: np.ndarray) -> np.ndarray:
+    """对一批盘口向量化计算指标，返回 行×METRICS 数组，单边无挂单(如涨跌停)时价差类指标为NaN"""
+    prices, volumes = depth[..., PRICE], depth[..., VOLUME]
+    volumes = np.where(prices > 0, volumes, 0.0)
+    bid, ask = prices[:, BID, 0], prices[:, ASK, 0]
+    bid_volume, ask_volume = volumes[:, BID].sum(axis=1), volumes[:, ASK].sum(axis=1)
+    total = bid_volume + ask_volume
+    with np.errstate(invalid='ignore', divide='ignore'):
+        two_sided = (bid > 0) & (ask > 0)
+        spread = np.where(two_sided, ask - bid, np.nan)
+        mid = np.where(two_sided, (ask + bid) / 2, np.nan)
+        return np.column_stack([
+            spread,
+            mid,
+            spread / mid * 1e4,
+            np.where(total > 0, (bid_volume - ask_volume) / total, np.nan),
+            np.where(total > 0, (prices * volumes).sum(axis=(1, 2)) / total, np.nan),
+            bid_volume,
+            ask_volume,
+        ])
+
+
+class OrderBook:
+    """一组股票的最新五档盘口、盘口指标和盘口历史"""
+
+    def __init__(self, codes: Iterable[str] = (), history: int = DEPTH_HISTORY):
+        self.history = history
+        self.codes: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.depth = np.zeros((0, 2, DEPTH_LEVELS, 2))
+        self.metrics = np.zeros((0, len(METRICS)))
+        self._history = np.zeros((0, history, 2, DEPTH_LEVELS, 2), dtype=np.float32)
+        self._times = np.zeros((0, history))
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._add(list(codes))
+
+    def _add(self, codes: List[str]):
+        """登记新股票并扩充数组"""
+        new = [code for code in dict.fromkeys(codes) if code not in self._index]
+        if not new:
+            return
+        for code in new:
+            self._index[code] = len(self.codes)
+            self.codes.append(code)
+        n = len(new)
+        self.depth = np.concatenate([self.depth, np.zeros((n, 2, DEPTH_LEVELS, 2))])
+        self.metrics = np.concatenate([self.metrics, np.full((n, len(METRICS)), np.nan)])
+        self._history = np.concatenate([self._history,
+                                        np.zeros((n, self.history, 2, DEPTH_LEVELS, 2), np.float32)])
+        self._times = np.concatenate([self._times, np.zeros((n, self.history))])
+        self._counts = np.concatenate([self._counts, np.zeros(n, dtype=np.int64)])
+
+    def update(self, quotes: Dict[str, Dict], now: Optional[float] = None) -> np.ndarray:
+        """应用一批行情(代码 -> 含 bids/asks 的行情字典)，返回盘口有变化的股票行号"""
+        quotes = {code: quote for code, quote in quotes.items() if quote.get('bids') or quote.get('asks')}
+        self._add(list(quotes))
+        rows = np.fromiter((self._index[code] for code in quotes), dtype=np.int64, count=len(quotes))
+        return self.update_depth(rows, depth_from_quotes(quotes.values()), now)
+
+    def update_depth(self, rows: np.ndarray, depth: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """按行号写入盘口数组(行×买卖×档位×(价, 量))，只对变化的行计算指标并记入历史"""
+        now = time.time() if now is None else now
+        with registry.timer('orderbook_update_seconds'):
+            changed = np.any(self.depth[rows] != depth, axis=(1, 2, 3))
+            rows, depth = rows[changed], depth[changed]
+            if not len(rows):
+                return rows
+            self.depth[rows] = depth
+            self.metrics[rows] = depth_metrics(depth)
+            slots = self._counts[rows] % self.history
+            self._history[rows, slots] = depth
+            self._times[rows, slots] = now
+            self._counts[rows] += 1
+        return rows
+
+    def metrics_for(self, code: str) -> Dict[str, float]:
+        """一只股票的盘口指标，没有盘口时为空字典"""
+        row = self._index.get(code)
+        if row is None or not self._counts[row]:
+            return {}
+        return {name: float(value) for name, value in zip(METRICS, self.metrics[row])}
+
+    def column(self, name: str, codes: Iterable[str]) -> np.ndarray:
+        """按给定代码顺序取某个盘口指标，没有盘口的股票为NaN"""
+        column = METRICS.index(name)
+        rows = np.array([self._index.get(code, -1) for code in codes], dtype=np.int64)
+        values = np.full(len(rows), np.nan)
+        known = rows >= 0
+        values[known] = self.metrics[rows[known], column]
+        return values
+
+    def book(self, code: str) -> Dict[str, List[Tuple[float, float]]]:
+        """一只股票的最新五档 {'bids': [(价, 量)…], 'asks': […]}"""
+        row = self._index[code]
+        return {'bids': [tuple(level) for level in self.depth[row, BID].tolist()],
+                'asks': [tuple(level) for level in self.depth[row, ASK].tolist()]}
+
+    def replay(self, code: str) -> Tuple[np.ndarray, np.ndarray]:
+        """一只股票保留的盘口历史，按时间先后返回 (时间戳, 盘口数组)"""
+        row = self._index[code]
+        count = int(self._counts[row])
+        order = np.arange(max(0, count - self.history), count) % self.history
+        return self._times[row, order], self._history[row, order].astype(np.float64)
@@ -0,0 +1,138 @@
+"""
+分阶段性能剖析模块
+
+按命名阶段记录墙钟时间和CPU时间，可选记录每个阶段的内存峰值(tracemalloc)、
+用cProfile包裹整个运行，并输出火焰图可用的折叠栈文件。
+"""
+import atexit
+import cProfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class PhaseStats:
+    """单个阶段的累计统计"""
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory = 0
+
+
+class Profiler:
+    """分阶段剖析器，阶段可以嵌套，各线程分别维护阶段栈"""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.phases: Dict[str, PhaseStats] = {}
+        self._self_time: Dict[Tuple[str, ...], float] = {}  # 折叠栈 -> 自身耗时
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self) -> List[List]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """记录一个阶段的墙钟时间、当前线程CPU时间和内存峰值"""
+        stack = self._stack()
+        frame = [name, 0.0]  # [阶段名, 子阶段耗时]
+        stack.append(frame)
+        # 内存峰值是进程全局的，只在主线程的顶层阶段重置，嵌套阶段和工作线程中的阶段记录的是
+        # 自外层阶段开始以来的峰值(上界)，不会清掉外层或并发阶段正在统计的峰值
+        if (self.memory and len(stack) == 1 and threading.current_thread() is threading.main_thread()
+                and hasattr(tracemalloc, 'reset_peak')):
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else 0
+            path = tuple(item[0] for item in stack)
+            stack.pop()
+            if stack:
+                stack[-1][1] += wall
+            with self._lock:
+                stats = self.phases.setdefault(name, PhaseStats())
+                stats.count += 1
+                stats.wall += wall
+                stats.cpu += cpu
+                stats.peak_memory = max(stats.peak_memory, peak)
+                self._self_time[path] = self._self_time.get(path, 0.0) + max(0.0, wall - frame[1])
+
+    def report(self) -> str:
+        """生成各阶段耗时报告"""
+        header = ('阶段', '次数', '墙钟(ms)', 'CPU(ms)', '平均(ms)')
+        if self.memory:
+            header += ('内存峰值(KB)',)
+        rows = [header]
+        with self._lock:
+            items = sorted(self.phases.items(), key=lambda item: item[1].wall, reverse=True)
+        for name, stats in items:
+            row = (name, str(stats.count), f"{stats.wall * 1000:.1f}", f"{stats.cpu * 1000:.1f}",
+                   f"{stats.wall / stats.count * 1000:.1f}")
+            if self.memory:
+                row += (f"{stats.peak_memory / 1024:.0f}",)
+            rows.append(row)
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows]
+        lines.insert(1, '-' * len(lines[0]))
+        return '\n'.join(lines)
+
+    def folded(self) -> str:
+        """生成折叠栈文本(每行"阶段;子阶段 微秒")，可直接用于flamegraph.pl或speedscope"""
+        with self._lock:
+            items = sorted(self._self_time.items())
+        return ''.join(f"{';'.join(path)} {int(seconds * 1e6)}\n" for path, seconds in items)
+
+
+# 当前启用的剖析器，未启用时为None
+active: Optional[Profiler] = None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """在启用剖析时记录一个阶段，未启用时几乎没有开销"""
+    if active is None:
+        yield
+        return
+    with active.phase(name):
+        yield
+
+
+def install(
+    memory: bool = False,
+    cprofile_path: Optional[str] = None,
+    folded_path: Optional[str] = None,
+) -> Profiler:
+    """启用剖析，程序退出时打印报告并写出cProfile和折叠栈文件"""
+    global active
+    active = Profiler(memory=memory)
+    profile = cProfile.Profile() if cprofile_path else None
+    if profile is not None:
+        profile.enable()  # 仅剖析主线程
+
+    def finish():
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile_path)
+            print(f"cProfile数据已写入: {cprofile_path}")
+        print("\n阶段耗时:")
+        print(active.report())
+        if folded_path:
+            with open(folded_path, 'w', encoding='utf-8') as f:
+                f.write(active.folded())
+            print(f"折叠栈已写入: {folded_path}")
+
+    atexit.register(finish)
+    return active
@@ -0,0 +1,453 @@
+"""
+数据源模块
+
+行情、K线和基本面数据的统一接口。提供新浪(行情)和东方财富(K线、基本面)网络数据源、
+读穿缓存数据源和本地文件数据源(Parquet或CSV)，数据源可以串成链：
+前面的数据源失败或缺少数据时依次向后尝试。pandas 延迟导入，只取行情时不需要。
+"""
+import csv
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .fundamentals import fetch_eastmoney, load_source, secid
+from .log import get_logger
+from .metrics import registry
+from .quotes import QUOTE_BATCH_SIZE, SINA_HEADERS, SINA_QUOTE_API, batches, parse_sina, quote_url
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+KLINE_API = "http://push2his.eastmoney.com"
+KLINE_LIMIT = 5000  # 东方财富单次请求的K线数量上限
+DEFAULT_BARS = 30
+DATA_DIR_ENV = 'STOCK_DATA_DIR'  # 本地数据目录的环境变量
+PERIOD_KLT = {'5m': 5, '15m': 15, '30m': 30, '60m': 60, 'daily': 101, 'weekly': 102, 'monthly': 103}
+
+# 缓存有效期(秒)
+QUOTE_TTL = 1.0
+BAR_TTL = 60.0
+FUNDAMENTALS_TTL = 6 * 3600.0
+CACHE_ENTRIES = 4096
+TAIL_CHUNK = 64 * 1024  # 从文件末尾读取K线时的块大小
+
+
+Factors = List[Tuple[str, float]]
+
+
+class ProviderError(Exception):
+    """数据源不支持该类数据或获取失败"""
+
+
+class Provider:
+    """数据源接口，子类只需实现支持的数据类型"""
+
+    name = 'provider'
+
+    def quotes(self, codes: List[str]) -> Dict[str, Dict]:
+        """获取实时行情，返回 代码 -> 行情字典(字段见 quotes.parse_fields)，取不到的代码不出现在结果中"""
+        raise ProviderError(f"{self.name}不提供实时行情")
+
+    def bars(self, code: str, period: str = 'daily', limit: int = DEFAULT_BARS) -> 'pd.DataFrame':
+        """获取最近 limit 根K线(日期索引，列为open/close/high/low/volume[/amount])"""
+        raise ProviderError(f"{self.name}不提供K线")
+
+    def fundamentals(self, code: str) -> Dict:
+        """获取基本面数据"""
+        raise ProviderError(f"{self.name}不提供基本面数据")
+
+    def factors(self, code: str, raw: Optional['pd.DataFrame'] = None) -> Factors:
+        """获取复权因子表：按除权日排列的 (除权日, 除权前价格的前复权乘数)
+
+        raw 为调用方已有的不复权日K线，需要由K线推算因子的数据源据此推算，不再重复下载。
+        """
+        raise ProviderError(f"{self.name}不提供复权因子")
+
+
+def _fetch_text(url: str) -> str:
+    from . import fetch
+
+    return fetch.get(url, headers=SINA_HEADERS, encoding='gbk').text
+
+
+class SinaProvider(Provider):
+    """新浪实时行情，按批次一次请求多只股票；s_ 前缀的指数代码按完整格式请求"""
+
+    name = 'sina'
+
+    def __init__(
+        self,
+        base_url: str = SINA_QUOTE_API,
+        transport: Callable[[str], str] = _fetch_text,
+        batch_size: int = QUOTE_BATCH_SIZE,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport
+        self.batch_size = batch_size
+
+    def quotes(self, codes: List[str]) -> Dict[str, Dict]:
+        requested = {code[2:] if code.startswith('s_') else code: code for code in codes}
+        result = {}
+        for batch in batches(list(requested), self.batch_size):
+            text = self.transport(quote_url(batch, self.base_url))
+            with registry.timer('parse_seconds', kind='quote'):
+                for code, quote in parse_sina(text).items():
+                    if code in requested:
+                        result[requested[code]] = quote
+        return result
+
+
+class EastmoneyProvider(Provider):
+    """东方财富K线和基本面数据"""
+
+    name = 'eastmoney'
+
+    def __init__(self, base_url: str = KLINE_API):
+        self.base_url = base_url.rstrip('/')
+
+    def bars(self, code: str, period: str = 'daily', limit: int = DEFAULT_BARS,
+             fqt: int = 0) -> 'pd.DataFrame':
+        """fqt 为东方财富的复权方式：0不复权，1前复权，2后复权"""
+        from . import fetch
+        from .bars import parse_klines
+
+        if period not in PERIOD_KLT:
+            raise ProviderError(f"不支持的K线周期: {period}")
+        url = (f"{self.base_url}/api/qt/stock/kline/get?secid={secid(code)}"
+               f"&fields1=f1,f2,f3,f4,f5,f6&fields2=f51,f52,f53,f54,f55,f56,f57"
+               f"&klt={PERIOD_KLT[period]}&fqt={fqt}&end=20500101&lmt={min(limit, KLINE_LIMIT)}")
+        logger.debug("请求K线数据URL: %s", url)
+        response = fetch.get(url)
+        with registry.timer('parse_seconds', kind='kline'):
+            data = response.json() or {}
+            klines = (data.get('data') or {}).get('klines')
+            if klines is None:
+                raise ProviderError(f"无法获取{code}的K线数据: {str(data)[:200]}")
+            return parse_klines(klines)
+
+    def fundamentals(self, code: str) -> Dict:
+        return fetch_eastmoney(code)
+
+    def factors(self, code: str, raw: Optional['pd.DataFrame'] = None) -> Factors:
+        """由不复权和前复权日K线的比值推算复权因子，有 raw 时只下载同样长度的前复权日K线"""
+        from .adjust import derive_factors
+
+        if raw is None or raw.empty:
+            raw = self.bars(code, 'daily', KLINE_LIMIT)
+        adjusted = self.bars(code, 'daily', len(raw), fqt=1)
+        return derive_factors(raw['close'], adjusted['close'])
+
+
+class CacheProvider(Provider):
+    """读穿缓存：未过期时直接返回缓存，否则向上游获取并缓存，按最近使用淘汰"""
+
+    name = 'cache'
+
+    def __init__(
+        self,
+        upstream: Provider,
+        quote_ttl: float = QUOTE_TTL,
+        bar_ttl: float = BAR_TTL,
+        fundamentals_ttl: float = FUNDAMENTALS_TTL,
+        max_entries: int = CACHE_ENTRIES,
+    ):
+        self.upstream = upstream
+        self.quote_ttl = quote_ttl
+        self.bar_ttl = bar_ttl
+        self.fundamentals_ttl = fundamentals_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, object]]' = OrderedDict()
+
+    def _get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: Hashable, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def quotes(self, codes: List[str]) -> Dict[str, Dict]:
+        result = {}
+        for code in codes:
+            cached = self._get(('quote', code))
+            if cached is not None:
+                result[code] = cached
+        registry.hit('provider_quotes', len(result) == len(codes))
+        missing = [code for code in codes if code not in result]
+        if missing:
+            fetched = self.upstream.quotes(missing)
+            for code, quote in fetched.items():
+                self._put(('quote', code), quote, self.quote_ttl)
+            result.update(fetched)
+        return result
+
+    def bars(self, code: str, period: str = 'daily', limit: int = DEFAULT_BARS) -> 'pd.DataFrame':
+        key = ('bars', code, period)
+        cached = self._get(key)
+        # 缓存的K线足够多时直接截取
+        if cached is not None and (cached[0] >= limit or len(cached[1]) < cached[0]):
+            registry.hit('provider_bars', True)
+            return cached[1].tail(limit)
+        registry.hit('provider_bars', False)
+        df = self.upstream.bars(code, period, limit)
+        if not df.empty:
+            self._put(key, (limit, df), self.bar_ttl)
+        return df
+
+    def fundamentals(self, code: str) -> Dict:
+        key = ('fundamentals', code)
+        cached = self._get(key)
+        registry.hit('provider_fundamentals', cached is not None)
+        if cached is not None:
+            return cached
+        data = self.upstream.fundamentals(code)
+        if data:
+            self._put(key, data, self.fundamentals_ttl)
+        return data
+
+    def factors(self, code: str, raw: Optional['pd.DataFrame'] = None) -> Factors:
+        # 复权因子由 adjust.Adjuster 按日缓存，这里不再缓存
+        return self.upstream.factors(code, raw)
+
+
+def parquet_available() -> bool:
+    """是否安装了pandas读写Parquet所需的引擎"""
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def _tail_lines(path: str, rows: int) -> bytes:
+    """读取CSV文件的表头和最后 rows 行，从文件末尾按块向前读取"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        position = f.seek(0, os.SEEK_END)
+        data = b''
+        # 多读一个换行符，保证丢弃的第一行是不完整的那一行
+        while position > start and data.count(b'\n') <= rows:
+            step = min(TAIL_CHUNK, position - start)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines()[-rows:] if rows > 0 else []
+    return header + b''.join(line + b'\n' for line in lines)
+
+
+class FileProvider(Provider):
+    """本地文件数据源
+
+    目录结构:
+        <root>/bars/<周期>/<代码>.parquet 或 .csv   K线(date列为索引)
+        <root>/fundamentals.json 或 .csv            基本面数据
+        <root>/factors/<代码>.csv                   复权因子(date,ratio)
+    实时行情由最近两根日K线推算，便于完全离线运行和回测。
+    """
+
+    name = 'file'
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def bar_path(self, code: str, period: str, suffix: Optional[str] = None) -> str:
+        """K线文件路径，未指定后缀时返回已存在的文件(优先Parquet)"""
+        base = os.path.join(self.root, 'bars', period, code)
+        if suffix is not None:
+            return f"{base}.{suffix}"
+        for candidate in ('parquet', 'csv'):
+            if os.path.exists(f"{base}.{candidate}"):
+                return f"{base}.{candidate}"
+        return f"{base}.csv"
+
+    def load_bars(
+        self,
+        code: str,
+        period: str = 'daily',
+        columns: Optional[List[str]] = None,
+        tail: Optional[int] = None,
+    ) -> 'pd.DataFrame':
+        """读取某只股票的本地K线，可只读取部分列和最后 tail 行"""
+        import pandas as pd
+
+        path = self.bar_path(code, period)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path, columns=columns)
+            if tail is not None:
+                df = df.tail(tail)
+        else:
+            source = path if tail is None else io.BytesIO(_tail_lines(path, tail))
+            usecols = None if columns is None else ['date'] + list(columns)
+            df = pd.read_csv(source, usecols=usecols, index_col='date', parse_dates=['date'])
+        df.index = pd.DatetimeIndex(df.index, name='date')
+        return df
+
+    def save_bars(self, code: str, period: str, df: 'pd.DataFrame') -> str:
+        """保存K线，有Parquet引擎时写Parquet，否则写CSV，返回文件路径"""
+        path = self.bar_path(code, period, 'parquet' if parquet_available() else 'csv')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith('.parquet'):
+            df.to_parquet(path)
+        else:
+            df.to_csv(path, index_label='date')
+        return path
+
+    def codes(self, period: str = 'daily') -> List[str]:
+        """本地已有K线的股票代码"""
+        directory = os.path.join(self.root, 'bars', period)
+        if not os.path.isdir(directory):
+            return []
+        return sorted({os.path.splitext(name)[0] for name in os.listdir(directory)})
+
+    def bars(self, code: str, period: str = 'daily', limit: int = DEFAULT_BARS) -> 'pd.DataFrame':
+        df = self.load_bars(code, period, tail=limit)
+        if df.empty:
+            raise ProviderError(f"本地没有{code}的{period}K线")
+        return df
+
+    def quotes(self, codes: List[str]) -> Dict[str, Dict]:
+        result = {}
+        for code in codes:
+            df = self.load_bars(code[2:] if code.startswith('s_') else code, 'daily', tail=2)
+            if df.empty:
+                continue
+            last = df.iloc[-1]
+            prev_close = float(df['close'].iloc[0]) if len(df) > 1 else float(last['open'])
+            price = float(last['close'])
+            change = round(price - prev_close, 3)
+            result[code] = {
+                'code': code, 'name': code, 'open': float(last['open']), 'prev_close': prev_close,
+                'price': price, 'high': float(last['high']), 'low': float(last['low']),
+                'bid': price, 'ask': price, 'volume': float(last['volume']),
+                'amount': float(last.get('amount', 0.0)), 'bids': [], 'asks': [],
+                'date': df.index[-1].strftime('%Y-%m-%d'), 'time': '15:00:00',
+                'change': change, 'change_pct': round(change / prev_close * 100, 2) if prev_close else 0.0,
+            }
+        return result
+
+    def factor_path(self, code: str) -> str:
+        return os.path.join(self.root, 'factors', f"{code}.csv")
+
+    def factors(self, code: str, raw: Optional['pd.DataFrame'] = None) -> Factors:
+        path = self.factor_path(code)
+        if not os.path.exists(path):
+            raise ProviderError(f"本地没有{code}的复权因子")
+        with open(path, encoding='utf-8', newline='') as f:
+            return [(row['date'], float(row['ratio'])) for row in csv.DictReader(f)]
+
+    def save_factors(self, code: str, factors: Factors) -> str:
+        """保存复权因子表(CSV: date,ratio)"""
+        path = self.factor_path(code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['date', 'ratio'])
+            writer.writerows(factors)
+        return path
+
+    def fundamentals(self, code: str) -> Dict:
+        for name in ('fundamentals.json', 'fundamentals.csv'):
+            path = os.path.join(self.root, name)
+            if os.path.exists(path):
+                return load_source(path).get(code, {})
+        raise ProviderError("本地没有基本面数据")
+
+
+class ChainProvider(Provider):
+    """数据源链：依次尝试各数据源，行情按代码逐个补齐缺失部分"""
+
+    name = 'chain'
+
+    def __init__(self, *providers: Provider):
+        self.providers = list(providers)
+
+    def quotes(self, codes: List[str]) -> Dict[str, Dict]:
+        result: Dict[str, Dict] = {}
+        remaining = list(codes)
+        for provider in self.providers:
+            try:
+                result.update(provider.quotes(remaining))
+            except ProviderError:
+                continue
+            except Exception as e:
+                logger.warning("%s获取实时行情失败: %s", provider.name, e)
+                continue
+            remaining = [code for code in remaining if code not in result]
+            if not remaining:
+                break
+        return result
+
+    def bars(self, code: str, period: str = 'daily', limit: int = DEFAULT_BARS) -> 'pd.DataFrame':
+        import pandas as pd
+
+        for provider in self.providers:
+            try:
+                df = provider.bars(code, period, limit)
+            except ProviderError:
+                continue
+            except Exception as e:
+                logger.warning("%s获取K线失败: %s", provider.name, e)
+                continue
+            if not df.empty:
+                return df
+        return pd.DataFrame()
+
+    def fundamentals(self, code: str) -> Dict:
+        for provider in self.providers:
+            try:
+                data = provider.fundamentals(code)
+            except ProviderError:
+                continue
+            except Exception as e:
+                logger.warning("%s获取基本面数据失败: %s", provider.name, e)
+                continue
+            if data:
+                return data
+        return {}
+
+    def factors(self, code: str, raw: Optional['pd.DataFrame'] = None) -> Factors:
+        for provider in self.providers:
+            try:
+                return provider.factors(code, raw)
+            except ProviderError:
+                continue
+            except Exception as e:
+                logger.warning("%s获取复权因子失败: %s", provider.name, e)
+        raise ProviderError(f"没有数据源提供{code}的复权因子")
+
+
+def default_provider(
+    base_url: Optional[str] = None,
+    data_dir: Optional[str] = None,
+    transport: Callable[[str], str] = _fetch_text,
+) -> Provider:
+    """默认数据源链：带缓存的新浪和东方财富网络数据源，网络不可用时读取本地数据目录
+
+    base_url 指向本地行情网关时，行情和K线都经网关获取。
+    """
+    network = CacheProvider(ChainProvider(
+        SinaProvider(base_url or SINA_QUOTE_API, transport),
+        EastmoneyProvider(base_url or KLINE_API),
+    ))
+    data_dir = data_dir or os.environ.get(DATA_DIR_ENV)
+    if data_dir:
+        return ChainProvider(network, FileProvider(data_dir))
+    return network
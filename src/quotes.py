@@ -0,0 +1,128 @@
+"""
+新浪实时行情解析模块
+
+解析新浪行情接口返回的多行文本，支持一次请求批量获取多只股票。
+"""
+import re
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+SINA_QUOTE_API = "http://hq.sinajs.cn"
+SINA_HEADERS = {
+    'Referer': 'http://finance.sina.com.cn',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.159 Safari/537.36'
+}
+QUOTE_BATCH_SIZE = 100  # 单次请求的股票数量
+MIN_FIELDS = 32  # 完整行情的字段数
+
+# 新浪行情字段位置
+FIELD_INDEX = {
+    'open': 1,
+    'prev_close': 2,
+    'price': 3,
+    'high': 4,
+    'low': 5,
+    'bid': 6,
+    'ask': 7,
+    'volume': 8,
+    'amount': 9,
+}
+DEPTH_LEVELS = 5  # 五档盘口
+BID_START = 10  # 买一量的位置，之后依次为买一价、买二量……
+ASK_START = 20  # 卖一量的位置
+
+_LINE_RE = re.compile(r'var hq_str_(\w+)="([^"]*)"')
+
+
+def quote_url(codes: Iterable[str], base: str = SINA_QUOTE_API) -> str:
+    """生成批量行情请求地址"""
+    return f"{base}/list={','.join(codes)}"
+
+
+def batches(codes: Iterable[str], size: int = QUOTE_BATCH_SIZE) -> Iterator[List[str]]:
+    """按批次切分股票代码，逐批读取输入，不要求一次载入全部代码"""
+    codes = iter(codes)
+    while True:
+        batch = list(islice(codes, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_fields(code: str, values: List[str]) -> Optional[Dict]:
+    """将一只股票的字段列表解析为行情字典，数据不完整时返回None"""
+    if len(values) < MIN_FIELDS:
+        return None
+    try:
+        quote: Dict = {'code': code, 'name': values[0]}
+        for field, index in FIELD_INDEX.items():
+            quote[field] = float(values[index])
+        quote['bids'] = [
+            (float(values[BID_START + 2 * i + 1]), float(values[BID_START + 2 * i]))
+            for i in range(DEPTH_LEVELS)
+        ]
+        quote['asks'] = [
+            (float(values[ASK_START + 2 * i + 1]), float(values[ASK_START + 2 * i]))
+            for i in range(DEPTH_LEVELS)
+        ]
+    except ValueError:
+        return None
+    quote['date'] = values[30]
+    quote['time'] = values[31]
+    prev_close = quote['prev_close']
+    quote['change'] = round(quote['price'] - prev_close, 3) if prev_close else 0.0
+    quote['change_pct'] = round(quote['change'] / prev_close * 100, 2) if prev_close else 0.0
+    return quote
+
+
+def parse_sina(text: str) -> Dict[str, Dict]:
+    """解析新浪行情接口返回的文本，返回 代码 -> 行情字典"""
+    quotes = {}
+    for code, payload in _LINE_RE.findall(text):
+        quote = parse_fields(code, payload.split(','))
+        if quote is not None:
+            quotes[code] = quote
+    return quotes
+
+
+def format_fields(code: str, quote: Optional[Dict]) -> str:
+    """将行情字典还原为新浪接口的字段串(parse_fields的逆操作)，s_ 前缀的代码使用简版格式"""
+    if quote is None:
+        return ''
+    if code.startswith('s_'):
+        return ','.join([quote['name'], f"{quote['price']:.3f}", f"{quote['change']:.3f}",
+                         f"{quote['change_pct']:.2f}", f"{quote['volume'] / 100:.0f}",
+                         f"{quote['amount'] / 10000:.0f}"])
+    fields = [quote['name']]
+    fields += [f"{quote[field]:.3f}" for field in FIELD_INDEX if field not in ('volume', 'amount')]
+    fields += [f"{quote['volume']:.0f}", f"{quote['amount']:.3f}"]
+    empty = [(0.0, 0.0)] * DEPTH_LEVELS
+    for side in ('bids', 'asks'):
+        for price, volume in quote.get(side) or empty:
+            fields += [f"{volume:.0f}", f"{price:.3f}"]
+    fields += [quote.get('date', ''), quote.get('time', ''), '00']
+    return ','.join(fields)
+
+
+def format_sina(codes: Iterable[str], quotes: Dict[str, Dict]) -> str:
+    """按请求的代码生成新浪接口的响应文本，s_ 前缀的代码取对应的完整行情"""
+    return ''.join(
+        f'var hq_str_{code}="{format_fields(code, quotes.get(code[2:] if code.startswith("s_") else code))}";\n'
+        for code in codes
+    )
+
+
+def request_codes(url: str) -> List[str]:
+    """从新浪行情接口地址(…/list=代码,…)中取出股票代码"""
+    return [code for code in url.rsplit('list=', 1)[-1].split(',') if code]
+
+
+def fetch_quotes(codes: List[str], batch_size: int = QUOTE_BATCH_SIZE) -> Dict[str, Dict]:
+    """批量获取实时行情，每批只发一次请求"""
+    from . import fetch  # 延迟导入，使解析部分只依赖标准库
+
+    quotes: Dict[str, Dict] = {}
+    for batch in batches(codes, batch_size):
+        response = fetch.get(quote_url(batch), headers=SINA_HEADERS, encoding='gbk')
+        quotes.update(parse_sina(response.text))
+    return quotes
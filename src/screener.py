@@ -0,0 +1,189 @@
+"""
+全市场选股模块
+
+对本地K线目录中的每只股票只读取条件所需的列和末尾窗口，按最后一根K线对齐成 窗口×股票 的数组，
+所有条件各做一次向量化计算，同时满足的股票按第一个条件的得分排序。
+
+    python -m src.screener -d data --new-high --volume-spike 2 --top 50
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .log import get_logger
+from .metrics import registry
+from .providers import DATA_DIR_ENV, FileProvider
+
+logger = get_logger(__name__)
+
+WEEK52_BARS = 250  # 52周约250个交易日
+VOLUME_WINDOW = 20  # 均量的计算天数
+READ_WORKERS = 8  # 并发读取文件的线程数
+
+Window = Dict[str, np.ndarray]  # 列名 -> 窗口×股票 数组，历史不足的部分为NaN
+
+
+class Condition(NamedTuple):
+    """选股条件：evaluate 返回 (是否满足, 得分) 两个按股票排列的数组"""
+    name: str
+    columns: Tuple[str, ...]
+    window: int
+    evaluate: Callable[[Window], Tuple[np.ndarray, np.ndarray]]
+
+
+def _max(values: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(values), -np.inf, values).max(axis=0)
+
+
+def _mean(values: np.ndarray) -> np.ndarray:
+    count = (~np.isnan(values)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(values, axis=0) / count
+
+
+def new_high(window: int = WEEK52_BARS) -> Condition:
+    """收盘价创 window 日新高，此前不足 window 根K线(如新股)的不算"""
+    def evaluate(data: Window):
+        history = data['high'][:-1]
+        prior = _max(history)
+        close = data['close'][-1]
+        full = (~np.isnan(history)).sum(axis=0) >= window
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return full & (close > prior), close / prior - 1
+    return Condition(f"{window}日新高", ('high', 'close'), window + 1, evaluate)
+
+
+def volume_spike(ratio: float = 2.0, window: int = VOLUME_WINDOW) -> Condition:
+    """成交量超过前 window 日均量的 ratio 倍"""
+    def evaluate(data: Window):
+        volume = data['volume']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = volume[-1] / _mean(volume[:-1])
+            return score > ratio, score
+    return Condition(f"放量{ratio:g}倍", ('volume',), window + 1, evaluate)
+
+
+def ma_cross(fast: int = 5, slow: int = 20) -> Condition:
+    """快速均线当日上穿慢速均线"""
+    def evaluate(data: Window):
+        close = data['close']
+        fast_now, fast_prev = close[-fast:].mean(axis=0), close[-fast - 1:-1].mean(axis=0)
+        slow_now, slow_prev = close[-slow:].mean(axis=0), close[-slow - 1:-1].mean(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (fast_now > slow_now) & (fast_prev <= slow_prev), fast_now / slow_now - 1
+    return Condition(f"MA{fast}上穿MA{slow}", ('close',), slow + 1, evaluate)
+
+
+def gap(pct: float = 0.0, up: bool = True) -> Condition:
+    """向上跳空(开盘高于前日最高价)或向下跳空(开盘低于前日最低价)超过 pct"""
+    def evaluate(data: Window):
+        today = data['open'][-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if up:
+                score = today / data['high'][-2] - 1
+            else:
+                score = 1 - today / data['low'][-2]
+            return score > pct, score
+    columns = ('open', 'high') if up else ('open', 'low')
+    return Condition(f"{'向上' if up else '向下'}跳空", columns, 2, evaluate)
+
+
+def load_window(
+    files: FileProvider,
+    codes: List[str],
+    columns: List[str],
+    window: int,
+    workers: int = READ_WORKERS,
+) -> Tuple[List[str], np.ndarray, Window]:
+    """并发读取各股票最后 window 根日K线的指定列，返回 (代码, 最后日期, 窗口数组)"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(lambda code: files.load_bars(code, 'daily', columns, window), codes))
+    kept = [(code, df) for code, df in zip(codes, frames) if not df.empty]
+    data = {column: np.full((window, len(kept)), np.nan) for column in columns}
+    last_dates = np.empty(len(kept), dtype='datetime64[D]')
+    for i, (_, df) in enumerate(kept):
+        for column in columns:
+            values = df[column].to_numpy(dtype=np.float64)
+            data[column][window - len(values):, i] = values
+        last_dates[i] = df.index[-1].to_datetime64()
+    return [code for code, _ in kept], last_dates, data
+
+
+def screen(
+    files: FileProvider,
+    conditions: List[Condition],
+    codes: Optional[List[str]] = None,
+    workers: int = READ_WORKERS,
+) -> List[Dict]:
+    """对全部(或指定)股票执行选股，返回同时满足全部条件的股票，按第一个条件的得分降序
+
+    只考虑最后一根K线为最新交易日的股票，停牌股票的旧数据不会触发条件。
+    """
+    if not conditions:
+        raise ValueError("至少需要一个选股条件")
+    codes = files.codes() if codes is None else codes
+    columns = sorted({column for condition in conditions for column in condition.columns} | {'close'})
+    window = max(condition.window for condition in conditions)
+    with registry.timer('screen_seconds'):
+        codes, last_dates, data = load_window(files, codes, columns, window, workers)
+        if not codes:
+            return []
+        matched = last_dates == last_dates.max()
+        scores = {}
+        for condition in conditions:
+            mask, score = condition.evaluate(data)
+            matched &= mask
+            scores[condition.name] = score
+        order = np.argsort(-scores[conditions[0].name][matched], kind='stable')
+        selected = np.flatnonzero(matched)[order]
+    logger.info("扫描%d只股票，%d只满足条件", len(codes), len(selected))
+    return [
+        dict({'code': codes[i], 'date': str(last_dates[i]), 'close': float(data['close'][-1, i])},
+             **{name: float(score[i]) for name, score in scores.items()})
+        for i in selected
+    ]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="基于本地K线的全市场选股")
+    parser.add_argument("-d", "--data-dir", help="本地K线目录", default=os.environ.get(DATA_DIR_ENV))
+    parser.add_argument("--new-high", help="创N日新高", nargs='?', type=int, const=WEEK52_BARS)
+    parser.add_argument("--volume-spike", help="成交量超过20日均量的K倍", type=float)
+    parser.add_argument("--ma-cross", help="快慢均线金叉,如 5,20", type=str)
+    parser.add_argument("--gap-up", help="向上跳空超过的比例", nargs='?', type=float, const=0.0)
+    parser.add_argument("--gap-down", help="向下跳空超过的比例", nargs='?', type=float, const=0.0)
+    parser.add_argument("--top", help="显示前N只股票", type=int, default=50)
+    args = parser.parse_args()
+    if not args.data_dir:
+        parser.error(f"请通过 -d 或环境变量 {DATA_DIR_ENV} 指定本地K线目录")
+
+    conditions = []
+    if args.new_high is not None:
+        conditions.append(new_high(args.new_high))
+    if args.volume_spike is not None:
+        conditions.append(volume_spike(args.volume_spike))
+    if args.ma_cross:
+        fast, slow = (int(value) for value in args.ma_cross.split(','))
+        conditions.append(ma_cross(fast, slow))
+    if args.gap_up is not None:
+        conditions.append(gap(args.gap_up, up=True))
+    if args.gap_down is not None:
+        conditions.append(gap(args.gap_down, up=False))
+    if not conditions:
+        parser.error("请至少指定一个选股条件")
+
+    results = screen(FileProvider(args.data_dir), conditions)
+    names = [condition.name for condition in conditions]
+    print(f"{'代码':<10}{'日期':<12}{'收盘价':>10}" + ''.join(f"{name:>14}" for name in names))
+    for row in results[:args.top]:
+        print(f"{row['code']:<10}{row['date']:<12}{row['close']:>10.2f}"
+              + ''.join(f"{row[name]:>14.4f}" for name in names))
+    print(f"共{len(results)}只股票满足条件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+多进程分片行情轮询
+
+按股票代码的CRC32把代码列表确定性地分给N个子进程，每个子进程只拉取和解析自己的分片，
+把结果(含五档盘口)按固定列打包成float64矩阵，经管道以原始字节发给父进程，父进程直接在字节上构造数组视图。
+各子进程平分每个主机的请求速率，总速率与单进程轮询相同。监督线程在子进程崩溃后按退避时间重启该分片。
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import fetch
+from .log import get_logger
+from .metrics import registry
+from .orderbook import ASK, BID, depth_from_quotes
+from .quotes import DEPTH_LEVELS, QUOTE_BATCH_SIZE, fetch_quotes
+from .trading_calendar import poll_interval
+
+logger = get_logger(__name__)
+
+QUOTE_COLUMNS = ('open', 'prev_close', 'price', 'high', 'low', 'bid', 'ask', 'volume', 'amount')
+DEPTH_WIDTH = 2 * DEPTH_LEVELS * 2  # 五档盘口按 买卖×档位×(价, 量) 展平后的列数
+ROW_WIDTH = len(QUOTE_COLUMNS) + DEPTH_WIDTH
+REFRESH_INTERVAL = 1.0  # 默认刷新间隔(秒)
+RESTART_BACKOFF = 1.0  # 分片崩溃后首次重启的等待时间(秒)
+RESTART_BACKOFF_MAX = 30.0
+NAMES_MESSAGE = b'N'  # 消息类型: 股票名称(JSON)
+QUOTES_MESSAGE = b'Q'  # 消息类型: 行情矩阵(原始字节)
+
+
+def shard_of(code: str, shards: int) -> int:
+    """股票代码所属的分片，不受进程哈希随机化影响"""
+    return zlib.crc32(code.encode('ascii')) % shards
+
+
+def partition(codes: List[str], shards: int) -> List[List[str]]:
+    """把代码列表分成 shards 份，分片内保持输入顺序"""
+    result: List[List[str]] = [[] for _ in range(shards)]
+    for code in codes:
+        result[shard_of(code, shards)].append(code)
+    return result
+
+
+def _shard_main(codes: List[str], interval: float, conn, batch_size: int,
+                fetcher: Callable = fetch_quotes, market_hours: bool = False, processes: int = 1):
+    """子进程入口，Ctrl+C由父进程处理"""
+    fetch.share_rates(processes)
+    try:
+        _poll_shard(codes, interval, conn, batch_size, fetcher, market_hours)
+    except KeyboardInterrupt:
+        pass
+
+
+def _poll_shard(codes: List[str], interval: float, conn, batch_size: int, fetcher: Callable,
+                market_hours: bool = False):
+    """子进程主循环：拉取分片行情并发给父进程，父进程退出后结束"""
+    index = {code: i for i, code in enumerate(codes)}
+    matrix = np.full((len(codes), ROW_WIDTH), np.nan)
+    names: Dict[str, str] = {}
+    while True:
+        started = time.monotonic()
+        try:
+            quotes = fetcher(codes, batch_size)
+        except Exception as e:
+            logger.warning("分片拉取行情出错: %s", e)
+            quotes = {}
+        new_names = {code: q['name'] for code, q in quotes.items() if names.get(code) != q['name']}
+        if quotes:
+            rows = [index[code] for code in quotes]
+            matrix[rows, :len(QUOTE_COLUMNS)] = [[quote[column] for column in QUOTE_COLUMNS]
+                                                 for quote in quotes.values()]
+            matrix[rows, len(QUOTE_COLUMNS):] = depth_from_quotes(quotes.values()).reshape(len(rows), -1)
+        try:
+            if new_names:
+                names.update(new_names)
+                conn.send_bytes(NAMES_MESSAGE + json.dumps(new_names, ensure_ascii=False).encode('utf-8'))
+            conn.send_bytes(QUOTES_MESSAGE + matrix.tobytes())
+        except (BrokenPipeError, EOFError, OSError):
+            return
+        time.sleep(max(0.0, poll_interval(interval, market_hours) - (time.monotonic() - started)))
+
+
+class ShardedPoller(threading.Thread):
+    """多进程分片轮询器，只把发生变化的行情交给回调，回调参数与 QuotePoller 相同"""
+
+    def __init__(
+        self,
+        codes: List[str],
+        on_update: Callable[[Dict[str, Dict]], None],
+        interval: float = REFRESH_INTERVAL,
+        processes: Optional[int] = None,
+        batch_size: int = QUOTE_BATCH_SIZE,
+        fetcher: Callable = fetch_quotes,
+        market_hours: bool = False,
+    ):
+        super().__init__(daemon=True)
+        self.codes = list(codes)
+        self.on_update = on_update
+        self.interval = interval
+        self.batch_size = batch_size
+        self.fetcher = fetcher
+        self.market_hours = market_hours
+        processes = max(1, min(processes or os.cpu_count() or 1, len(self.codes) or 1))
+        self.shards = partition(self.codes, processes)
+        position = {code: i for i, code in enumerate(self.codes)}
+        self._rows = [np.array([position[code] for code in shard], dtype=np.int64)
+                      for shard in self.shards]
+        self.board = np.full((len(self.codes), ROW_WIDTH), np.nan)
+        self.names: Dict[str, str] = {}
+        self.restarts = [0] * processes
+        self._context = multiprocessing.get_context('spawn')
+        self._procs: List[Optional[multiprocessing.Process]] = [None] * processes
+        self._conns: list = [None] * processes
+        self._restart_at: Dict[int, float] = {}
+        self._stop_event = threading.Event()
+
+    def _spawn(self, shard: int):
+        reader, writer = self._context.Pipe(duplex=False)
+        proc = self._context.Process(
+            target=_shard_main,
+            args=(self.shards[shard], self.interval, writer, self.batch_size, self.fetcher,
+                  self.market_hours, len(self.shards)),
+            daemon=True,
+        )
+        proc.start()
+        writer.close()
+        self._procs[shard] = proc
+        self._conns[shard] = reader
+
+    def _crashed(self, shard: int):
+        proc = self._procs[shard]
+        self._conns[shard].close()
+        self._procs[shard] = self._conns[shard] = None
+        backoff = min(RESTART_BACKOFF * 2 ** self.restarts[shard], RESTART_BACKOFF_MAX)
+        self.restarts[shard] += 1
+        self._restart_at[shard] = time.monotonic() + backoff
+        registry.counter('shard_restarts_total', '分片子进程重启次数').inc()
+        logger.warning("分片%d子进程退出(退出码%s)，%.1f秒后重启", shard, proc.exitcode, backoff)
+
+    def apply(self, shard: int, message: bytes) -> Dict[str, Dict]:
+        """处理一条分片消息，返回发生变化的行情"""
+        kind, payload = message[:1], memoryview(message)[1:]
+        if kind == NAMES_MESSAGE:
+            self.names.update(json.loads(bytes(payload).decode('utf-8')))
+            return {}
+        rows = self._rows[shard]
+        block = np.frombuffer(payload, dtype=np.float64).reshape(len(rows), ROW_WIDTH)
+        previous = self.board[rows]
+        same = (block == previous) | (np.isnan(block) & np.isnan(previous))
+        changed = np.flatnonzero(~same.all(axis=1) & ~np.isnan(block).all(axis=1))
+        self.board[rows] = block
+        return {self.codes[rows[i]]: self.quote(rows[i]) for i in changed}
+
+    def quote(self, row: int) -> Dict:
+        """把看板中的一行转换为行情字典"""
+        code = self.codes[row]
+        values = self.board[row]
+        quote = dict(zip(QUOTE_COLUMNS, values[:len(QUOTE_COLUMNS)].tolist()))
+        depth = values[len(QUOTE_COLUMNS):].reshape(2, DEPTH_LEVELS, 2).tolist()
+        quote['bids'] = [tuple(level) for level in depth[BID]]
+        quote['asks'] = [tuple(level) for level in depth[ASK]]
+        quote['code'] = code
+        quote['name'] = self.names.get(code, '')
+        prev_close = quote['prev_close']
+        quote['change'] = round(quote['price'] - prev_close, 3) if prev_close else 0.0
+        quote['change_pct'] = round(quote['change'] / prev_close * 100, 2) if prev_close else 0.0
+        return quote
+
+    def run(self):
+        for shard in range(len(self.shards)):
+            self._spawn(shard)
+        try:
+            while not self._stop_event.is_set():
+                self._supervise()
+        finally:
+            for proc in self._procs:
+                if proc is not None and proc.is_alive():
+                    proc.terminate()
+
+    def _supervise(self):
+        """等待一轮分片消息，重启到期的分片并回调变化的行情"""
+        now = time.monotonic()
+        for shard, due in list(self._restart_at.items()):
+            if now >= due:
+                del self._restart_at[shard]
+                self._spawn(shard)
+        handles = {}
+        for shard, (proc, conn) in enumerate(zip(self._procs, self._conns)):
+            if proc is not None:
+                handles[conn] = shard
+                handles[proc.sentinel] = shard
+        changed: Dict[str, Dict] = {}
+        for handle in wait(list(handles), timeout=0.2):
+            shard = handles[handle]
+            if self._conns[shard] is None:
+                continue
+            if handle is self._conns[shard]:
+                try:
+                    changed.update(self.apply(shard, handle.recv_bytes()))
+                except (EOFError, OSError):
+                    self._procs[shard].join(1.0)
+                    self._crashed(shard)
+            elif not self._procs[shard].is_alive():
+                self._crashed(shard)
+        if changed:
+            self.on_update(changed)
+
+    def stop(self):
+        """停止轮询，子进程在监督线程退出时结束"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,105 @@
+"""
+启动状态快照
+
+退出时和运行中定期保存界面状态：行情、当前周期等小数据写入 manifest.json，每张K线表写为一个结构化 .npy 文件。
+重新启动时以内存映射方式读回，图表先按快照绘制，新数据到达后再在后台校正。
+"""
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .fundamentals import CACHE_DIR
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+SNAPSHOT_INTERVAL_MS = 60 * 1000  # 运行中定期保存快照的间隔(毫秒)
+MANIFEST = 'manifest.json'
+VERSION = 1
+INDEX_FIELD = '_index'  # 结构化数组中保存K线时间索引的字段
+
+Frames = Dict[str, pd.DataFrame]
+
+
+def snapshot_path(name: str) -> str:
+    """某个程序的快照目录"""
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def frame_to_records(df: pd.DataFrame) -> np.ndarray:
+    """K线表(时间索引，数值列)转为结构化数组"""
+    columns = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+    index = pd.DatetimeIndex(df.index).values
+    records = np.empty(len(df), dtype=[(INDEX_FIELD, index.dtype)] + [(str(c), 'f8') for c in columns])
+    records[INDEX_FIELD] = index
+    for column in columns:
+        records[str(column)] = df[column].to_numpy(dtype=np.float64)
+    return records
+
+
+def records_to_frame(records: np.ndarray, index_name: Optional[str] = None) -> pd.DataFrame:
+    """结构化数组转回K线表，各列直接引用数组中的字段(不复制)，内存映射的数组得到只读的K线表"""
+    columns = [name for name in records.dtype.names if name != INDEX_FIELD]
+    index = pd.DatetimeIndex(records[INDEX_FIELD], name=index_name, copy=False)
+    return pd.DataFrame({column: records[column] for column in columns}, index=index, copy=False)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法保存到快照: {type(value).__name__}")
+
+
+def save(path: str, state: Dict, frames: Frames):
+    """写入快照：先写到临时目录，完成后替换旧快照，读取方不会看到写了一半的快照"""
+    with registry.timer('snapshot_seconds', op='save'):
+        tmp, old = f"{path}.tmp", f"{path}.old"
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            entries = {}
+            for i, (key, df) in enumerate(frames.items()):
+                entries[key] = {'file': f"{i}.npy", 'index': df.index.name}
+                np.save(os.path.join(tmp, f"{i}.npy"), frame_to_records(df))
+            manifest = {'version': VERSION, 'saved': time.time(), 'state': state, 'frames': entries}
+            with open(os.path.join(tmp, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, default=_json_default)
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.exists(path):
+                os.replace(path, old)
+            os.replace(tmp, path)
+            shutil.rmtree(old, ignore_errors=True)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("保存状态快照失败: %s", e)
+            return
+    logger.debug("已保存状态快照: %s(%d张K线表)", path, len(frames))
+
+
+def load(path: str) -> Optional[Tuple[Dict, Frames]]:
+    """读取快照，返回 (状态, K线表)；K线表直接建立在内存映射的文件上，按需从磁盘读入，
+    不解析也不复制。没有可用快照时为None"""
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with registry.timer('snapshot_seconds', op='load'):
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != VERSION:
+                return None
+            frames = {}
+            for key, entry in manifest['frames'].items():
+                records = np.load(os.path.join(path, entry['file']), mmap_mode='r')
+                frames[key] = records_to_frame(records, entry['index'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("读取状态快照失败: %s", e)
+            return None
+    logger.info("已读取%.0f秒前的状态快照", time.time() - manifest['saved'])
+    return manifest['state'], frames
@@ -0,0 +1,85 @@
+"""
+并发启动流水线
+
+启动时所有代码的K线和行情请求同时提交给工作线程，结果到达后放入就绪队列，
+由主线程(图形界面线程)定时取出并逐个面板渲染，首屏时间约为一次往返而不是N次之和。
+"""
+import queue
+import time
+from collections import Counter
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Tuple
+
+import matplotlib.pyplot as plt
+
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+POLL_INTERVAL_MS = 50  # 主线程检查就绪结果的间隔(毫秒)
+
+Task = Tuple[str, Hashable, Callable, tuple]  # (类型, 键, 函数, 参数)
+Result = Tuple[str, Hashable, Any]  # (类型, 键, 结果)，出错时结果为None
+
+
+def interactive_backend() -> bool:
+    """当前matplotlib后端是否为交互式(有事件循环，定时器可用)"""
+    backend = plt.get_backend().lower()
+    try:
+        from matplotlib.backends import BackendFilter, backend_registry
+        return backend in backend_registry.list_builtin(BackendFilter.INTERACTIVE)
+    except ImportError:
+        from matplotlib import rcsetup
+        return backend in [name.lower() for name in rcsetup.interactive_bk]
+
+
+class StartupPipeline:
+    """把启动任务提交给工作线程，收集按到达顺序排列的结果"""
+
+    def __init__(self, submit: Callable[[Callable, tuple], None]):
+        self.submit = submit
+        self.started = time.monotonic()
+        self._ready: "queue.Queue[Result]" = queue.Queue()
+        self._pending: Counter = Counter()
+
+    def start(self, tasks: Iterable[Task]):
+        """一次性提交全部任务"""
+        for kind, key, func, args in tasks:
+            self._pending[kind] += 1
+            self.submit(self._run, (kind, key, func, args))
+
+    def _run(self, kind: str, key: Hashable, func: Callable, args: tuple):
+        try:
+            result = func(*args)
+        except Exception as e:
+            logger.error("启动任务%s(%s)出错: %s", kind, key, e)
+            result = None
+        self._ready.put((kind, key, result))
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        """尚未取出的任务数"""
+        return self._pending[kind] if kind else sum(self._pending.values())
+
+    @property
+    def done(self) -> bool:
+        return self.pending() == 0
+
+    def drain(self, block: bool = False) -> List[Result]:
+        """取出已就绪的结果，block 为True时至少等待一个"""
+        results = []
+        while self.pending():
+            try:
+                result = self._ready.get(block=block and not results)
+            except queue.Empty:
+                break
+            self._pending[result[0]] -= 1
+            results.append(result)
+        return results
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def mark(self, name: str):
+        """记录某个渲染里程碑距启动的时间"""
+        registry.gauge('startup_seconds', '启动到渲染里程碑的时间(秒)', stage=name).set(self.elapsed())
+        logger.info("启动%s: %.2f秒", name, self.elapsed())
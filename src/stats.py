@@ -0,0 +1,272 @@
+"""
+行情统计缓存
+
+由日K线增量维护每只股票的52周最高/最低价、20/60日均量、相对上证指数的贝塔系数和年化波动率。
+每新增一根K线只做常数次运算(52周极值移出窗口时才重算)，滚动窗口和统计结果都持久化，
+详情面板按代码直接读取统计结果，不在绘制时扫描历史。
+
+    python -m src.stats -c sh600000,sz000001 [-d data]
+"""
+import argparse
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .fundamentals import CACHE_DIR
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+STATS_WINDOW = 250  # 52周约250个交易日
+MARKET_INDEX = 'sh000001'  # 计算贝塔系数的基准指数
+MIN_SAMPLES = 20  # 计算贝塔系数和波动率所需的最少收益率样本
+TRADING_DAYS = 252
+STATS_FILE = os.path.join(CACHE_DIR, 'stats.json')
+STATE_FILE = os.path.join(CACHE_DIR, 'stats_state.npz')
+
+# 滚动窗口的列
+DATE, HIGH, LOW, VOLUME, RETURN, MARKET_RETURN = range(6)
+STATE_COLUMNS = 6
+META_SUFFIX = '.meta'  # 持久化文件中窗口元数据(已推入K线数, 最后收盘价, 最后日期)的键后缀
+
+
+class RollingStats:
+    """一只股票的滚动窗口和累计量"""
+
+    def __init__(self, window: int = STATS_WINDOW, data: Optional[np.ndarray] = None,
+                 meta: Optional[np.ndarray] = None):
+        self.window = window if data is None else len(data)
+        self.data = np.full((self.window, STATE_COLUMNS), np.nan) if data is None else data.copy()
+        count, last_close, last_date = (0, np.nan, -1) if meta is None else meta.tolist()
+        self.count, self.last_close, self.last_date = int(count), float(last_close), int(last_date)
+        self._rebuild()
+
+    def _rows(self, n: int) -> np.ndarray:
+        """最近 n 根K线在窗口中的位置"""
+        n = min(n, self.count, self.window)
+        return (self.count - 1 - np.arange(n)) % self.window
+
+    def _rebuild(self):
+        """由窗口重新计算全部累计量，加载时使用以免误差累积"""
+        data = self.data
+        self.high = _nanmax(data[:, HIGH])
+        self.low = _nanmin(data[:, LOW])
+        self._volume = {n: float(np.nansum(data[self._rows(n), VOLUME])) for n in (20, 60)}
+        self._returns = np.zeros(3)  # 样本数, 和, 平方和
+        self._pairs = np.zeros(6)  # 样本数, Σx, Σy, Σxx, Σyy, Σxy (x为指数收益, y为个股收益)
+        for row in data:
+            self._accumulate(row, 1)
+
+    def _accumulate(self, row: np.ndarray, sign: int):
+        y, x = row[RETURN], row[MARKET_RETURN]
+        if np.isfinite(y):
+            self._returns += sign * np.array([1.0, y, y * y])
+            if np.isfinite(x):
+                self._pairs += sign * np.array([1.0, x, y, x * x, y * y, x * y])
+
+    def push(self, day: int, high: float, low: float, close: float, volume: float,
+             market_return: Optional[float] = None) -> bool:
+        """推入一根新K线(day 为自1970-01-01起的天数)，不晚于已有K线时忽略
+
+        market_return 为None时以自身收益率作为基准收益率(用于指数本身)。
+        """
+        if day <= self.last_date:
+            return False
+        ret = close / self.last_close - 1 if self.last_close > 0 else np.nan
+        slot = self.count % self.window
+        old = self.data[slot].copy()
+        for n in self._volume:
+            if self.count >= n:
+                self._volume[n] -= np.nan_to_num(self.data[(self.count - n) % self.window, VOLUME])
+            self._volume[n] += np.nan_to_num(volume)
+        self._accumulate(old, -1)
+        row = self.data[slot]
+        row[:] = (day, high, low, volume, ret, ret if market_return is None else market_return)
+        self._accumulate(row, 1)
+        # 移出窗口的是当前极值时才重算
+        self.high = _nanmax(self.data[:, HIGH]) if old[HIGH] == self.high else np.fmax(self.high, high)
+        self.low = _nanmin(self.data[:, LOW]) if old[LOW] == self.low else np.fmin(self.low, low)
+        self.count += 1
+        self.last_close, self.last_date = close, day
+        return True
+
+    def market_return(self, day: int) -> float:
+        """窗口内某日的收益率，没有该日数据时为NaN"""
+        rows = np.flatnonzero(self.data[:, DATE] == day)
+        return float(self.data[rows[0], RETURN]) if rows.size else np.nan
+
+    def summary(self) -> Dict:
+        """当前统计结果"""
+        result: Dict = {'date': str(np.datetime64(self.last_date, 'D')),
+                        'week52_high': _round(self.high), 'week52_low': _round(self.low)}
+        for n, total in self._volume.items():
+            samples = min(self.count, n)
+            if samples:
+                result['avg_volume' if n == 20 else f'avg_volume{n}'] = round(total / samples, 2)
+        n, total, squares = self._returns
+        if n >= MIN_SAMPLES:
+            variance = max(squares / n - (total / n) ** 2, 0.0) * n / (n - 1)
+            result['volatility'] = round(float(np.sqrt(variance * TRADING_DAYS)), 4)
+        n, sx, sy, sxx, _, sxy = self._pairs
+        denominator = n * sxx - sx * sx
+        if n >= MIN_SAMPLES and denominator > 0:
+            result['beta'] = round(float((n * sxy - sx * sy) / denominator), 4)
+        return result
+
+    def meta(self) -> np.ndarray:
+        return np.array([self.count, self.last_close, self.last_date], dtype=np.float64)
+
+
+def _nanmax(values: np.ndarray) -> float:
+    return float(np.fmax.reduce(values)) if len(values) else np.nan
+
+
+def _nanmin(values: np.ndarray) -> float:
+    return float(np.fmin.reduce(values)) if len(values) else np.nan
+
+
+def _round(value: float) -> Optional[float]:
+    return round(value, 3) if np.isfinite(value) else None
+
+
+class StatsCache:
+    """按代码保存统计结果和滚动窗口，读取为O(1)，滚动窗口按需从持久化文件加载"""
+
+    def __init__(self, path: Optional[str] = STATS_FILE, state_path: Optional[str] = STATE_FILE,
+                 market: str = MARKET_INDEX, window: int = STATS_WINDOW):
+        self.path = path
+        self.state_path = state_path
+        self.market = market
+        self.window = window
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Dict] = {}
+        self._states: Dict[str, RollingStats] = {}
+        self._archive = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("读取统计缓存失败: %s", e)
+        if state_path and os.path.exists(state_path):
+            try:
+                self._archive = np.load(state_path)
+            except (OSError, ValueError) as e:
+                logger.warning("读取统计窗口失败: %s", e)
+
+    def get(self, code: str) -> Dict:
+        """返回一只股票的统计结果，没有时为空字典"""
+        stats = self._stats.get(code)
+        registry.hit('stats', stats is not None)
+        return dict(stats) if stats else {}
+
+    def state(self, code: str) -> RollingStats:
+        """一只股票的滚动窗口，首次访问时从持久化文件加载"""
+        with self._lock:
+            state = self._states.get(code)
+            if state is None:
+                if self._archive is not None and code in self._archive.files:
+                    state = RollingStats(data=self._archive[code], meta=self._archive[code + META_SUFFIX])
+                else:
+                    state = RollingStats(self.window)
+                self._states[code] = state
+            return state
+
+    def update(self, code: str, bars) -> Dict:
+        """用日K线(DataFrame)增量更新，只推入比已有数据更新的K线，返回最新统计结果
+
+        个股的贝塔系数需要基准指数先更新到相同日期。
+        """
+        if bars.empty:
+            return self.get(code)
+        with self._lock:
+            state = self.state(code)
+            market = None if code == self.market else self.state(self.market)
+            days = bars.index.values.astype('datetime64[D]').astype(np.int64)
+            new = np.flatnonzero(days > state.last_date)
+            columns = [bars[column].to_numpy(dtype=np.float64) for column in ('high', 'low', 'close', 'volume')]
+            for i in new:
+                day = int(days[i])
+                state.push(day, *(column[i] for column in columns),
+                           market_return=None if market is None else market.market_return(day))
+            if new.size or code not in self._stats:
+                self._stats[code] = state.summary()
+            return dict(self._stats[code])
+
+    def refresh(self, codes: Iterable[str], provider) -> Dict[str, Dict]:
+        """从数据源获取最近一个窗口的日K线并更新基准指数和各股票，然后保存"""
+        codes = list(codes)
+        result = {}
+        for code in [self.market] + [code for code in codes if code != self.market]:
+            bars = provider.bars(code, 'daily', self.window + 1)
+            result[code] = self.update(code, bars)
+        self.save()
+        return {code: result[code] for code in codes}
+
+    def save(self):
+        """将统计结果和滚动窗口写入文件"""
+        if not self.path or not self.state_path:
+            return
+        with self._lock:
+            if self._archive is not None:
+                for key in self._archive.files:
+                    if not key.endswith(META_SUFFIX):
+                        self.state(key)
+                self._archive.close()
+                self._archive = None
+            snapshot = json.dumps(self._stats, ensure_ascii=False)
+            arrays = {}
+            for code, state in self._states.items():
+                arrays[code] = state.data
+                arrays[code + META_SUFFIX] = state.meta()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(f"{self.state_path}.tmp", 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(f"{self.state_path}.tmp", self.state_path)
+                with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+                    f.write(snapshot)
+                os.replace(f"{self.path}.tmp", self.path)
+            except OSError as e:
+                logger.warning("写入统计缓存失败: %s", e)
+
+
+_cache: Optional[StatsCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache() -> StatsCache:
+    """获取全局统计缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = StatsCache()
+        return _cache
+
+
+def main():
+    """主函数"""
+    from .dashboard import read_codes
+    from .providers import FileProvider, default_provider
+
+    parser = argparse.ArgumentParser(description="更新行情统计缓存")
+    parser.add_argument("-c", "--codes", help="股票代码列表,使用逗号分隔", type=str)
+    parser.add_argument("-f", "--file", help="股票代码文件,每行一个代码", type=str)
+    parser.add_argument("-d", "--data-dir", help="本地K线目录,默认从网络获取", type=str)
+    args = parser.parse_args()
+    provider = FileProvider(args.data_dir) if args.data_dir else default_provider()
+    codes = read_codes(args.codes, args.file)
+    if not codes and args.data_dir:
+        codes = provider.codes()
+    if not codes:
+        parser.error("请通过 -c 或 -f 指定股票代码")
+    for code, stats in cache().refresh(codes, provider).items():
+        print(code, json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,13 @@ os.environ['MPLBACKEND'] = 'MacOSX'  # MacOS系统
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import pandas as pd
-import requests
-import json
+
+from . import fetch, profiling, snapshot
+from .bars import BarPyramid
+from .log import get_logger
+from .metrics import registry
+from .providers import Provider, default_provider
+from .startup import POLL_INTERVAL_MS, StartupPipeline, interactive_backend
 
 # 添加中文字体支持
 plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'Arial Unicode MS']  # 优先使用微软雅黑字体
@@ -26,8 +31,12 @@ plt.rcParams['axes.unicode_minus'] = False
 MAX_FIELDS = 32
 MAX_HISTORY = 100
 UPDATE_INTERVAL = 6  # 更新间隔(秒)
+QUOTE_API = "http://hq.sinajs.cn"  # 实时行情接口
 PLOT_WIDTH = 0.8  # K线图宽度
 PLOT_WIDTH_SHADOW = 0.2  # K线图影线宽度
+DAILY_BARS = 30  # 显示的日K线数量
+
+logger = get_logger(__name__)
 
 class Worker(threading.Thread):
     """工作线程类"""
@@ -39,6 +48,7 @@ class Worker(threading.Thread):
     def run(self):
         while True:
             func, args = self.queue.get()
+            registry.gauge('worker_queue_depth', '工作队列中等待的任务数').set(self.queue.qsize())
             try:
                 func(*args)
             finally:
@@ -46,10 +56,23 @@ class Worker(threading.Thread):
 
 class Stock:
     """股票数据处理类"""
-    def __init__(self, code: str, thread_num: int = 3):
-        """初始化股票数据处理对象"""
+    def __init__(
+        self,
+        code: str,
+        thread_num: int = 3,
+        max_threads: int = fetch.CONCURRENCY_MAX,
+        base_url: Optional[str] = None,
+        provider: Optional[Provider] = None,
+        snapshot_path: Optional[str] = None,
+    ):
+        """初始化股票数据处理对象，base_url 指向本地行情网关时行情和K线都经网关获取，
+        provider 为自定义数据源(默认为带缓存的网络数据源链)，snapshot_path 为状态快照目录(为空时不使用快照)"""
         self.code = code
+        self.snapshot_path = snapshot_path
+        self.quote_api = base_url.rstrip('/') if base_url else QUOTE_API
+        self.provider = provider or default_provider(base_url)
         self.queue = Queue()
+        self.max_threads = max(max_threads, thread_num)
         self.threads = [Worker(self.queue) for _ in range(thread_num)]
         for thread in self.threads:
             thread.start()
@@ -60,9 +83,12 @@ class Stock:
         self.current_name = ""
         self.current_prices: Dict[str, float] = {}
         self.change_pcts: Dict[str, float] = {}
+        self.codes: List[str] = []
         
         # 日K线数据
         self.daily_data: Dict[str, pd.DataFrame] = {}
+        # 每只股票的多周期K线金字塔
+        self.pyramids: Dict[str, BarPyramid] = {}
 
     def create_figure(self):
         """创建图表"""
@@ -83,90 +109,33 @@ class Stock:
     ) -> Tuple[int, Optional[Tuple[str, float, float]]]:
         """获取股票数据"""
         try:
-            url = f"http://hq.sinajs.cn/list={code}"
-            response = requests.get(url, headers={
-                'Referer': 'http://finance.sina.com.cn',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.159 Safari/537.36'
-            })
-            response.encoding = 'gbk'
-            
-            data_str = response.text
-            if "var hq_str_" not in data_str:
-                print(f"API返回格式不正确: {data_str[:100]}")
-                return code_index, None
-                
-            # 从返回结果中提取数据字符串
-            data_parts = data_str.split('="')
-            if len(data_parts) < 2:
-                return code_index, None
-                
-            data = data_parts[1].split('",')[0].split(',')
-            
-            if len(data) < 32:  # 确保数据完整
-                print(f"数据不完整，长度为{len(data)}")
-                return code_index, None
-                
-            name = data[0]
-            yesterday_close = float(data[2])
-            current_price = float(data[3])
-            change = round((current_price - yesterday_close) / yesterday_close * 100, 2)
-            
-            return code_index, (name, current_price, change)
+            quote = self.provider.quotes([code]).get(code)
         except Exception as e:
-            print(f"获取实时数据出错: {e}")
+            logger.error("获取实时数据出错: %s", e)
             return code_index, None
-            
+        if quote is None:
+            logger.warning("无法获取%s的实时数据", code)
+            return code_index, None
+        return code_index, (quote['name'], quote['price'], quote['change_pct'])
+
     def get_daily_k_data(self, code: str) -> pd.DataFrame:
         """获取日K线数据"""
-        try:
-            # 提取股票代码
-            stock_code = code[2:]  # 去掉sh或sz前缀
-            
-            # 东方财富网API接口，提供更可靠的历史K线数据
-            market = "1" if code.startswith("sh") else "0"
-            url = f"http://push2his.eastmoney.com/api/qt/stock/kline/get?secid={market}.{stock_code}&fields1=f1,f2,f3,f4,f5,f6&fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&klt=101&fqt=0&end=20500101&lmt=30"
-            
-            print(f"请求日K线数据URL: {url}")
-            
-            response = requests.get(url)
-            data = response.json()
-            
-            if 'data' not in data or data['data'] is None or 'klines' not in data['data']:
-                print(f"无法获取K线数据: {json.dumps(data)[:200]}")
-                return pd.DataFrame()
-            
-            klines = data['data']['klines']
-            print(f"成功获取到{len(klines)}条K线数据记录")
-            
-            # 解析K线数据
-            ohlc_data = []
-            for line in klines:
-                parts = line.split(',')
-                if len(parts) >= 6:
-                    date = parts[0]
-                    ohlc_data.append({
-                        'date': datetime.strptime(date, '%Y-%m-%d'),
-                        'open': float(parts[1]),
-                        'close': float(parts[2]),
-                        'high': float(parts[3]),
-                        'low': float(parts[4]),
-                        'volume': float(parts[5])
-                    })
-            
-            # 创建DataFrame
-            df = pd.DataFrame(ohlc_data)
-            
-            if not df.empty:
-                # 设置日期为索引
-                df.set_index('date', inplace=True)
-                print("日K线数据列:", df.columns.tolist())
-                print(f"数据范围: {df.index.min()} 到 {df.index.max()}")
-            
-            return df
-        except Exception as e:
-            print(f"获取日K线数据出错: {str(e)}")
-            # 返回空DataFrame
-            return pd.DataFrame()
+        df = self.provider.bars(code, 'daily', DAILY_BARS)
+        if df.empty:
+            logger.warning("无法获取%s的日K线数据", code)
+        else:
+            logger.debug("数据范围: %s 到 %s", df.index.min(), df.index.max())
+        return df
+
+    def get_pyramid(self, code: str) -> BarPyramid:
+        """获取股票的K线金字塔，首次访问时下载日K线"""
+        pyramid = self.pyramids.get(code)
+        if pyramid is None:
+            pyramid = self.pyramids[code] = BarPyramid(code)
+        registry.hit('kline_download', not pyramid.empty)
+        if pyramid.empty:
+            pyramid.load(daily=self.get_daily_k_data(code))
+        return pyramid
 
     def display_stock_info(self):
         """显示股票信息"""
@@ -185,8 +154,9 @@ class Stock:
                     # 设置窗口标题
                     self.fig.canvas.manager.set_window_title(f"{self.current_name} - 日K线图")
                 except Exception as e:
-                    print(f"无法设置窗口标题: {e}")
+                    logger.warning("无法设置窗口标题: %s", e)
 
+    @registry.timed('render_seconds', frame='plot_daily_k')
     def plot_daily_k(self):
         """绘制日K线图"""
         if not hasattr(self, 'fig') or self.fig is None:
@@ -204,7 +174,7 @@ class Stock:
             
             # 如果没有日K线数据，尝试获取
             if first_code not in self.daily_data or self.daily_data[first_code].empty:
-                self.daily_data[first_code] = self.get_daily_k_data(first_code)
+                self.daily_data[first_code] = self.get_pyramid(first_code).window('daily', bars=DAILY_BARS)
                 
             df = self.daily_data[first_code]
             
@@ -293,82 +263,170 @@ class Stock:
             plt.tight_layout(rect=[0, 0, 1, 0.95])
             
         except Exception as e:
-            print(f"绘制K线图出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("绘制K线图出错: %s", e)
 
-    def __add_work(self, code: str, code_index: int):
-        """添加工作任务"""
-        self.queue.put((self.value_get, (code, code_index)))
+    def _scale_workers(self):
+        """有积压任务时，按行情接口当前允许的并发数扩充工作线程"""
+        target = min(self.max_threads, fetch.concurrency_limit(self.quote_api))
+        while len(self.threads) < target and self.queue.qsize() > 0:
+            thread = Worker(self.queue)
+            thread.start()
+            self.threads.append(thread)
 
-    def display_stocks(self, codes: List[str], interval: float = UPDATE_INTERVAL):
-        """显示股票数据"""
-        print("程序启动中，正在初始化...")
-        print("正在准备加载数据...")
-        
-        for code in codes:
-            self.price_history[code] = []
-            self.time_history[code] = []
-            
-            # 初始化加载日K线数据
-            try:
-                print(f"初始化加载{code}的日K线数据...")
-                self.daily_data[code] = self.get_daily_k_data(code)
-                if self.daily_data[code].empty:
-                    print(f"警告: 未能获取到{code}的日K线数据")
-                else:
-                    print(f"成功加载了{len(self.daily_data[code])}条日K线数据")
-            except Exception as e:
-                print(f"初始加载{code}日K线数据失败: {str(e)}")
+    def _submit(self, func, args: tuple):
+        """把任务交给工作线程"""
+        self.queue.put((func, args))
+        registry.gauge('worker_queue_depth', '工作队列中等待的任务数').set(self.queue.qsize())
+        self._scale_workers()
 
-        print("\n数据加载中...")
-        
-        # 获取实时价格数据（只获取一次）
-        for i, code in enumerate(codes):
-            self.__add_work(code, i)
-        self.queue.join()
+    def _load_daily(self, code: str) -> pd.DataFrame:
+        """在工作线程中下载K线金字塔并取最近的日K线"""
+        return self.get_pyramid(code).window('daily', bars=DAILY_BARS)
 
-        # 获取并处理价格数据
-        for code in codes:
-            result = self.value_get(code, 0)
-            if result[1]:
-                _, (name, price, change) = result
+    def _apply_startup_results(self, block: bool = False):
+        """在主线程中取出已到达的K线和行情，数据到达后才绘制对应内容"""
+        pipeline = self._startup
+        first_code = self.codes[0]
+        chart = False
+        for kind, key, result in pipeline.drain(block):
+            if kind == 'kline':
+                if result is None or result.empty:
+                    logger.warning("未能获取到%s的日K线数据", key)
+                    if key in self.daily_data:
+                        continue  # 保留快照中的数据
+                self.daily_data[key] = result if result is not None else pd.DataFrame()
+                chart = chart or key == first_code
+                continue
+            code = self.codes[key]
+            quote = result[1] if result else None
+            if quote:
+                name, price, change = quote
                 self.current_name = name
                 self.current_prices[code] = price
                 self.change_pcts[code] = change
                 self.price_history[code].append(price)
                 self.time_history[code].append(datetime.now())
+            if not pipeline.pending('quote'):
+                self.display_stock_info()
+                pipeline.mark('quotes')
+        if chart:
+            with profiling.phase('plot_daily_k'):
+                if self.daily_data[first_code].empty:
+                    self.ax.clear()
+                    self.ax.text(0.5, 0.5, '暂无日K线数据', horizontalalignment='center',
+                                 verticalalignment='center', transform=self.ax.transAxes, fontsize=14)
+                else:
+                    self.plot_daily_k()
+            pipeline.mark('chart')
+            self.fig.canvas.draw_idle()
+        if pipeline.done and not self._startup_saved:
+            self._startup_saved = True
+            pipeline.mark('complete')
+            self._save_figure()
 
-        # 显示股票信息
-        self.display_stock_info()
-        
-        print("\n准备生成K线图...")
-        
-        # 在绘图前创建图表
-        self.create_figure()
-        
-        # 更新图表
-        self.plot_daily_k()
-        
-        # 保存图表为图片文件
+    def save_snapshot(self):
+        """保存当前状态快照(在GUI线程中调用)"""
+        if not self.snapshot_path or not self.current_prices:
+            return
+        frames = {code: df for code, df in list(self.daily_data.items()) if not df.empty}
+        state = {
+            'codes': self.codes,
+            'current_name': self.current_name,
+            'current_prices': self.current_prices,
+            'change_pcts': self.change_pcts,
+        }
+        snapshot.save(self.snapshot_path, state, frames)
+
+    def _restore_snapshot(self) -> bool:
+        """读取上次运行的状态快照，第一只股票相同时恢复行情和日K线"""
+        if not self.snapshot_path:
+            return False
+        loaded = snapshot.load(self.snapshot_path)
+        if loaded is None:
+            return False
+        state, frames = loaded
+        if not state['codes'] or state['codes'][0] != self.codes[0]:
+            return False
+        codes = set(self.codes)
+        for name in ('current_prices', 'change_pcts'):
+            getattr(self, name).update({code: value for code, value in state[name].items() if code in codes})
+        self.current_name = state['current_name']
+        self.daily_data.update({code: df for code, df in frames.items() if code in codes})
+        return self.codes[0] in self.daily_data
+
+    def _save_figure(self):
+        """保存图表为图片文件"""
         try:
             filename = f"{self.current_name}_日K线图.png"
-            plt.savefig(filename)
+            with profiling.phase('savefig'):
+                self.fig.savefig(filename)
             print(f"\n图表已保存为文件: {filename}")
-            print(f"请在当前目录查看该文件以查看K线图。")
         except Exception as save_error:
-            print(f"保存图表时出错: {save_error}")
-        
+            logger.error("保存图表时出错: %s", save_error)
+
+    def display_stocks(self, codes: List[str], interval: float = UPDATE_INTERVAL):
+        """显示股票数据
+
+        所有代码的K线和行情同时提交给工作线程，图表立即显示占位内容，数据到达后再绘制。
+        """
+        logger.info("程序启动中，正在初始化...")
+        self.codes = list(codes)
+        for code in codes:
+            self.price_history[code] = []
+            self.time_history[code] = []
+
+        with profiling.phase('startup_submit'):
+            self._startup = StartupPipeline(self._submit)
+            self._startup_saved = False
+            self._startup.start(
+                [('kline', code, self._load_daily, (code,)) for code in codes]
+                + [('quote', i, self.value_get, (code, i)) for i, code in enumerate(codes)]
+            )
+
+        with profiling.phase('snapshot_load'):
+            restored = self._restore_snapshot()
+
+        # 图表立即创建，有快照时按快照绘制，否则显示占位提示
+        with profiling.phase('create_figure'):
+            self.create_figure()
+        self._startup.mark('figure')
+        if restored:
+            with profiling.phase('plot_daily_k'):
+                self.plot_daily_k()
+            self._startup.mark('snapshot')
+
         print("\n尝试显示图表窗口...")
-        print("如果窗口未显示，请查看已保存的图片文件。")
         print("按Ctrl+C终止程序。")
-        
+
+        if not interactive_backend():
+            # 非交互后端没有事件循环，等待全部数据到达后绘制并保存
+            while not self._startup.done:
+                self._apply_startup_results(block=True)
+            self.save_snapshot()
+            return
+
+        timer = self.fig.canvas.new_timer(interval=POLL_INTERVAL_MS)
+        timer.add_callback(self._poll_startup, timer)
+        timer.start()
+        if self.snapshot_path:
+            snapshot_timer = self.fig.canvas.new_timer(interval=snapshot.SNAPSHOT_INTERVAL_MS)
+            snapshot_timer.add_callback(self.save_snapshot)
+            snapshot_timer.start()
+
         # 尝试显示图表，阻塞直到窗口关闭
         try:
-            plt.tight_layout()
             plt.show(block=True)
         except KeyboardInterrupt:
             print("\n程序已被用户终止")
         except Exception as e:
-            print(f"显示图表时出错: {e}")
-            print(f"请直接查看保存的图片文件: {filename}")
\ No newline at end of file
+            logger.error("显示图表时出错: %s", e)
+        self.save_snapshot()
+
+    def _poll_startup(self, timer):
+        """定时器回调：渲染已到达的数据，全部到达后停止"""
+        try:
+            self._apply_startup_results()
+        except Exception as e:
+            logger.exception("渲染启动数据出错: %s", e)
+        if self._startup.done:
+            timer.stop()
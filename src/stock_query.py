@@ -1,19 +1,45 @@
 """
 股票查询工具主模块 - 使用标准库实现
 """
+import argparse
+import csv
 import json
 import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 import urllib.request
 import urllib.error
 import urllib.parse
 
+from .board import BOARD_NAME, QuoteBoard
+from .fundamentals import FundamentalsProvider, provider
+from .providers import SinaProvider
+from .quotes import QUOTE_BATCH_SIZE, SINA_QUOTE_API, batches
+from .stats import StatsCache, cache
+
+REQUEST_TIMEOUT = 5  # 请求超时(秒)
+BATCH_WORKERS = 4  # 批量模式的并发请求数
+BATCH_FIELDS = ['code', 'name', 'price', 'change', 'change_pct', 'open', 'prev_close',
+                'high', 'low', 'volume', 'amount', 'date', 'time']  # 批量模式输出字段
+
 class StockQuery:
     """股票查询类"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        fundamentals: Optional[FundamentalsProvider] = None,
+        stats: Optional[StatsCache] = None,
+        board: Optional[QuoteBoard] = None,
+        base_url: Optional[str] = None,
+    ):
         self._setup_console_colors()
+        self.fundamentals = fundamentals or provider()
+        self.stats = stats or cache()  # 52周极值等由本地K线统计得到
+        self.board = board  # 设置后从共享内存行情看板读取，不访问网络
+        self.quote_api = base_url.rstrip('/') if base_url else SINA_QUOTE_API  # 可指向本地行情网关
+        self.provider = SinaProvider(self.quote_api, self._read, batch_size=sys.maxsize)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'http://finance.sina.com.cn'
@@ -33,43 +59,32 @@ class StockQuery:
     def get_stock_data(self, code: str) -> Optional[Dict]:
         """获取股票数据"""
         try:
-            # 新浪股票API
-            url = f"http://hq.sinajs.cn/list={code}"
-            req = urllib.request.Request(url, headers=self.headers)
-            
             try:
-                response = urllib.request.urlopen(req)
-                content = response.read().decode('gbk')
+                quote = self.provider.quotes([code]).get(code)
             except urllib.error.URLError as e:
                 print(f"{self.COLORS['red']}网络连接错误: {str(e)}{self.COLORS['end']}")
                 return None
             
-            data = content.split('="')
-            if len(data) < 2:
+            if quote is None:
                 print(f"{self.COLORS['red']}无法获取股票 {code} 的数据{self.COLORS['end']}")
                 return None
                 
-            values = data[1].split(',')
-            if len(values) < 32:
-                print(f"{self.COLORS['red']}股票 {code} 数据不完整{self.COLORS['end']}")
-                return None
-                
             # 获取公司信息
             company_info = self.get_company_info(code)
             
             # 构建股票数据字典
             stock_data = {
-                'name': values[0],
-                'open': float(values[1]),
-                'prev_close': float(values[2]),
-                'price': float(values[3]),
-                'high': float(values[4]),
-                'low': float(values[5]),
-                'volume': float(values[8]),
-                'amount': float(values[9]),
-                'date': values[30],
-                'time': values[31],
-                'change': round((float(values[3]) - float(values[2])) / float(values[2]) * 100, 2),
+                'name': quote['name'],
+                'open': quote['open'],
+                'prev_close': quote['prev_close'],
+                'price': quote['price'],
+                'high': quote['high'],
+                'low': quote['low'],
+                'volume': quote['volume'],
+                'amount': quote['amount'],
+                'date': quote['date'],
+                'time': quote['time'],
+                'change': quote['change_pct'],
                 'pe_ratio': company_info.get('pe_ratio', '--'),
                 'market_cap': company_info.get('market_cap', '--'),
                 'week52_high': company_info.get('week52_high', '--'),
@@ -87,22 +102,76 @@ class StockQuery:
             return None
             
     def get_company_info(self, code: str) -> Dict:
-        """获取公司信息(示例数据)"""
-        # 实际项目中应该从专业数据源获取这些信息
-        return {
-            'pe_ratio': 32.5,
-            'market_cap': '2350亿',
-            'week52_high': 58.86,
-            'week52_low': 31.55,
-            'profile': '公司是国内领先的人工智能技术提供商',
-            'business': '人工智能技术研发与应用服务',
-            'finance': '营收同比增长25%，净利润增长30%',
-            'announcements': [
-                '发布新一代AI大模型',
-                '与某央企达成战略合作'
-            ]
-        }
-        
+        """获取公司信息，只读基本面缓存，缺失或过期的数据在后台刷新"""
+        info = self.fundamentals.get(code)
+        info.update(self.stats.get(code))
+        if isinstance(info.get('market_cap'), (int, float)):
+            info['market_cap'] = f"{info['market_cap']:.0f}亿"
+        return info
+
+    def _read(self, url: str) -> str:
+        """读取行情接口的响应文本"""
+        if self.board is not None:
+            return self.board.response(url).text
+        req = urllib.request.Request(url, headers=self.headers)
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            return response.read().decode('gbk')
+
+    def fetch_batch(self, codes: List[str]) -> Dict[str, Dict]:
+        """一次请求获取一批股票的行情"""
+        try:
+            return self.provider.quotes(codes)
+        except (urllib.error.URLError, OSError) as e:
+            print(f"网络连接错误: {str(e)}", file=sys.stderr)
+            return {}
+
+    def iter_quotes(
+        self,
+        codes: Iterable[str],
+        batch_size: int = QUOTE_BATCH_SIZE,
+        workers: int = BATCH_WORKERS,
+    ) -> Iterator[Dict]:
+        """并发批量获取行情，按到达顺序逐条产出
+
+        同时在途的批次不超过 workers 的两倍，内存占用与代码总数无关。
+        """
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in batches(codes, batch_size):
+                pending.add(pool.submit(self._fetch_ordered, batch))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+    def _fetch_ordered(self, codes: List[str]) -> List[Dict]:
+        """获取一批行情并按输入顺序排列，缺失的代码输出到标准错误"""
+        quotes = self.fetch_batch(codes)
+        missing = [code for code in codes if code not in quotes]
+        if missing:
+            print(f"无法获取股票数据: {','.join(missing)}", file=sys.stderr)
+        return [quotes[code] for code in codes if code in quotes]
+
+    def write_records(self, records: Iterable[Dict], out: TextIO, fmt: str = 'csv') -> int:
+        """将行情以CSV或NDJSON格式逐条写出，返回写出的条数"""
+        if fmt == 'csv':
+            writer = csv.DictWriter(out, fieldnames=BATCH_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(record):
+                out.write(json.dumps({k: record[k] for k in BATCH_FIELDS}, ensure_ascii=False) + '\n')
+        count = 0
+        for record in records:
+            write(record)
+            out.flush()
+            count += 1
+        return count
+
     def display_stock_info(self, data: Dict):
         """显示股票信息"""
         if not data:
@@ -149,10 +218,46 @@ class StockQuery:
             for announcement in data['announcements']:
                 print(f"• {announcement}")
 
+def iter_codes(codes: List[str], path: Optional[str]) -> Iterator[str]:
+    """依次产出命令行和文件中的股票代码，文件为'-'时读取标准输入"""
+    for code in codes:
+        yield from (c.strip().lower() for c in code.split(',') if c.strip())
+    if path:
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in stream:
+                yield from (c.strip().lower() for c in line.split(',') if c.strip())
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
 def main():
     """主函数"""
-    query = StockQuery()
-    
+    parser = argparse.ArgumentParser(description="股票查询工具，未指定代码时进入交互模式")
+    parser.add_argument("codes", nargs='*', help="股票代码，可用逗号分隔")
+    parser.add_argument("-f", "--file", help="股票代码文件，每行一个代码，'-'表示标准输入")
+    parser.add_argument("--format", choices=['csv', 'json'], default='csv',
+                        help="批量模式输出格式: csv 或 json(每行一条记录)")
+    parser.add_argument("--batch-size", type=int, default=QUOTE_BATCH_SIZE,
+                        help="每次请求的股票数量")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="并发请求数")
+    parser.add_argument("--board", nargs='?', const=BOARD_NAME, default=None,
+                        help="从本机共享内存行情看板读取行情，可指定看板名称")
+    parser.add_argument("--gateway", default=None,
+                        help="本地行情网关地址，如 http://127.0.0.1:8686")
+    args = parser.parse_args()
+
+    query = StockQuery(board=QuoteBoard.attach(args.board) if args.board else None,
+                       base_url=args.gateway)
+    if args.codes or args.file:
+        records = query.iter_quotes(iter_codes(args.codes, args.file), args.batch_size, args.workers)
+        try:
+            query.write_records(records, sys.stdout, args.format)
+        except BrokenPipeError:
+            pass
+        return
+
     while True:
         code = input("\n请输入股票代码(按q退出): ").strip().lower()
         
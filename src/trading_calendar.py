@@ -0,0 +1,218 @@
+"""
+沪深交易所交易日历
+
+内置近年沪深交易所的休市日(仅列出工作日休市，周末总是休市)，可由上证指数日K线推算更新并保存到本地。
+交易日计数、前后交易日查找均基于 numpy 的工作日函数，可对日期数组向量化计算。
+
+    python -m src.trading_calendar 2024-10-01 2025-01-01
+    python -m src.trading_calendar --update [-d data]
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .fundamentals import CACHE_DIR
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+CHINA_TZ = timezone(timedelta(hours=8))  # 北京时间(无夏令时)
+WEEKMASK = '1111100'
+SESSIONS = ((time(9, 30), time(11, 30)), (time(13, 0), time(15, 0)))  # 连续竞价时段
+SESSION_GRACE = timedelta(minutes=1)  # 收盘后继续轮询的时间，用于取得收盘价
+CALENDAR_INDEX = 'sh000001'  # 推算休市日使用的指数
+HOLIDAYS_FILE = os.path.join(CACHE_DIR, 'holidays.json')
+
+# 内置的工作日休市日
+HOLIDAYS = (
+    '2020-01-01', '2020-01-24', '2020-01-27', '2020-01-28', '2020-01-29', '2020-01-30', '2020-01-31',
+    '2020-04-06', '2020-05-01', '2020-05-04', '2020-05-05', '2020-06-25', '2020-06-26',
+    '2020-10-01', '2020-10-02', '2020-10-05', '2020-10-06', '2020-10-07', '2020-10-08',
+    '2021-01-01', '2021-02-11', '2021-02-12', '2021-02-15', '2021-02-16', '2021-02-17',
+    '2021-04-05', '2021-05-03', '2021-05-04', '2021-05-05', '2021-06-14', '2021-09-20', '2021-09-21',
+    '2021-10-01', '2021-10-04', '2021-10-05', '2021-10-06', '2021-10-07',
+    '2022-01-03', '2022-01-31', '2022-02-01', '2022-02-02', '2022-02-03', '2022-02-04',
+    '2022-04-04', '2022-04-05', '2022-05-02', '2022-05-03', '2022-05-04', '2022-06-03', '2022-09-12',
+    '2022-10-03', '2022-10-04', '2022-10-05', '2022-10-06', '2022-10-07',
+    '2023-01-02', '2023-01-23', '2023-01-24', '2023-01-25', '2023-01-26', '2023-01-27',
+    '2023-04-05', '2023-05-01', '2023-05-02', '2023-05-03', '2023-06-22', '2023-06-23',
+    '2023-09-29', '2023-10-02', '2023-10-03', '2023-10-04', '2023-10-05', '2023-10-06',
+    '2024-01-01', '2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14', '2024-02-15', '2024-02-16',
+    '2024-04-04', '2024-04-05', '2024-05-01', '2024-05-02', '2024-05-03', '2024-06-10',
+    '2024-09-16', '2024-09-17', '2024-10-01', '2024-10-02', '2024-10-03', '2024-10-04', '2024-10-07',
+    '2025-01-01', '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-02-03', '2025-02-04',
+    '2025-04-04', '2025-05-01', '2025-05-02', '2025-05-05', '2025-06-02',
+    '2025-10-01', '2025-10-02', '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08',
+    '2026-01-01', '2026-01-02', '2026-02-16', '2026-02-17', '2026-02-18', '2026-02-19', '2026-02-20',
+    '2026-02-23', '2026-04-06', '2026-05-01', '2026-05-04', '2026-05-05', '2026-06-19', '2026-09-25',
+    '2026-10-01', '2026-10-02', '2026-10-05', '2026-10-06', '2026-10-07',
+)
+
+
+def _day(value) -> np.datetime64:
+    """日期、时间、字符串或 datetime64 转为按日的 datetime64"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+def china_now() -> datetime:
+    """当前北京时间(不带时区)"""
+    return datetime.now(CHINA_TZ).replace(tzinfo=None)
+
+
+class TradingCalendar:
+    """交易日历，日期参数可以是 date/datetime/字符串，或 datetime64[D] 数组(向量化)"""
+
+    def __init__(self, holidays: Iterable = HOLIDAYS, path: Optional[str] = HOLIDAYS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        days = set(np.array(list(holidays), dtype='datetime64[D]').tolist())
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    saved = json.load(f)
+                start, end = np.datetime64(saved['start'], 'D'), np.datetime64(saved['end'], 'D')
+                days = {day for day in days if not start <= np.datetime64(day, 'D') <= end}
+                days.update(np.array(saved['holidays'], dtype='datetime64[D]').tolist())
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("读取交易日历失败: %s", e)
+        self._set(days)
+
+    def _set(self, days):
+        holidays = np.array(sorted(days), dtype='datetime64[D]')
+        self.holidays = holidays[np.is_busday(holidays, weekmask=WEEKMASK)]
+        self._busdays = np.busdaycalendar(weekmask=WEEKMASK, holidays=self.holidays)
+
+    def is_session(self, day) -> bool:
+        """是否为交易日"""
+        return np.is_busday(_dates(day), busdaycal=self._busdays)
+
+    def count(self, start, end):
+        """[start, end] 之间(含两端)的交易日数"""
+        return np.busday_count(_dates(start), _dates(end) + np.timedelta64(1, 'D'), busdaycal=self._busdays)
+
+    def sessions(self, start, end) -> np.ndarray:
+        """[start, end] 之间的全部交易日"""
+        days = np.arange(_day(start), _day(end) + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        return days[self.is_session(days)]
+
+    def next_session(self, day):
+        """day 之后(不含)的第一个交易日"""
+        return np.busday_offset(_dates(day), 1, roll='backward', busdaycal=self._busdays)
+
+    def previous_session(self, day):
+        """day 之前(不含)的最后一个交易日"""
+        return np.busday_offset(_dates(day), -1, roll='forward', busdaycal=self._busdays)
+
+    def last_session(self, now: Optional[datetime] = None) -> np.datetime64:
+        """已经开盘的最近一个交易日，盘前为上一个交易日"""
+        now = now or china_now()
+        today = _day(now)
+        if self.is_session(today) and now.time() >= SESSIONS[0][0]:
+            return today
+        return self.previous_session(today)
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """当前(北京时间)是否处于连续竞价时段"""
+        return self.seconds_until_open(now, grace=timedelta(0)) == 0
+
+    def seconds_until_open(self, now: Optional[datetime] = None, grace: timedelta = SESSION_GRACE) -> float:
+        """距下一个交易时段开始的秒数，交易时段内(含收盘后 grace)为0"""
+        now = now or china_now()
+        day = _day(now)
+        if not self.is_session(day):
+            day = self.next_session(day)
+        while True:
+            for start, end in SESSIONS:
+                opens = datetime.combine(day.astype(date), start)
+                if now < opens:
+                    return (opens - now).total_seconds()
+                if now < datetime.combine(day.astype(date), end) + grace:
+                    return 0.0
+            day = self.next_session(day)
+
+    def update_from_bars(self, dates) -> int:
+        """由指数日K线的日期推算休市日：区间内没有K线的工作日即休市日，返回区间内的休市日数"""
+        dates = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+        if dates.size < 2:
+            return 0
+        start, end = dates[0], dates[-1]
+        weekdays = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        weekdays = weekdays[np.is_busday(weekdays, weekmask=WEEKMASK)]
+        closed = np.setdiff1d(weekdays, dates)
+        with self._lock:
+            kept = self.holidays[(self.holidays < start) | (self.holidays > end)]
+            self._set(set(kept.tolist()) | set(closed.tolist()))
+            if self.path:
+                self._save(str(start), str(end), closed)
+        return int(closed.size)
+
+    def _save(self, start: str, end: str, closed: np.ndarray):
+        data = {'start': start, 'end': end, 'holidays': [str(day) for day in closed]}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(f"{self.path}.tmp", self.path)
+        except OSError as e:
+            logger.warning("写入交易日历失败: %s", e)
+
+
+def _dates(value):
+    """单个日期转为 datetime64[D]，数组按元素转换"""
+    if isinstance(value, np.ndarray):
+        return value.astype('datetime64[D]')
+    return _day(value)
+
+
+def poll_interval(interval: float, market_hours: bool = False) -> float:
+    """轮询器本轮的间隔：market_hours 为True时休市期间等到下一个交易时段开始"""
+    if not market_hours:
+        return interval
+    return max(interval, calendar().seconds_until_open())
+
+
+_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def calendar() -> TradingCalendar:
+    """获取全局交易日历"""
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = TradingCalendar()
+        return _calendar
+
+
+def main():
+    """主函数"""
+    from .providers import FileProvider, KLINE_LIMIT, default_provider
+
+    parser = argparse.ArgumentParser(description="沪深交易日历")
+    parser.add_argument("dates", help="要查询的日期,如 2024-10-01", nargs='*')
+    parser.add_argument("--update", help="由上证指数日K线推算并保存休市日", action='store_true')
+    parser.add_argument("-d", "--data-dir", help="本地K线目录,默认从网络获取", type=str)
+    args = parser.parse_args()
+    trading = calendar()
+    if args.update:
+        provider = FileProvider(args.data_dir) if args.data_dir else default_provider()
+        bars = provider.bars(CALENDAR_INDEX, 'daily', KLINE_LIMIT)
+        closed = trading.update_from_bars(bars.index.values)
+        print(f"{bars.index[0]:%Y-%m-%d} 至 {bars.index[-1]:%Y-%m-%d} 共{closed}个工作日休市")
+    for value in args.dates:
+        day = _day(value)
+        print(f"{day}: {'交易日' if trading.is_session(day) else '休市'}，"
+              f"上一交易日 {trading.previous_session(day)}，下一交易日 {trading.next_session(day)}")
+    wait = trading.seconds_until_open(grace=timedelta(0))
+    print("当前处于交易时段" if wait == 0 else f"距下一交易时段开始 {wait / 3600:.1f} 小时")
+
+
+if __name__ == "__main__":
+    main()
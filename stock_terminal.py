@@ -10,17 +10,31 @@ from optparse import OptionParser
 from queue import Queue
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.ticker import FuncFormatter
+import numpy as np
 import pandas as pd
-import requests
 import sys
 import threading
 import time
 
+from src.providers import default_provider
+from src.log import get_logger, setup as setup_logging
+from src.metrics import registry
+
+logger = get_logger('stock_terminal')
+
 # 添加中文字体支持
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # Mac系统
 # plt.rcParams['font.sans-serif'] = ['SimHei']  # Windows系统
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
+LIVE_INTERVAL = 100  # 实时图表的刷新间隔(毫秒)，即每秒10帧
+SESSION_TICKS = 4 * 60 * 60  # 实时序列的容量：一个交易日按每秒一笔计
+CANDLE_SECONDS = 60  # 分时K线的周期(秒)
+GROWTH = 1.5  # 数据超出坐标范围时按此倍数扩展，范围不变的帧只做局部重绘
+UP_COLOR, DOWN_COLOR = (1.0, 0.0, 0.0, 1.0), (0.0, 0.5, 0.0, 1.0)
+
 class Worker(threading.Thread):
     """多线程获取"""
     def __init__(self, work_queue, result_queue):
@@ -44,11 +58,62 @@ class Worker(threading.Thread):
             self.work_queue.task_done()
 
 
+class LiveSeries(object):
+    """实时行情序列：预分配数组，每笔行情只追加一个点并更新最后一根分时K线"""
+
+    def __init__(self, capacity=SESSION_TICKS, period=CANDLE_SECONDS):
+        self.period = period
+        self.lock = threading.Lock()
+        self.times = np.zeros(capacity)
+        self.prices = np.zeros(capacity)
+        self.count = 0
+        self.starts = np.zeros(capacity)  # 每根K线的起始时间
+        self.candles = np.zeros((capacity, 4))  # 开、高、低、收
+        self.candle_count = 0
+
+    def append(self, timestamp, price):
+        with self.lock:
+            if self.count == len(self.prices):
+                self._drop_oldest()
+            self.times[self.count] = timestamp
+            self.prices[self.count] = price
+            self.count += 1
+            start = timestamp - timestamp % self.period
+            last = self.candle_count - 1
+            if last >= 0 and self.starts[last] == start:
+                candle = self.candles[last]
+                candle[1] = max(candle[1], price)
+                candle[2] = min(candle[2], price)
+                candle[3] = price
+            else:
+                self.starts[last + 1] = start
+                self.candles[last + 1] = price
+                self.candle_count += 1
+
+    def _drop_oldest(self):
+        """容量用完时丢弃较早的一半行情及其K线"""
+        keep = len(self.prices) // 2
+        self.times[:keep] = self.times[self.count - keep:self.count]
+        self.prices[:keep] = self.prices[self.count - keep:self.count]
+        self.count = keep
+        first = np.searchsorted(self.starts[:self.candle_count], self.times[0] - self.period, side='right')
+        kept = self.candle_count - first
+        self.starts[:kept] = self.starts[first:self.candle_count]
+        self.candles[:kept] = self.candles[first:self.candle_count]
+        self.candle_count = kept
+
+    def snapshot(self):
+        """(行情数, K线数)，数组中这两个长度以内的数据可以直接绘制"""
+        with self.lock:
+            return self.count, self.candle_count
+
+
 class Stock(object):
     """股票实时价格获取"""
 
     def __init__(self, code, thread_num):
         self.code = code
+        self.provider = default_provider()
         self.work_queue = Queue()
         self.threads = []
         self.__init_thread_poll(thread_num)
@@ -56,6 +121,7 @@ class Stock(object):
         self.time_history = []
         self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(12, 8))
         self.current_price = None
+        self.live = None
         # 初始化图表设置
         self.ax1.set_title('实时价格走势')
         self.ax1.set_xlabel('时间')
@@ -87,10 +153,10 @@ class Stock(object):
 
     def update_plot(self, frame):
         if not self.price_history:
-            print("Debug - No price history data")  # 添加调试信息
+            logger.debug("暂无价格历史数据")
             return
             
-        print(f"Debug - Updating plot with {len(self.price_history)} data points")  # 添加调试信息
+        logger.debug("使用%d个数据点更新图表", len(self.price_history))
         
         # 更新实时价格走势图
         self.ax1.clear()
@@ -167,38 +233,114 @@ class Stock(object):
             price_range = df.high.max() - df.low.min()
             ax.set_ylim([mean_price - price_range * 0.6, mean_price + price_range * 0.6])
 
+    def start_live(self, sleep_time):
+        """实时模式：常驻图元只更新数据，坐标范围不变时以局部重绘(blit)每秒刷新10帧"""
+        self.live = LiveSeries()
+        self.live_drawn = -1
+        self.background = None
+        self.live_line, = self.ax1.plot([], [], 'b-', animated=True)
+        self.live_text = self.ax1.text(0.01, 0.95, '', transform=self.ax1.transAxes,
+                                       verticalalignment='top', animated=True)
+        self.live_wicks = LineCollection([], linewidths=1, animated=True)
+        self.live_bodies = PolyCollection([], animated=True)
+        self.ax2.add_collection(self.live_wicks)
+        self.ax2.add_collection(self.live_bodies)
+        # 刻度标签只在完整重绘时按可见刻度格式化
+        time_format = FuncFormatter(lambda x, pos: datetime.fromtimestamp(x).strftime('%H:%M:%S'))
+        for ax in (self.ax1, self.ax2):
+            ax.xaxis.set_major_formatter(time_format)
+        self.fig.tight_layout()
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self.render_timer = self.fig.canvas.new_timer(interval=LIVE_INTERVAL)
+        self.render_timer.add_callback(self.update_live)
+        self.render_timer.start()
+        self.fetch_timer = self.fig.canvas.new_timer(interval=sleep_time * 1000)
+        self.fetch_timer.add_callback(self.del_params)
+        self.fetch_timer.start()
+
+    def _live_artists(self):
+        return (self.live_line, self.live_text, self.live_wicks, self.live_bodies)
+
+    def _on_draw(self, event):
+        """完整重绘后保存不含动态图元的背景，再画上动态图元"""
+        canvas = self.fig.canvas
+        self.background = canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._live_artists():
+            self.fig.draw_artist(artist)
+
+    @registry.timed('render_seconds', frame='live')
+    def update_live(self):
+        """绘制一帧：没有新行情时不绘制，坐标范围变化时完整重绘，否则只重绘动态图元"""
+        count, candle_count = self.live.snapshot()
+        if count == self.live_drawn or not count:
+            return
+        self.live_drawn = count
+        live = self.live
+        times, prices = live.times[:count], live.prices[:count]
+        self.live_line.set_data(times, prices)
+        self.live_text.set_text(f'当前价格: {prices[-1]:.2f}')
+
+        candles = live.candles[:candle_count]
+        opens, highs, lows, closes = candles.T
+        centers = live.starts[:candle_count] + live.period / 2
+        self.live_wicks.set_segments(np.stack([np.column_stack([centers, lows]),
+                                               np.column_stack([centers, highs])], axis=1))
+        bodies = np.empty((candle_count, 4, 2))
+        bodies[:, :, 0] = centers[:, None] + live.period * np.array([-0.3, 0.3, 0.3, -0.3])
+        bodies[:, :, 1] = np.column_stack([opens, opens, closes, closes])
+        self.live_bodies.set_verts(bodies)
+        colors = np.where((closes >= opens)[:, None], UP_COLOR, DOWN_COLOR)
+        self.live_wicks.set_color(colors)
+        self.live_bodies.set_facecolor(colors)
+        self.live_bodies.set_edgecolor(colors)
+
+        resized = self._fit_limits(self.ax1, times, prices.min(), prices.max())
+        resized |= self._fit_limits(self.ax2, live.starts[:candle_count], lows.min(), highs.max())
+        canvas = self.fig.canvas
+        if resized or self.background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        for artist in self._live_artists():
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def _fit_limits(self, ax, times, low, high):
+        """数据超出当前范围时按比例扩展坐标轴，返回是否改变"""
+        changed = False
+        left, right = ax.get_xlim()
+        if times[0] < left or times[-1] + self.live.period > right:
+            span = max(times[-1] - times[0], self.live.period) * GROWTH
+            ax.set_xlim(times[0] - self.live.period, times[0] + span + self.live.period)
+            changed = True
+        bottom, top = ax.get_ylim()
+        if low < bottom or high > top:
+            pad = max(high - low, high * 0.001) * (GROWTH - 1)
+            ax.set_ylim(low - pad, high + pad)
+            changed = True
+        return changed
+
     def value_get(self, code, code_index):
-        slice_num, value_num = 21, 3
         name, now = u'——无——', u'  ——无——'
-        if code in ['s_sh000001', 's_sz399001']:
-            slice_num = 23
-            value_num = 1
         try:
-            url = f"http://hq.sinajs.cn/list={code}"
-            headers = {
-                'Referer': 'http://finance.sina.com.cn',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            r = requests.get(url, headers=headers)
-            r.encoding = 'gbk'
-            res = r.text.split(',')
-            print(f"Debug - Raw data: {r.text}")  # 添加调试信息
-            if len(res) > 1:
-                name, now = r.text.split(',')[0][slice_num:], r.text.split(',')[value_num]
-                try:
-                    price = float(now)
-                    print(f"Debug - Price: {price}")  # 添加调试信息
-                    self.price_history.append(price)
-                    self.time_history.append(datetime.now())
-                    self.current_price = price
-                    # 保持固定长度的历史数据
-                    if len(self.price_history) > 100:
-                        self.price_history.pop(0)
-                        self.time_history.pop(0)
-                except ValueError:
-                    print(f"无法转换价格: {now}")
+            quote = self.provider.quotes([code]).get(code)
+            logger.debug("行情数据: %s", quote)
+            if quote is not None:
+                name, price = quote['name'], quote['price']
+                now = '%.3f' % price
+                logger.debug("价格: %s", price)
+                self.price_history.append(price)
+                self.time_history.append(datetime.now())
+                self.current_price = price
+                if self.live is not None and code == self.params[0]:
+                    self.live.append(time.time(), price)
+                # 保持固定长度的历史数据
+                if len(self.price_history) > 100:
+                    self.price_history.pop(0)
+                    self.time_history.pop(0)
         except Exception as e:
-            print(f"获取数据错误: {str(e)}")
+            logger.error("获取数据错误: %s", e)
         return code_index, f"{name} {now}"
 
 
@@ -210,7 +352,17 @@ if __name__ == '__main__':
                       help='How long does it take to check one more time.')
     parser.add_option('-t', '--thread-num', dest='thread_num', default=3, type='int',
                       help="thread num.")
+    parser.add_option('-l', '--log-level', dest='log_level', default=None,
+                      help="log level: DEBUG, INFO, WARNING or ERROR.")
+    parser.add_option('-b', '--board', dest='board', default=None,
+                      help="read quotes from the local shared-memory board with this name.")
+    parser.add_option('-L', '--live', dest='live', default=False, action='store_true',
+                      help="incremental live chart (10 fps, blitting) for the first code.")
     options, args = parser.parse_args(args=sys.argv[1:])
+    setup_logging(options.log_level)
+    if options.board:
+        from src.board import use_board
+        use_board(options.board)
 
     assert options.codes, "Please enter the stock code!"  # 是否输入股票代码
     codes = options.codes.split(',')
@@ -221,6 +373,13 @@ if __name__ == '__main__':
 
     stock = Stock(options.codes, options.thread_num)
     
+    if options.live:
+        # 实时模式：定时获取行情，图表增量刷新
+        stock.del_params()
+        stock.start_live(options.sleep_time)
+        plt.show()
+        sys.exit(0)
+
     # 先获取一些初始数据
     stock.del_params()
     time.sleep(1)  # 等待初始数据
@@ -5,7 +5,6 @@
 
 __author__ = 'felix'
 
-import requests
 import time
 import sys
 import threading
@@ -13,13 +12,20 @@ import threading
 import queue
 from optparse import OptionParser
 
+from src.alerts import AlertEngine, change_rules, load_rules
+from src.log import get_logger, setup as setup_logging
+from src.providers import default_provider
+
+logger = get_logger('stock_terminal1')
+
 
 class Worker(threading.Thread):
     """多线程获取"""
-    def __init__(self, work_queue, result_queue):
+    def __init__(self, work_queue, result_queue, on_round=None):
         threading.Thread.__init__(self)
         self.work_queue = work_queue
         self.result_queue = result_queue
+        self.on_round = on_round
         self.start()
 
     def run(self):
@@ -34,24 +40,29 @@ class Worker(threading.Thread):
                 for obj in res:
                     print (obj[1])
                 print ('***** end *****\n')
+                if self.on_round:
+                    self.on_round()
             self.work_queue.task_done()
 
 
 class Stock(object):
     """股票实时价格获取"""
 
-    def __init__(self, code, thread_num):
+    def __init__(self, code, thread_num, rules=None):
         self.code = code
+        self.provider = default_provider()
         self.work_queue = queue.Queue()
         self.threads = []
+        self.quotes = {}
         self.__init_thread_poll(thread_num)
+        self.engine = AlertEngine(rules if rules is not None else change_rules(self.params))
 
     def __init_thread_poll(self, thread_num):
         self.params = self.code.split(',')
         self.params.extend(['s_sh000001', 's_sz399001'])  # 默认获取沪指、深指
         self.result_queue = queue.Queue(maxsize=len(self.params[::-1]))
         for i in range(thread_num):
-            self.threads.append(Worker(self.work_queue, self.result_queue))
+            self.threads.append(Worker(self.work_queue, self.result_queue, self.check_alerts))
 
     def __add_work(self, stock_code, code_index):
         self.work_queue.put((self.value_get, stock_code, code_index))
@@ -65,26 +76,23 @@ class Stock(object):
             if thread.isAlive():
                 thread.join()
 
-    @classmethod
-    def value_get(cls, code, code_index):
-        slice_num, value_num,begin_num = 21, 3 ,2
-        name, now  = u'——无——', u'  ——无——'
-        if code in ['s_sh000001', 's_sz399001']:
-            slice_num = 23
-            value_num = 1
-            begin_num = 3
-        r = requests.get("http://hq.sinajs.cn/list=%s" % (code,))
-        res = r.text.split(',')
-        if len(res) > 1:
-            name, now, begin = r.text.split(',')[0][slice_num:], r.text.split(',')[value_num],float(r.text.split(',')[begin_num])
-        if code in ['s_sh000001', 's_sz399001']:
-            rate = begin
-            begin = float(now)/(1 + (begin)/100)
-        else:
-            rate = (float(now) - (begin))/(begin) *100
-        if(rate >1 or rate < -1):
-            print("*******" + name + "**********")
-        return code_index, name + ' ' + now + ' ' + str(round(rate,3)) + ' ' + str(round(begin,3))
+    def check_alerts(self):
+        """每轮行情更新后一次性计算全部预警规则"""
+        for alert in self.engine.evaluate(dict(self.quotes)):
+            print("*******" + alert.message() + "**********")
+
+    def value_get(self, code, code_index):
+        name, now = u'——无——', u'  ——无——'
+        try:
+            quote = self.provider.quotes([code]).get(code)
+        except Exception as e:
+            return code_index, name + ' ' + now + ' ' + str(e)
+        if quote is None:
+            return code_index, name + ' ' + now
+        self.quotes[code] = quote
+        now, begin = quote['price'], quote['prev_close']
+        rate = (now - begin) / begin * 100 if begin else 0.0
+        return code_index, quote['name'] + ' ' + '%.3f' % now + ' ' + str(round(rate,3)) + ' ' + str(round(begin,3))
 
 
 if __name__ == '__main__':
@@ -95,22 +103,41 @@ if __name__ == '__main__':
                       help='How long does it take to check one more time.')
     parser.add_option('-t', '--thread-num', dest='thread_num', default=3, type='int',
                       help="thread num.")
+    parser.add_option('-l', '--log-level', dest='log_level', default=None,
+                      help="log level: DEBUG, INFO, WARNING or ERROR.")
+    parser.add_option('-b', '--board', dest='board', default=None,
+                      help="read quotes from the local shared-memory board with this name.")
+    parser.add_option('-r', '--rules', dest='rules', default=None,
+                      help="alert rules file (JSON or CSV); defaults to |change| > 1%.")
+    parser.add_option('-d', '--dashboard', dest='dashboard', action='store_true', default=False,
+                      help="show a full-screen live dashboard instead of printing lines.")
     options, args = parser.parse_args(args=sys.argv[1:])
+    setup_logging(options.log_level)
+    if options.board:
+        from src.board import use_board
+        use_board(options.board)
 
     assert options.codes, "Please enter the stock code!"  # 是否输入股票代码
     aa =filter(lambda s: s[:-6] not in ('sh','f_' ,'sz', 's_sh', 's_sz'), options.codes.split(','))
     if aa:
-        print(aa)
+        logger.debug("%s", aa)
     if list(aa):
-        print(list(aa))
-    print(aa)
+        logger.debug("%s", list(aa))
+    logger.debug("%s", aa)
     for a in aa:
         if a[:-6] not in ('sh', 'sz','s_sh'):
-            print(a[:-6])
+            logger.debug("%s", a[:-6])
     if list(filter(lambda s: s[:-6] not in ('sh','f_' ,'sz', 's_sh', 's_sz'), options.codes.split(','))):  # 股票代码输入是否正确
         raise ValueError
 
-    stock = Stock(options.codes, options.thread_num)
+    if options.dashboard:
+        from src.dashboard import run_dashboard
+        run_dashboard([code.replace('s_', '', 1) for code in options.codes.split(',')],
+                      options.sleep_time)
+        sys.exit(0)
+
+    rules = load_rules(options.rules) if options.rules else None
+    stock = Stock(options.codes, options.thread_num, rules)
 
     while True:
         stock.del_params()
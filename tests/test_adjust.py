@@ -0,0 +1,64 @@
+"""
+复权模块测试
+"""
+import numpy as np
+import pandas as pd
+
+from src.adjust import ADJUST_BACKWARD, ADJUST_FORWARD, ADJUST_NONE, Adjuster, adjust, derive_factors
+from src.providers import FileProvider, Provider
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+# 2024-01-04 每股派息0.5元(乘数0.95)，2024-01-08 10送10(乘数0.5)
+TEST_FACTORS = [("2024-01-04", 0.95), ("2024-01-08", 0.5)]
+
+
+def make_bars():
+    """不复权日K线：除权日价格跳空"""
+    close = [10.0, 10.0, 9.5, 9.5, 4.75, 4.75]
+    index = pd.DatetimeIndex(pd.bdate_range("2024-01-02", periods=len(close)), name="date")
+    return pd.DataFrame({"open": close, "close": close, "high": close, "low": close,
+                         "volume": 100.0}, index=index)
+
+
+def test_forward_and_backward_adjustment():
+    """测试前复权保持最新价格、后复权保持最早价格，序列连续"""
+    bars = make_bars()
+    forward = adjust(bars, TEST_FACTORS, ADJUST_FORWARD)
+    assert np.allclose(forward["close"], 4.75)
+    assert forward["close"].iloc[-1] == bars["close"].iloc[-1]
+    backward = adjust(bars, TEST_FACTORS, ADJUST_BACKWARD)
+    assert np.allclose(backward["close"], 10.0)
+    assert (forward["volume"] == bars["volume"]).all()
+    assert adjust(bars, TEST_FACTORS, ADJUST_NONE) is bars
+
+
+def test_derive_factors_ignores_rounding():
+    """测试由前复权价推算因子，舍入误差不被识别为除权"""
+    bars = make_bars()
+    raw = bars["close"] + np.array([0.0, 0.01, 0.0, 0.02, 0.0, 0.01])
+    forward = (adjust(bars, TEST_FACTORS, ADJUST_FORWARD)["close"] + np.array([0.0, 0.01, 0.0, 0.01, 0.0, 0.01])).round(2)
+    factors = derive_factors(raw, forward)
+    assert [day for day, _ in factors] == ["2024-01-04", "2024-01-08"]
+    assert np.allclose([ratio for _, ratio in factors], [0.95, 0.5], atol=0.005)
+
+
+def test_adjuster_caches_per_mode(tmp_path):
+    """测试复权因子只获取一次并持久化，复权结果按方式缓存"""
+    files = FileProvider(str(tmp_path / "data"))
+    files.save_factors(TEST_CODE, TEST_FACTORS)
+    calls = []
+
+    class Counting(Provider):
+        def factors(self, code, raw=None):
+            calls.append(code)
+            return files.factors(code)
+
+    path = str(tmp_path / "factors.json")
+    adjuster = Adjuster(Counting(), path)
+    bars = make_bars()
+    forward = adjuster.adjusted(TEST_CODE, bars, ADJUST_FORWARD)
+    assert adjuster.adjusted(TEST_CODE, bars, ADJUST_FORWARD) is forward
+    assert adjuster.adjusted(TEST_CODE, bars, ADJUST_BACKWARD) is not forward
+    assert calls == [TEST_CODE]
+    assert Adjuster(None, path).factors(TEST_CODE) == TEST_FACTORS
@@ -0,0 +1,77 @@
+"""
+预警规则引擎测试
+"""
+import numpy as np
+
+from src.alerts import AlertEngine, Rule, change_rules, load_rules
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+TEST_SYMBOLS = 2000
+
+
+def quote(price, prev_close=10.0, open_price=10.0, volume=1000.0):
+    return {"price": price, "prev_close": prev_close, "open": open_price, "volume": volume}
+
+
+def test_level_rule_dedup_and_cooldown():
+    """测试电平规则只在条件新满足时触发，并受冷却时间限制"""
+    engine = AlertEngine(change_rules([TEST_CODE], 1.0), cooldown=60)
+    assert [a.rule.op for a in engine.evaluate({TEST_CODE: quote(10.2)}, now=0)] == [">"]
+    assert engine.evaluate({TEST_CODE: quote(10.3)}, now=1) == []  # 持续满足不重复触发
+    assert engine.evaluate({TEST_CODE: quote(10.0)}, now=2) == []
+    assert engine.evaluate({TEST_CODE: quote(10.2)}, now=3) == []  # 冷却中
+    engine.evaluate({TEST_CODE: quote(10.0)}, now=70)
+    assert len(engine.evaluate({TEST_CODE: quote(10.2)}, now=71)) == 1
+
+
+def test_cross_gap_volume_and_indicator_rules():
+    """测试价格穿越、跳空、放量和指标穿越规则"""
+    rules = [
+        Rule(TEST_CODE, "price", "cross_above", 10.5),
+        Rule(TEST_CODE, "gap_pct", ">", 2.0),
+        Rule(TEST_CODE, "volume_ratio", ">", 3.0),
+        Rule(TEST_CODE, "price", "cross_below", "ma20"),
+    ]
+    engine = AlertEngine(rules, cooldown=0)
+    ma20 = {"ma20": {TEST_CODE: 10.2}}
+    assert engine.evaluate({TEST_CODE: quote(10.4)}, ma20, {TEST_CODE: 500.0}, now=0) == []
+    alerts = engine.evaluate({TEST_CODE: quote(10.6, open_price=10.3, volume=2000.0)}, ma20,
+                             {TEST_CODE: 500.0}, now=1)
+    assert sorted(a.rule.field for a in alerts) == ["gap_pct", "price", "volume_ratio"]
+    alerts = engine.evaluate({TEST_CODE: quote(10.1)}, ma20, now=2)
+    assert [a.rule.threshold for a in alerts] == ["ma20"]
+
+
+def test_depth_rules():
+    """测试由五档盘口计算的委比和价差规则"""
+    from src.orderbook import OrderBook
+
+    rules = [Rule(TEST_CODE, "imbalance", ">", 0.5), Rule(TEST_CODE, "spread", ">", 0.05)]
+    engine = AlertEngine(rules, cooldown=0)
+    balanced = dict(quote(10.0), bids=[(9.99, 100.0)] * 5, asks=[(10.0, 100.0)] * 5)
+    assert engine.evaluate({TEST_CODE: balanced}, now=0) == []
+    bid_heavy = dict(balanced, bids=[(9.9, 900.0)] * 5)
+    assert sorted(a.rule.field for a in engine.evaluate({TEST_CODE: bid_heavy}, now=1)) == ["imbalance", "spread"]
+
+    book = OrderBook()
+    book.update({TEST_CODE: balanced})
+    engine = AlertEngine(rules, cooldown=0)
+    assert engine.evaluate({TEST_CODE: quote(10.0)}, now=0, book=book) == []
+    book.update({TEST_CODE: bid_heavy})
+    assert len(engine.evaluate({TEST_CODE: quote(10.0)}, now=1, book=book)) == 2
+
+
+def test_many_rules_evaluate_in_one_pass(tmp_path):
+    """测试从文件加载规则并在数千条规则上一次向量化计算"""
+    path = tmp_path / "rules.csv"
+    path.write_text("code,field,op,threshold,cooldown,name\n"
+                    "sh600000,price,>,10.5,30,突破\n", encoding="utf-8")
+    assert load_rules(str(path)) == [Rule(TEST_CODE, "price", ">", 10.5, 30.0, "突破")]
+
+    codes = [f"sz{i:06d}" for i in range(TEST_SYMBOLS)]
+    engine = AlertEngine(change_rules(codes, 2.0))
+    prices = np.linspace(9.5, 10.5, TEST_SYMBOLS)
+    quotes = {code: quote(price) for code, price in zip(codes, prices)}
+    alerts = engine.evaluate(quotes)
+    assert len(alerts) == int(np.sum(np.abs(prices - 10.0) / 10.0 * 100 > 2.0))
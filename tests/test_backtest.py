@@ -0,0 +1,67 @@
+"""
+回测模块测试
+"""
+import numpy as np
+import pandas as pd
+
+from src.backtest import limit_pct, panel_from_frames, simulate, sweep
+
+# 测试数据常量
+TEST_CODES = ["sh600000", "sz300750"]
+
+
+def make_frame(closes, opens=None):
+    """由收盘价(和开盘价)生成日K线"""
+    closes = np.asarray(closes, dtype=float)
+    opens = closes if opens is None else np.asarray(opens, dtype=float)
+    index = pd.DatetimeIndex(pd.date_range("2024-01-01", periods=len(closes), freq="B"), name="date")
+    return pd.DataFrame({"open": opens, "high": np.maximum(opens, closes), "low": np.minimum(opens, closes),
+                         "close": closes, "volume": 1000.0}, index=index)
+
+
+def test_panel_alignment_and_limits():
+    """测试面板按日期并集对齐，缺失日期为NaN"""
+    panel = panel_from_frames({"sh600000": make_frame([10, 11, 12]), "sz300750": make_frame([20, 21])})
+    assert panel.codes == TEST_CODES
+    assert panel.close.shape == (3, 2)
+    assert np.isnan(panel.close[2, 1])
+    assert limit_pct(TEST_CODES).tolist() == [0.1, 0.2]
+
+
+def test_next_open_execution_and_limit_up_block():
+    """测试信号次日开盘成交，开盘涨停时买不进"""
+    closes = [10.0, 10.0, 11.0, 11.0, 11.0]
+    opens = [10.0, 10.0, 11.0, 11.0, 11.0]  # 第3日开盘即涨停
+    panel = panel_from_frames({"sh600000": make_frame(closes, opens)})
+    target = np.ones((5, 1), dtype=bool)
+    positions = simulate(panel, target, commission=0.0, stamp_tax=0.0).positions[:, 0]
+    # 第1日收盘出信号，第2日开盘买入
+    assert positions.tolist() == [False, True, True, True, True]
+
+    target = np.array([[False], [True], [True], [True], [True]])
+    result = simulate(panel, target, commission=0.0, stamp_tax=0.0)
+    assert result.positions[:, 0].tolist() == [False, False, False, True, True]
+    assert result.stats["total_return"] == 0.0
+
+
+def test_returns_and_costs():
+    """测试持仓收益与交易成本"""
+    panel = panel_from_frames({"sh600000": make_frame([10.0, 10.0, 10.5, 10.5], [10.0, 10.0, 10.0, 10.5])})
+    target = np.array([[True], [True], [False], [False]])
+    result = simulate(panel, target, commission=0.001, stamp_tax=0.0)
+    # 第2日开盘买入，第3日盘中上涨5%，第4日开盘卖出
+    assert np.allclose(result.returns, [0.0, -0.001, 0.05, -0.001])
+    assert result.stats["trades"] == 2
+
+
+def test_sweep_ranks_parameter_grid():
+    """测试参数扫描覆盖全部组合并排序，单进程与进程池结果一致"""
+    rng = np.random.default_rng(0)
+    frames = {code: make_frame(10 * np.cumprod(1 + rng.normal(0, 0.02, 200))) for code in TEST_CODES}
+    panel = panel_from_frames(frames)
+    grid = {"fast": [3, 5], "slow": [10, 20]}
+    serial = sweep(panel, "ma_cross", grid, processes=1)
+    assert len(serial) == 4
+    sharpes = [stats["sharpe"] for _, stats in serial]
+    assert sharpes == sorted(sharpes, reverse=True)
+    assert sweep(panel, "ma_cross", grid, processes=2) == serial
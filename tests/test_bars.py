@@ -0,0 +1,65 @@
+"""
+多周期K线金字塔测试
+"""
+import pandas as pd
+
+from src.bars import BarPyramid, parse_klines
+
+# 测试数据常量
+TEST_STOCK_CODE = "sz002230"
+TEST_DAYS = ["2024-05-06", "2024-05-07", "2024-05-08"]
+
+
+def make_intraday() -> pd.DataFrame:
+    """生成三个交易日的5分钟K线"""
+    times = []
+    for day in TEST_DAYS:
+        times.extend(pd.date_range(f"{day} 09:35", f"{day} 11:30", freq="5min"))
+        times.extend(pd.date_range(f"{day} 13:05", f"{day} 15:00", freq="5min"))
+    index = pd.DatetimeIndex(times, name="date")
+    close = pd.Series(range(len(index)), index=index, dtype=float) + 10
+    return pd.DataFrame({
+        "open": close - 0.5,
+        "close": close,
+        "high": close + 1,
+        "low": close - 1,
+        "volume": 100.0,
+    }, index=index)
+
+
+def test_parse_klines():
+    """测试K线字符串解析"""
+    df = parse_klines([
+        "2024-05-06 09:35,10.0,10.5,10.8,9.9,1200,12600.0",
+        "2024-05-06 09:40,10.5,10.2,10.6,10.1,800,8200.0",
+    ])
+    assert list(df.columns) == ["open", "close", "high", "low", "volume", "amount"]
+    assert df.index[1] == pd.Timestamp("2024-05-06 09:40")
+    assert df["close"].iloc[0] == 10.5
+
+
+def test_intraday_levels_follow_trading_sessions():
+    """测试60分钟K线按交易时段对齐"""
+    pyramid = BarPyramid(TEST_STOCK_CODE)
+    pyramid.load(intraday=make_intraday(), resolution=5)
+
+    hourly = pyramid.last_session("60m")
+    labels = [t.strftime("%H:%M") for t in hourly.index]
+    assert labels == ["10:30", "11:30", "14:00", "15:00"]
+    assert (hourly["volume"] == 1200).all()
+    assert len(pyramid.level("30m")) == 8 * len(TEST_DAYS)
+
+
+def test_daily_derived_from_intraday():
+    """测试由分钟K线聚合日K线"""
+    intraday = make_intraday()
+    pyramid = BarPyramid(TEST_STOCK_CODE)
+    pyramid.load(intraday=intraday, resolution=5)
+
+    daily = pyramid.level("daily")
+    first_day = intraday.loc[TEST_DAYS[0]]
+    assert len(daily) == len(TEST_DAYS)
+    assert daily["open"].iloc[0] == first_day["open"].iloc[0]
+    assert daily["close"].iloc[0] == first_day["close"].iloc[-1]
+    assert daily["high"].iloc[0] == first_day["high"].max()
+    assert pyramid.level("weekly").index[-1] == pd.Timestamp(TEST_DAYS[-1])
@@ -0,0 +1,59 @@
+"""
+共享内存行情看板测试
+"""
+import uuid
+
+import pytest
+
+from src import fetch
+from src.board import QUOTE_HOST, QuoteBoard
+from src.quotes import parse_sina
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+TEST_QUOTE = {
+    "code": TEST_CODE, "name": "浦发银行", "open": 10.0, "prev_close": 9.9, "price": 10.1,
+    "high": 10.2, "low": 9.8, "bid": 10.09, "ask": 10.1, "volume": 1234500.0,
+    "amount": 12467000.0, "bids": [(10.09, 100.0)] * 5, "asks": [(10.1, 150.0)] * 5,
+    "date": "2024-01-02", "time": "15:00:00",
+}
+
+
+@pytest.fixture
+def board():
+    board = QuoteBoard.create(f"stock_test_{uuid.uuid4().hex[:8]}", capacity=16)
+    yield board
+    board.unlink()
+    board.close()
+
+
+def test_reader_sees_published_quotes(board):
+    """测试只读挂载方读取发布的行情"""
+    board.publish({TEST_CODE: TEST_QUOTE})
+    reader = QuoteBoard.attach(board._shm.name)
+    quote = reader.read(TEST_CODE)
+    assert quote["name"] == "浦发银行"
+    assert quote["price"] == 10.1
+    assert quote["bids"][0] == (10.09, 100.0)
+    assert reader.read("sz000001") is None
+    with pytest.raises(PermissionError):
+        reader.publish({TEST_CODE: TEST_QUOTE})
+
+    board.publish({TEST_CODE: dict(TEST_QUOTE, price=10.3)})
+    assert reader.read(TEST_CODE)["price"] == 10.3
+    assert reader.values()[0, 2] == 10.3
+    reader.close()
+
+
+def test_fetch_serves_sina_requests_from_board(board):
+    """测试行情请求改从看板读取，响应可按新浪格式解析"""
+    board.publish({TEST_CODE: TEST_QUOTE})
+    fetch.serve_locally(QUOTE_HOST, board.response)
+    try:
+        response = fetch.get(f"http://{QUOTE_HOST}/list={TEST_CODE},s_{TEST_CODE}")
+    finally:
+        fetch.serve_locally(QUOTE_HOST, None)
+    quote = parse_sina(response.text)[TEST_CODE]
+    assert quote["price"] == 10.1
+    assert quote["asks"][0] == (10.1, 150.0)
+    assert f'var hq_str_s_{TEST_CODE}="浦发银行,10.100,0.200,2.02' in response.text
@@ -0,0 +1,55 @@
+"""
+行情解析和看板测试
+"""
+from io import StringIO
+
+from rich.console import Console
+
+from src.dashboard import Dashboard, QuotePoller
+from src.quotes import parse_sina, quote_url
+
+# 测试数据常量
+TEST_CODES = ["sh600000", "sz000001"]
+TEST_FIELDS = ("浦发银行,10.00,9.90,10.10,10.20,9.80,10.09,10.10,1234500,12467000.00,"
+               "100,10.09,200,10.08,300,10.07,400,10.06,500,10.05,"
+               "150,10.10,250,10.11,350,10.12,450,10.13,550,10.14,2024-01-02,15:00:00,00")
+TEST_TEXT = (f'var hq_str_sh600000="{TEST_FIELDS}";\n'
+             'var hq_str_sz000001="";\n')
+
+
+def test_parse_sina_batch():
+    """测试批量解析行情和五档盘口"""
+    assert quote_url(TEST_CODES) == "http://hq.sinajs.cn/list=sh600000,sz000001"
+    quotes = parse_sina(TEST_TEXT)
+    assert list(quotes) == ["sh600000"]
+    quote = quotes["sh600000"]
+    assert quote["price"] == 10.10
+    assert quote["change"] == 0.2
+    assert quote["bids"][0] == (10.09, 100.0)
+    assert quote["asks"][4] == (10.14, 550.0)
+    assert quote["time"] == "15:00:00"
+
+
+def test_dashboard_repaints_changed_cells_only():
+    """测试看板只重绘变化的单元格"""
+    output = StringIO()
+    console = Console(file=output, force_terminal=True, width=120, height=40)
+    dashboard = Dashboard(TEST_CODES, console=console)
+    quote = parse_sina(TEST_TEXT)["sh600000"]
+
+    first = dashboard.update({"sh600000": quote})
+    assert first > 0
+    assert dashboard.update({"sh600000": quote}) == 0
+    assert dashboard.update({"sh600000": dict(quote, volume=quote["volume"] + 100)}) == 1
+    assert "浦发银行" in output.getvalue()
+    assert "-7.7%" in output.getvalue()  # 委比
+
+
+def test_poller_forwards_changed_quotes():
+    """测试轮询器只回调变化的行情"""
+    received = []
+    quotes = parse_sina(TEST_TEXT)
+    poller = QuotePoller(TEST_CODES, received.append, fetcher=lambda codes: quotes)
+    poller.poll_once()
+    poller.poll_once()
+    assert received == [quotes]
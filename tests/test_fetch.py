@@ -0,0 +1,211 @@
+"""
+网络请求公共模块测试
+"""
+import threading
+import time
+
+import pytest
+import requests
+
+from src import fetch
+from src.fetch import (
+    HEDGE_MIN_SAMPLES,
+    AdaptiveConcurrency,
+    CircuitBreaker,
+    CircuitOpenError,
+    FetchPolicy,
+    SingleFlight,
+    TokenBucket,
+    request_key,
+)
+
+# 测试数据常量
+TEST_KLINE_URL = "http://push2his.eastmoney.com/api/qt/stock/kline/get?secid=0.002230&klt=101&lmt=30"
+TEST_CONCURRENCY = 5
+TEST_HOST = "hq.sinajs.cn"
+
+
+def test_request_key_normalizes_params():
+    """测试请求键与参数顺序和主机名大小写无关"""
+    reordered = "http://PUSH2HIS.eastmoney.com/api/qt/stock/kline/get?lmt=30&klt=101&secid=0.002230"
+    assert request_key(TEST_KLINE_URL) == request_key(reordered)
+    assert request_key(TEST_KLINE_URL) != request_key(TEST_KLINE_URL.replace("lmt=30", "lmt=60"))
+
+
+def test_concurrent_calls_are_coalesced():
+    """测试相同键的并发调用只执行一次"""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+
+    def slow_fetch():
+        executions.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return "payload"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", slow_fetch)))
+    leader.start()
+    started.wait(timeout=5)
+
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("key", slow_fetch)))
+        for _ in range(TEST_CONCURRENCY - 1)
+    ]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["dedup_hits"] < TEST_CONCURRENCY - 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(timeout=5)
+
+    assert len(executions) == 1
+    assert results == ["payload"] * TEST_CONCURRENCY
+    stats = flight.stats()
+    assert stats["upstream"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_errors_are_shared_and_not_cached():
+    """测试错误会传递给调用方，且不会缓存失败结果"""
+    flight = SingleFlight()
+
+    def failing():
+        raise ConnectionError("boom")
+
+    with pytest.raises(ConnectionError):
+        flight.do("key", failing)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_policy_retries_then_succeeds():
+    """测试失败后退避重试"""
+    policy = FetchPolicy(retries=2, backoff=0.001)
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 2:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert policy.execute("key", TEST_HOST, flaky) == "ok"
+    assert len(attempts) == 2
+    assert policy.stats()["retries"] == 1
+
+
+def test_policy_hedges_slow_requests():
+    """测试超过p95延迟时发出对冲请求"""
+    policy = FetchPolicy(hedge_min_delay=0.01)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy.latency.record(TEST_HOST, 0.01)
+    calls = []
+
+    def first_call_stalls(timeout):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1)
+            return "slow"
+        return "fast"
+
+    # 未对冲时只能等到第一次请求返回"slow"
+    assert policy.execute("key", TEST_HOST, first_call_stalls) == "fast"
+    assert len(calls) == 2
+    assert policy.stats()["hedged"] == 1
+
+
+def test_policy_deadline_bounds_stalled_request():
+    """测试请求卡住时在截止时间内返回"""
+    policy = FetchPolicy(retries=0)
+
+    def stalled(timeout):
+        time.sleep(1)
+
+    # 请求本身最终会正常返回None，只有截止时间生效才会抛出超时
+    with pytest.raises(TimeoutError):
+        policy.execute("key", TEST_HOST, stalled, deadline=0.05)
+
+
+def test_breaker_opens_and_serves_last_known():
+    """测试连续失败后熔断，熔断期间返回最近一次成功的结果"""
+    policy = FetchPolicy(retries=0, backoff=0.001, breaker_failures=2)
+    assert policy.execute("key", TEST_HOST, lambda timeout: "last") == "last"
+
+    calls = []
+
+    def failing(timeout):
+        calls.append(1)
+        raise ConnectionError("down")
+
+    for _ in range(2):
+        assert policy.execute("key", TEST_HOST, failing) == "last"
+    assert policy.breaker(TEST_HOST).state == CircuitBreaker.OPEN
+
+    assert policy.execute("key", TEST_HOST, failing) == "last"
+    assert len(calls) == 2
+    with pytest.raises(CircuitOpenError):
+        policy.execute("other", TEST_HOST, failing)
+
+
+def test_token_bucket_limits_rate():
+    """测试令牌桶在突发容量用完后按速率放行"""
+    bucket = TokenBucket(rate=100.0, burst=2.0)
+    assert bucket.acquire(timeout=0)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.005
+
+
+def test_aimd_increases_when_healthy_and_backs_off_on_overload():
+    """测试并发数在健康时加性增加、限流时乘性减少"""
+    controller = AdaptiveConcurrency(initial=2, maximum=8)
+    for _ in range(20):
+        assert controller.acquire(timeout=0)
+        controller.release(latency=0.05, ok=True)
+    assert controller.limit > 2
+
+    grown = controller.limit
+    assert controller.acquire(timeout=0)
+    controller.release(latency=0.05, ok=False, overloaded=True)
+    assert controller.limit < grown
+
+
+def test_get_backs_off_on_rate_limited_response(monkeypatch):
+    """测试上游返回429时主机并发数乘性减少"""
+    def rate_limited(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 429
+        response._content = b""
+        return response
+
+    monkeypatch.setattr(fetch.requests, "get", rate_limited)
+    monkeypatch.setattr(fetch, "policy", FetchPolicy(retries=0))
+    url = "http://rate-limited.example/api"
+    before = fetch.limiter("rate-limited.example").concurrency._limit
+    with pytest.raises(requests.HTTPError):
+        fetch.get(url)
+    assert fetch.limiter("rate-limited.example").concurrency._limit < before
+
+
+def test_share_rates_splits_host_budget(monkeypatch):
+    """测试多进程轮询时每个进程只使用主机速率的一部分"""
+    monkeypatch.setattr(fetch, "_limiters", {})
+    monkeypatch.setattr(fetch, "_rate_share", 1.0)
+    existing = fetch.limiter(TEST_HOST)
+    fetch.share_rates(4)
+    assert existing.bucket.rate == fetch.HOST_RATES[TEST_HOST] / 4
+    assert fetch.limiter("other.example").bucket.rate == fetch.DEFAULT_RATE / 4
+
+
+def test_aimd_blocks_at_limit():
+    """测试达到并发上限后新的请求需要等待"""
+    controller = AdaptiveConcurrency(initial=1)
+    assert controller.acquire(timeout=0)
+    assert not controller.acquire(timeout=0.01)
+    controller.release(latency=0.05, ok=True)
+    assert controller.acquire(timeout=0)
@@ -0,0 +1,45 @@
+"""
+基本面数据模块测试
+"""
+import json
+import threading
+from datetime import date
+
+from src.fundamentals import DATE_KEY, FundamentalsProvider, load_source
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+TEST_FUNDAMENTALS = {"pe_ratio": 5.1, "market_cap": 2300.0, "eps": 1.2}
+
+
+def test_get_never_blocks_and_refreshes_in_background(tmp_path):
+    """测试查询立即返回，后台刷新后写入缓存"""
+    cache_path = tmp_path / "fundamentals.json"
+    calls = []
+    provider = FundamentalsProvider(str(cache_path),
+                                    fetcher=lambda code: calls.append(code) or TEST_FUNDAMENTALS)
+    refreshed = threading.Event()
+    refresh = provider.refresh
+    provider.refresh = lambda code: (refresh(code), refreshed.set())[0]
+    assert provider.get(TEST_CODE) == {}
+    assert refreshed.wait(5)
+    assert provider.get(TEST_CODE) == TEST_FUNDAMENTALS
+    assert calls == [TEST_CODE]
+
+    saved = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert saved[TEST_CODE][DATE_KEY] == date.today().isoformat()
+
+
+def test_stale_cache_and_offline_source(tmp_path):
+    """测试过期缓存仍可读取，离线文件提供缺失字段"""
+    cache_path = tmp_path / "fundamentals.json"
+    cache_path.write_text(json.dumps({TEST_CODE: dict(TEST_FUNDAMENTALS, **{DATE_KEY: "2000-01-01"})}),
+                          encoding="utf-8")
+    source_path = tmp_path / "basics.csv"
+    source_path.write_text("code,week52_high,profile\nsh600000,12.5,银行\n", encoding="utf-8")
+    assert load_source(str(source_path)) == {TEST_CODE: {"week52_high": 12.5, "profile": "银行"}}
+
+    provider = FundamentalsProvider(str(cache_path), str(source_path), fetcher=None)
+    info = provider.get(TEST_CODE)
+    assert info["pe_ratio"] == 5.1
+    assert info["week52_high"] == 12.5
@@ -0,0 +1,84 @@
+"""
+本地行情网关测试
+"""
+import asyncio
+import base64
+import json
+import os
+
+from src.gateway import Gateway, encode_frame, read_frame
+from src.quotes import parse_sina
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+
+
+def make_quote(price):
+    return {"code": TEST_CODE, "name": "浦发银行", "open": 10.0, "prev_close": 10.0, "price": price,
+            "high": 10.5, "low": 9.8, "bid": price, "ask": price, "volume": 1000.0, "amount": 1e4,
+            "change": round(price - 10.0, 3), "change_pct": round((price - 10.0) * 10, 2),
+            "date": "2024-01-02", "time": "15:00:00"}
+
+
+async def http_get(port, target):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return head.decode(), body
+
+
+def test_gateway_serves_many_clients_with_one_upstream_call():
+    """测试多个HTTP客户端共享一次上游请求，K线按查询串缓存"""
+    calls, kline_calls = [], []
+    gateway = Gateway(fetcher=lambda codes: calls.append(codes) or {c: make_quote(10.1) for c in codes},
+                      kline_fetcher=lambda query: kline_calls.append(query) or b'{"data": null}')
+
+    async def scenario():
+        server = await asyncio.start_server(gateway.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            for _ in range(3):
+                head, body = await http_get(port, f"/list={TEST_CODE}")
+                assert head.startswith("HTTP/1.1 200")
+                assert parse_sina(body.decode("gbk"))[TEST_CODE]["price"] == 10.1
+            for _ in range(2):
+                _, body = await http_get(port, "/api/qt/stock/kline/get?secid=1.600000&klt=101")
+                assert body == b'{"data": null}'
+            head, _ = await http_get(port, "/unknown")
+            assert head.startswith("HTTP/1.1 404")
+
+    asyncio.run(scenario())
+    assert calls == [[TEST_CODE]]
+    assert kline_calls == ["secid=1.600000&klt=101"]
+
+
+def test_websocket_pushes_changed_fields_only():
+    """测试WebSocket订阅先收到快照，之后只收到变化的字段"""
+    prices = iter([10.1, 10.2])
+    gateway = Gateway(fetcher=lambda codes: {c: make_quote(next(prices)) for c in codes})
+
+    async def scenario():
+        server = await asyncio.start_server(gateway.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            key = base64.b64encode(os.urandom(16)).decode()
+            writer.write(f"GET /ws HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+            assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 101")
+            message = json.dumps({"op": "subscribe", "codes": [TEST_CODE]}).encode()
+            writer.write(encode_frame(message, mask=True))
+            _, payload = await asyncio.wait_for(read_frame(reader), 5)
+            snapshot = json.loads(payload)
+            assert snapshot["type"] == "snapshot" and snapshot["quote"]["price"] == 10.1
+
+            await gateway.refresh()
+            _, payload = await asyncio.wait_for(read_frame(reader), 5)
+            update = json.loads(payload)
+            assert update["type"] == "update"
+            assert set(update["changes"]) == {"price", "bid", "ask", "change", "change_pct"}
+            writer.close()
+
+    asyncio.run(scenario())
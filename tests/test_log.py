@@ -0,0 +1,44 @@
+"""
+日志模块测试
+"""
+import logging
+import time
+
+from src.log import RateLimitFilter, get_logger, setup
+
+# 测试数据常量
+TEST_MESSAGE = "请求K线数据URL: %s"
+TEST_URL = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
+
+
+def make_record(msg: str = TEST_MESSAGE) -> logging.LogRecord:
+    """构造日志记录"""
+    return logging.LogRecord("stock.test", logging.DEBUG, __file__, 1, msg, (TEST_URL,), None)
+
+
+def test_rate_limit_suppresses_repeats():
+    """测试相同消息在间隔内只输出一次，并在下一次输出时附带忽略条数"""
+    limiter = RateLimitFilter(interval=60)
+    assert limiter.filter(make_record())
+    assert not limiter.filter(make_record())
+    assert not limiter.filter(make_record())
+    assert limiter.filter(make_record("另一条消息 %s"))
+    other = make_record()
+    other.args = ("http://other.example",)
+    assert limiter.filter(other)  # 参数不同(如另一只股票)分别限频
+
+    limiter.interval = 0.001
+    time.sleep(0.01)
+    record = make_record()
+    assert limiter.filter(record)
+    assert "忽略2条" in record.getMessage()
+
+
+def test_debug_disabled_by_level():
+    """测试调试级别关闭时不会生成调试消息"""
+    setup("INFO")
+    logger = get_logger("test")
+    assert not logger.isEnabledFor(logging.DEBUG)
+    setup("DEBUG")
+    assert logger.isEnabledFor(logging.DEBUG)
+    setup("INFO")
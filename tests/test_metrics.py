@@ -0,0 +1,54 @@
+"""
+进程内指标模块测试
+"""
+from src.metrics import MetricsRegistry
+
+# 测试数据常量
+TEST_ENDPOINT = "http://hq.sinajs.cn/list"
+TEST_LATENCIES = [0.004, 0.02, 0.03, 0.2]
+
+
+def test_prometheus_export():
+    """测试导出Prometheus文本格式"""
+    registry = MetricsRegistry()
+    registry.counter("fetch_requests_total", "上游请求次数", endpoint=TEST_ENDPOINT).inc()
+    histogram = registry.histogram("fetch_latency_seconds", endpoint=TEST_ENDPOINT)
+    for latency in TEST_LATENCIES:
+        histogram.observe(latency)
+    registry.register_collector(lambda: {"fetch_dedup_hits_total": 3})
+
+    text = registry.to_prometheus()
+    assert "# TYPE fetch_requests_total counter" in text
+    assert f'fetch_requests_total{{endpoint="{TEST_ENDPOINT}"}} 1.0' in text
+    assert f'fetch_latency_seconds_bucket{{endpoint="{TEST_ENDPOINT}",le="0.025"}} 2' in text
+    assert f'fetch_latency_seconds_bucket{{endpoint="{TEST_ENDPOINT}",le="+Inf"}} 4' in text
+    assert f'fetch_latency_seconds_count{{endpoint="{TEST_ENDPOINT}"}} 4' in text
+    assert "fetch_dedup_hits_total 3.0" in text
+
+
+def test_histogram_quantile_and_summary():
+    """测试分位数估算和汇总表"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("render_seconds", frame="plot_daily_k")
+    for latency in TEST_LATENCIES:
+        histogram.observe(latency)
+    assert histogram.quantile(0.5) == 0.025
+    assert histogram.quantile(0.99) == 0.25
+
+    registry.hit("pyramid_level", True)
+    registry.hit("pyramid_level", False)
+    summary = registry.summary()
+    assert "render_seconds" in summary
+    assert "cache=pyramid_level,result=hit" in summary
+
+
+def test_timed_decorator_records_calls():
+    """测试计时装饰器"""
+    registry = MetricsRegistry()
+
+    @registry.timed("render_seconds", frame="hover")
+    def handler():
+        return "drawn"
+
+    assert handler() == "drawn"
+    assert registry.histogram("render_seconds", frame="hover").count == 1
@@ -0,0 +1,64 @@
+"""
+五档盘口模块测试
+"""
+import numpy as np
+
+from src.orderbook import OrderBook, depth_metrics
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+TEST_SYMBOLS = 5000
+TEST_BIDS = [(10.09, 100.0), (10.08, 200.0), (10.07, 300.0), (10.06, 400.0), (10.05, 500.0)]
+TEST_ASKS = [(10.10, 150.0), (10.11, 250.0), (10.12, 350.0), (10.13, 450.0), (10.14, 550.0)]
+
+
+def test_metrics_from_quote():
+    """测试价差、中间价、委比和加权均价，单边无挂单时价差为NaN"""
+    book = OrderBook([TEST_CODE])
+    assert book.metrics_for(TEST_CODE) == {}
+    rows = book.update({TEST_CODE: {"bids": TEST_BIDS, "asks": TEST_ASKS}})
+    assert rows.tolist() == [0]
+    metrics = book.metrics_for(TEST_CODE)
+    assert np.isclose(metrics["spread"], 0.01)
+    assert np.isclose(metrics["mid"], 10.095)
+    assert np.isclose(metrics["imbalance"], (1500 - 1750) / 3250)
+    volume = [v for _, v in TEST_BIDS + TEST_ASKS]
+    price = [p for p, _ in TEST_BIDS + TEST_ASKS]
+    assert np.isclose(metrics["weighted_price"], np.average(price, weights=volume))
+    assert book.book(TEST_CODE)["asks"][0] == (10.10, 150.0)
+
+    # 涨停：卖盘为空
+    limit_up = {"bids": TEST_BIDS, "asks": [(0.0, 0.0)] * 5}
+    book.update({TEST_CODE: limit_up})
+    metrics = book.metrics_for(TEST_CODE)
+    assert np.isnan(metrics["spread"]) and metrics["imbalance"] == 1.0
+
+
+def test_history_keeps_latest_changes_in_order():
+    """测试盘口未变化时不记历史，历史满后保留最新的若干条"""
+    book = OrderBook([TEST_CODE], history=3)
+    for i in range(5):
+        asks = [(price + i * 0.01, volume) for price, volume in TEST_ASKS]
+        book.update({TEST_CODE: {"bids": TEST_BIDS, "asks": asks}}, now=float(i))
+        assert len(book.update({TEST_CODE: {"bids": TEST_BIDS, "asks": asks}}, now=i + 0.5)) == 0
+    times, depth = book.replay(TEST_CODE)
+    assert times.tolist() == [2.0, 3.0, 4.0]
+    np.testing.assert_allclose(depth[:, 1, 0, 0], [10.12, 10.13, 10.14], rtol=1e-6)
+
+
+def test_full_watchlist_update_recomputes_changed_rows_only():
+    """测试数千只股票一次批量更新，之后只重算和记录盘口变化的股票"""
+    codes = [f"sz{i:06d}" for i in range(TEST_SYMBOLS)]
+    book = OrderBook(codes)
+    depth = np.zeros((TEST_SYMBOLS, 2, 5, 2))
+    depth[:, 0, :, 0] = np.array(TEST_BIDS)[:, 0]
+    depth[:, 1, :, 0] = np.array(TEST_ASKS)[:, 0]
+    depth[..., 1] = np.random.default_rng(0).integers(1, 1000, size=(TEST_SYMBOLS, 2, 5))
+    rows = np.arange(TEST_SYMBOLS)
+    assert len(book.update_depth(rows, depth, now=0.0)) == TEST_SYMBOLS
+    depth[7, 1, 0, 1] += 1
+    assert book.update_depth(rows, depth, now=1.0).tolist() == [7]
+    assert len(book.replay(codes[7])[0]) == 2 and len(book.replay(codes[8])[0]) == 1
+    np.testing.assert_allclose(book.column("imbalance", codes[:3] + ["missing"])[:3],
+                               depth_metrics(depth[:3])[:, 3])
+    assert np.isnan(book.column("spread", ["missing"])[0])
@@ -0,0 +1,63 @@
+"""
+分阶段性能剖析模块测试
+"""
+import time
+import tracemalloc
+
+from src import profiling
+from src.profiling import Profiler
+
+# 测试数据常量
+TEST_SLEEP = 0.01
+
+
+def test_nested_phases_report_and_folded_stacks():
+    """测试嵌套阶段的统计和折叠栈输出"""
+    profiler = Profiler()
+    with profiler.phase("display_stocks"):
+        for _ in range(2):
+            with profiler.phase("fetch:kline"):
+                time.sleep(TEST_SLEEP)
+
+    assert profiler.phases["fetch:kline"].count == 2
+    assert profiler.phases["fetch:kline"].wall >= 2 * TEST_SLEEP
+    assert profiler.phases["display_stocks"].wall >= profiler.phases["fetch:kline"].wall
+
+    folded = dict(line.rsplit(" ", 1) for line in profiler.folded().splitlines())
+    assert set(folded) == {"display_stocks", "display_stocks;fetch:kline"}
+    # 父阶段只记录自身耗时
+    assert int(folded["display_stocks"]) < int(folded["display_stocks;fetch:kline"])
+    assert "fetch:kline" in profiler.report()
+
+
+def test_memory_peak_per_phase():
+    """测试记录阶段内存峰值"""
+    profiler = Profiler(memory=True)
+    with profiler.phase("allocate"):
+        buffer = bytearray(1024 * 1024)
+        del buffer
+    assert profiler.phases["allocate"].peak_memory >= 1024 * 1024
+    assert "内存峰值" in profiler.report()
+    tracemalloc.stop()
+
+
+def test_nested_phase_keeps_outer_memory_peak():
+    """测试嵌套阶段不会清掉外层阶段已记录的内存峰值"""
+    profiler = Profiler(memory=True)
+    with profiler.phase("outer"):
+        buffer = bytearray(4 * 1024 * 1024)
+        del buffer
+        with profiler.phase("inner"):
+            buffer = bytearray(1024 * 1024)
+            del buffer
+    assert profiler.phases["inner"].peak_memory >= 1024 * 1024
+    assert profiler.phases["outer"].peak_memory >= 4 * 1024 * 1024
+    tracemalloc.stop()
+
+
+def test_module_phase_is_noop_when_inactive():
+    """测试未启用剖析时阶段记录不产生任何数据"""
+    assert profiling.active is None
+    with profiling.phase("idle"):
+        pass
+    assert profiling.active is None
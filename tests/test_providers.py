@@ -0,0 +1,120 @@
+"""
+数据源模块测试
+"""
+import pandas as pd
+import pytest
+
+from src.providers import (CacheProvider, ChainProvider, EastmoneyProvider, FileProvider, Provider,
+                           ProviderError, SinaProvider)
+from src.quotes import format_sina
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+TEST_QUOTE = {
+    "code": TEST_CODE, "name": "浦发银行", "open": 10.0, "prev_close": 10.0, "price": 10.5,
+    "high": 10.6, "low": 9.9, "bid": 10.49, "ask": 10.5, "volume": 1000.0, "amount": 10500.0,
+    "bids": [], "asks": [], "date": "2024-01-02", "time": "15:00:00", "change": 0.5, "change_pct": 5.0,
+}
+
+
+def make_bars(days=5):
+    """生成测试日K线"""
+    index = pd.DatetimeIndex(pd.date_range("2024-01-01", periods=days), name="date")
+    close = pd.Series(range(10, 10 + days), index=index, dtype=float)
+    return pd.DataFrame({"open": close - 0.5, "close": close, "high": close + 1,
+                         "low": close - 1, "volume": 100.0}, index=index)
+
+
+class CountingProvider(Provider):
+    """记录调用次数的测试数据源"""
+
+    def __init__(self):
+        self.calls = []
+
+    def quotes(self, codes):
+        self.calls.append(("quotes", list(codes)))
+        return {code: dict(TEST_QUOTE, code=code) for code in codes}
+
+    def bars(self, code, period="daily", limit=30):
+        self.calls.append(("bars", limit))
+        return make_bars(limit)
+
+
+def test_sina_provider_maps_index_codes():
+    """测试新浪数据源按请求的代码返回行情，指数代码按完整格式请求"""
+    urls = []
+
+    def transport(url):
+        urls.append(url)
+        return format_sina(["sh600000", "sh000001"], {"sh600000": TEST_QUOTE, "sh000001": TEST_QUOTE})
+
+    quotes = SinaProvider("http://gateway", transport).quotes([TEST_CODE, "s_sh000001"])
+    assert urls == ["http://gateway/list=sh600000,sh000001"]
+    assert set(quotes) == {TEST_CODE, "s_sh000001"}
+    assert quotes["s_sh000001"]["price"] == 10.5
+
+
+def test_cache_provider_reuses_fresh_entries():
+    """测试缓存只向上游请求缺失的行情，K线按已缓存的数量截取"""
+    upstream = CountingProvider()
+    cache = CacheProvider(upstream)
+    cache.quotes([TEST_CODE])
+    cache.quotes([TEST_CODE, "sz000001"])
+    assert upstream.calls == [("quotes", [TEST_CODE]), ("quotes", ["sz000001"])]
+
+    upstream.calls.clear()
+    assert len(cache.bars(TEST_CODE, "daily", 10)) == 10
+    assert len(cache.bars(TEST_CODE, "daily", 5)) == 5
+    assert len(cache.bars(TEST_CODE, "daily", 20)) == 20
+    assert upstream.calls == [("bars", 10), ("bars", 20)]
+
+
+def test_eastmoney_factors_reuse_raw_bars(monkeypatch):
+    """测试已有不复权日K线时只下载同样长度的前复权日K线"""
+    calls = []
+
+    def bars(code, period="daily", limit=30, fqt=0):
+        calls.append((fqt, limit))
+        df = make_bars(5)
+        if fqt:
+            df.loc[df.index[:2], "close"] *= 0.5
+        return df
+
+    provider = EastmoneyProvider()
+    monkeypatch.setattr(provider, "bars", bars)
+    factors = CacheProvider(provider).factors(TEST_CODE, make_bars(5))
+    assert [day for day, _ in factors] == ["2024-01-03"]
+    assert calls == [(1, 5)]
+
+
+def test_file_provider_round_trip(tmp_path):
+    """测试本地文件数据源保存、读取K线，并由日K线推算行情"""
+    files = FileProvider(str(tmp_path))
+    files.save_bars(TEST_CODE, "daily", make_bars())
+    assert files.codes() == [TEST_CODE]
+    pd.testing.assert_frame_equal(files.bars(TEST_CODE, "daily", 5), make_bars(), check_freq=False)
+
+    quote = files.quotes([TEST_CODE, "sz000001"])
+    assert list(quote) == [TEST_CODE]
+    assert quote[TEST_CODE]["price"] == 14.0
+    assert quote[TEST_CODE]["prev_close"] == 13.0
+
+
+def test_chain_falls_through_on_errors(tmp_path):
+    """测试数据源链在前面的数据源失败时依次向后尝试"""
+    class Broken(Provider):
+        def quotes(self, codes):
+            raise OSError("network down")
+
+    files = FileProvider(str(tmp_path))
+    files.save_bars(TEST_CODE, "daily", make_bars())
+    chain = ChainProvider(Broken(), files, CountingProvider())
+    quotes = chain.quotes([TEST_CODE, "sz000001"])
+    assert quotes[TEST_CODE]["price"] == 14.0
+    assert quotes["sz000001"]["name"] == "浦发银行"
+    assert len(chain.bars(TEST_CODE, "daily", 3)) == 3
+    assert chain.bars(TEST_CODE, "60m", 3).equals(make_bars(3))
+    assert chain.fundamentals(TEST_CODE) == {}
+
+    with pytest.raises(ProviderError):
+        files.fundamentals(TEST_CODE)
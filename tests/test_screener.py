@@ -0,0 +1,57 @@
+"""
+选股模块测试
+"""
+import numpy as np
+import pandas as pd
+
+from src.providers import FileProvider, _tail_lines
+from src.screener import gap, ma_cross, new_high, screen, volume_spike
+
+
+def make_frame(closes, volumes=None, end="2024-06-28"):
+    """由收盘价生成日K线"""
+    closes = np.asarray(closes, dtype=float)
+    index = pd.DatetimeIndex(pd.bdate_range(end=end, periods=len(closes)), name="date")
+    volumes = np.full(len(closes), 1000.0) if volumes is None else np.asarray(volumes, dtype=float)
+    return pd.DataFrame({"open": closes, "close": closes, "high": closes + 0.1, "low": closes - 0.1,
+                         "volume": volumes}, index=index)
+
+
+def make_archive(tmp_path):
+    """生成包含四只股票的本地K线目录"""
+    files = FileProvider(str(tmp_path))
+    flat = np.full(300, 10.0)
+    files.save_bars("sh600000", "daily", make_frame(np.append(flat[:-1], 12.0)))  # 新高
+    files.save_bars("sz000001", "daily", make_frame(flat, np.append(np.full(299, 100.0), 500.0)))  # 放量
+    files.save_bars("sz000002", "daily", make_frame(np.append(flat[:-1], 11.0), end="2024-06-27"))  # 停牌
+    files.save_bars("sh600001", "daily", make_frame(np.arange(30, 0, -1.0)[:29].tolist() + [100.0]))  # 金叉
+    return files
+
+
+def test_tail_lines_reads_only_last_rows(tmp_path):
+    """测试从CSV末尾读取指定行数"""
+    path = tmp_path / "bars.csv"
+    path.write_text("date,close\n" + "".join(f"2024-01-{i:02d},{i}\n" for i in range(1, 29)))
+    assert _tail_lines(str(path), 2) == b"date,close\n2024-01-27,27\n2024-01-28,28\n"
+    assert _tail_lines(str(path), 100).count(b"\n") == 29
+
+
+def test_new_high_requires_full_window():
+    """测试只有一根K线的新股和历史不足的股票不算新高"""
+    high = np.full((4, 2), np.nan)
+    high[:, 0] = [9.0, 9.5, 9.8, 10.0]
+    high[-1, 1] = 10.0
+    met, _ = new_high(3).evaluate({"high": high, "close": high + 1})
+    assert met.tolist() == [True, False]
+
+
+def test_screen_conditions(tmp_path):
+    """测试各选股条件和停牌股票过滤"""
+    files = make_archive(tmp_path)
+    assert [row["code"] for row in screen(files, [new_high()])] == ["sh600000"]  # sh600001不足250日
+    spikes = screen(files, [volume_spike(3)])
+    assert [row["code"] for row in spikes] == ["sz000001"]
+    assert spikes[0]["放量3倍"] == 5.0
+    assert [row["code"] for row in screen(files, [ma_cross(5, 20)])] == ["sh600001", "sh600000"]
+    assert [row["code"] for row in screen(files, [gap(0.05)])] == ["sh600001", "sh600000"]
+    assert screen(files, [new_high(), volume_spike(3)]) == []
@@ -0,0 +1,68 @@
+"""
+多进程分片轮询测试
+"""
+import os
+import threading
+
+import numpy as np
+
+from src.sharding import QUOTE_COLUMNS, QUOTES_MESSAGE, ROW_WIDTH, ShardedPoller, partition
+
+# 测试数据常量
+TEST_CODES = [f"sh{600000 + i}" for i in range(40)]
+TEST_BIDS = [(9.99, 100.0)] * 5
+TEST_ASKS = [(10.0, 200.0)] * 5
+CRASH_MARKER_ENV = "STOCK_TEST_SHARD_MARKER"
+
+
+def fake_fetcher(codes, batch_size):
+    """返回固定行情；标记文件不存在时先创建它再让子进程崩溃一次"""
+    marker = os.environ.get(CRASH_MARKER_ENV)
+    if marker and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return {code: dict({column: 10.0 for column in QUOTE_COLUMNS}, name=code, prev_close=9.0,
+                       bids=TEST_BIDS, asks=TEST_ASKS)
+            for code in codes}
+
+
+def test_partition_is_deterministic():
+    """测试分片结果稳定且覆盖全部代码"""
+    shards = partition(TEST_CODES, 4)
+    assert shards == partition(list(TEST_CODES), 4)
+    assert sorted(code for shard in shards for code in shard) == sorted(TEST_CODES)
+
+
+def test_apply_reports_changed_rows_only():
+    """测试父进程只回报变化的行"""
+    poller = ShardedPoller(TEST_CODES, lambda quotes: None, processes=2)
+    rows = len(poller.shards[0])
+    block = np.full((rows, ROW_WIDTH), 10.0)
+    assert len(poller.apply(0, QUOTES_MESSAGE + block.tobytes())) == rows
+    assert poller.apply(0, QUOTES_MESSAGE + block.tobytes()) == {}
+    block[0, QUOTE_COLUMNS.index("price")] = 11.0
+    changed = poller.apply(0, QUOTES_MESSAGE + block.tobytes())
+    assert list(changed) == [poller.shards[0][0]]
+    assert changed[poller.shards[0][0]]["price"] == 11.0
+
+
+def test_supervisor_restarts_crashed_shard(tmp_path, monkeypatch):
+    """测试分片子进程崩溃后被重启并继续发布行情"""
+    monkeypatch.setenv(CRASH_MARKER_ENV, str(tmp_path / "crashed"))
+    received = {}
+    done = threading.Event()
+
+    def on_update(quotes):
+        received.update(quotes)
+        if len(received) == len(TEST_CODES):
+            done.set()
+
+    poller = ShardedPoller(TEST_CODES, on_update, interval=0.1, processes=2, fetcher=fake_fetcher)
+    poller.start()
+    try:
+        assert done.wait(30)
+    finally:
+        poller.stop()
+    assert sum(poller.restarts) == 1
+    assert received[TEST_CODES[0]]["change"] == 1.0
+    assert received[TEST_CODES[0]]["bids"] == TEST_BIDS  # 五档盘口经矩阵传回
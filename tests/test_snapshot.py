@@ -0,0 +1,33 @@
+"""
+状态快照模块测试
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import snapshot
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """测试状态和K线表保存后可原样读回，再次保存会替换旧快照"""
+    index = pd.DatetimeIndex(pd.bdate_range("2024-01-02", periods=5), name="date")
+    df = pd.DataFrame({"open": np.arange(5.0), "close": np.arange(5.0) + 0.5, "volume": [1, 2, 3, 4, 5]},
+                      index=index)
+    path = str(tmp_path / "main")
+    state = {"codes": ["sh600000"], "current_prices": {"sh600000": np.float64(10.5)}}
+
+    snapshot.save(path, state, {"sh600000": df})
+    loaded_state, frames = snapshot.load(path)
+    assert loaded_state == {"codes": ["sh600000"], "current_prices": {"sh600000": 10.5}}
+    pd.testing.assert_frame_equal(frames["sh600000"], df.astype(float), check_freq=False)
+    assert not np.asarray(frames["sh600000"]["close"]).flags.writeable  # 直接引用只读的内存映射，未复制
+
+    snapshot.save(path, state, {})
+    assert snapshot.load(path)[1] == {}
+    assert sorted(os.listdir(tmp_path)) == ["main"]
+
+
+def test_missing_snapshot(tmp_path):
+    """测试没有快照时返回None"""
+    assert snapshot.load(str(tmp_path / "none")) is None
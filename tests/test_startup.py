@@ -0,0 +1,39 @@
+"""
+启动流水线测试
+"""
+import threading
+
+from src.startup import StartupPipeline
+
+
+def thread_submit(func, args):
+    """每个任务一个线程"""
+    threading.Thread(target=func, args=args, daemon=True).start()
+
+
+def test_results_arrive_as_ready():
+    """测试结果按完成顺序取出，慢任务不阻塞快任务，出错的任务结果为None"""
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'slow'
+
+    def fail():
+        raise RuntimeError("boom")
+
+    pipeline = StartupPipeline(thread_submit)
+    pipeline.start([('kline', 'a', slow, ()), ('quote', 0, lambda: 'fast', ()), ('quote', 1, fail, ())])
+    assert pipeline.pending() == 3
+
+    first = []
+    while pipeline.pending('quote'):
+        first += pipeline.drain(block=True)
+    assert sorted(first, key=repr) == [('quote', 0, 'fast'), ('quote', 1, None)]
+    assert pipeline.pending('quote') == 0 and pipeline.pending('kline') == 1
+    assert not pipeline.done
+    assert pipeline.drain() == []
+
+    release.set()
+    assert pipeline.drain(block=True) == [('kline', 'a', 'slow')]
+    assert pipeline.done
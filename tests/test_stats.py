@@ -0,0 +1,55 @@
+"""
+统计缓存模块测试
+"""
+import numpy as np
+import pandas as pd
+
+from src.stats import MARKET_INDEX, StatsCache
+
+# 测试数据常量
+TEST_CODE = "sh600000"
+
+
+def make_bars(returns, start="2023-01-02"):
+    """由日收益率生成日K线"""
+    close = 10 * np.cumprod(1 + np.asarray(returns))
+    index = pd.DatetimeIndex(pd.bdate_range(start, periods=len(close)), name="date")
+    volume = np.arange(1, len(close) + 1, dtype=float)
+    return pd.DataFrame({"open": close, "close": close, "high": close * 1.01, "low": close * 0.99,
+                         "volume": volume}, index=index)
+
+
+def test_incremental_matches_full_window(tmp_path):
+    """测试逐日增量更新与一次性计算结果一致，并可持久化后继续更新"""
+    rng = np.random.default_rng(1)
+    market_returns = rng.normal(0, 0.01, 400)
+    market = make_bars(market_returns)
+    stock = make_bars(2 * market_returns)
+
+    path, state_path = str(tmp_path / "stats.json"), str(tmp_path / "state.npz")
+    cache = StatsCache(path, state_path, window=250)
+    cache.update(MARKET_INDEX, market.iloc[:300])
+    cache.update(TEST_CODE, stock.iloc[:300])
+    cache.save()
+
+    reloaded = StatsCache(path, state_path)
+    assert reloaded.get(TEST_CODE) == cache.get(TEST_CODE)
+    for day in range(300, 400):
+        reloaded.update(MARKET_INDEX, market.iloc[day:day + 1])
+        stats = reloaded.update(TEST_CODE, stock.iloc[:day + 1])
+
+    window = stock.iloc[-250:]
+    assert stats["week52_high"] == round(window["high"].max(), 3)
+    assert stats["week52_low"] == round(window["low"].min(), 3)
+    assert stats["avg_volume"] == window["volume"].iloc[-20:].mean()
+    assert stats["avg_volume60"] == window["volume"].iloc[-60:].mean()
+    assert abs(stats["beta"] - 2.0) < 1e-3
+    expected = stock["close"].pct_change().iloc[-250:].std() * np.sqrt(252)
+    assert abs(stats["volatility"] - expected) < 1e-3
+
+
+def test_get_without_data():
+    """测试没有统计数据时返回空字典"""
+    cache = StatsCache(None, None)
+    assert cache.get(TEST_CODE) == {}
+    assert cache.update(TEST_CODE, pd.DataFrame()) == {}
@@ -0,0 +1,51 @@
+"""
+股票查询工具批量模式测试
+"""
+import csv
+import json
+from io import StringIO
+
+from src.stock_query import StockQuery, iter_codes
+
+# 测试数据常量
+TEST_CODES = [f"sh{600000 + i}" for i in range(25)]
+TEST_BATCH_SIZE = 10
+
+
+def fake_batch(codes):
+    """按代码生成行情，sh600003 模拟缺失"""
+    return {
+        code: {'code': code, 'name': code, 'price': 10.0, 'change': 0.1, 'change_pct': 1.0,
+               'open': 9.9, 'prev_close': 9.9, 'high': 10.1, 'low': 9.8, 'volume': 100.0,
+               'amount': 1000.0, 'date': '2024-01-02', 'time': '15:00:00'}
+        for code in codes if code != "sh600003"
+    }
+
+
+def test_batch_mode_streams_csv():
+    """测试批量并发获取并输出CSV"""
+    query = StockQuery()
+    batches = []
+    query.fetch_batch = lambda codes: batches.append(codes) or fake_batch(codes)
+
+    out = StringIO()
+    count = query.write_records(query.iter_quotes(iter(TEST_CODES), TEST_BATCH_SIZE, workers=2), out)
+    assert count == len(TEST_CODES) - 1
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    rows = list(csv.DictReader(StringIO(out.getvalue())))
+    assert sorted(row['code'] for row in rows) == sorted(set(TEST_CODES) - {"sh600003"})
+
+
+def test_batch_mode_json_and_codes_input(tmp_path):
+    """测试NDJSON输出和从文件读取代码"""
+    path = tmp_path / "codes.txt"
+    path.write_text("SH600001\n\nsh600002,sh600004\n", encoding='utf-8')
+    codes = list(iter_codes(["sh600000"], str(path)))
+    assert codes == ["sh600000", "sh600001", "sh600002", "sh600004"]
+
+    query = StockQuery()
+    query.fetch_batch = fake_batch
+    out = StringIO()
+    query.write_records(query.iter_quotes(codes), out, fmt='json')
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [record['code'] for record in records] == codes
@@ -0,0 +1,30 @@
+"""
+终端实时图表序列测试
+"""
+import numpy as np
+
+from stock_terminal import LiveSeries
+
+
+def test_ticks_aggregate_into_minute_candles():
+    """测试行情逐笔追加时只更新最后一根分钟K线"""
+    series = LiveSeries(capacity=100, period=60)
+    for timestamp, price in [(0, 10.0), (20, 10.5), (59, 9.8), (60, 10.1), (130, 10.3)]:
+        series.append(timestamp, price)
+
+    assert series.snapshot() == (5, 3)
+    np.testing.assert_array_equal(series.starts[:3], [0, 60, 120])
+    np.testing.assert_array_equal(series.candles[0], [10.0, 10.5, 9.8, 9.8])
+    np.testing.assert_array_equal(series.candles[1], [10.1, 10.1, 10.1, 10.1])
+
+
+def test_full_series_drops_oldest_half():
+    """测试容量用完时丢弃较早的一半行情和已完全移出的K线"""
+    series = LiveSeries(capacity=10, period=3)
+    for i in range(11):
+        series.append(float(i), float(i))
+
+    count, candle_count = series.snapshot()
+    np.testing.assert_array_equal(series.times[:count], [5, 6, 7, 8, 9, 10])
+    np.testing.assert_array_equal(series.starts[:candle_count], [3, 6, 9])
+    np.testing.assert_array_equal(series.candles[candle_count - 1], [9, 10, 9, 10])
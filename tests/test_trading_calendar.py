@@ -0,0 +1,52 @@
+"""
+交易日历模块测试
+"""
+from datetime import datetime
+
+import numpy as np
+
+from src.trading_calendar import TradingCalendar
+
+
+def test_sessions_skip_weekends_and_holidays():
+    """测试交易日判断、计数和前后交易日查找"""
+    calendar = TradingCalendar(path=None)
+    assert not calendar.is_session('2024-10-01')
+    assert not calendar.is_session('2024-10-05')
+    assert calendar.is_session('2024-10-08')
+    assert calendar.next_session('2024-09-30') == np.datetime64('2024-10-08')
+    assert calendar.previous_session('2024-10-08') == np.datetime64('2024-09-30')
+    assert calendar.count('2024-09-30', '2024-10-08') == 2
+    assert calendar.count('2024-01-01', '2024-12-31') == 242
+    assert len(calendar.sessions('2024-09-28', '2024-10-09')) == 3
+
+    days = np.array(['2024-10-07', '2024-10-08', '2024-10-09'], dtype='datetime64[D]')
+    np.testing.assert_array_equal(calendar.is_session(days), [False, True, True])
+    np.testing.assert_array_equal(calendar.count(days, np.datetime64('2024-10-31')), [18, 18, 17])
+
+
+def test_open_hours():
+    """测试交易时段和距下一个交易时段开始的时间"""
+    calendar = TradingCalendar(path=None)
+    assert calendar.is_open(datetime(2024, 10, 8, 10, 0))
+    assert not calendar.is_open(datetime(2024, 10, 8, 12, 0))
+    assert calendar.seconds_until_open(datetime(2024, 10, 8, 12, 0)) == 3600
+    assert calendar.seconds_until_open(datetime(2024, 10, 8, 15, 0, 30)) == 0
+    assert calendar.seconds_until_open(datetime(2024, 9, 30, 16, 0)) == (8 * 24 - 16) * 3600 + 9.5 * 3600
+    assert calendar.last_session(datetime(2024, 10, 8, 9, 0)) == np.datetime64('2024-09-30')
+    assert calendar.last_session(datetime(2024, 10, 8, 9, 30)) == np.datetime64('2024-10-08')
+
+
+def test_update_from_index_bars(tmp_path):
+    """测试由指数K线日期推算休市日并持久化"""
+    path = str(tmp_path / "holidays.json")
+    calendar = TradingCalendar(holidays=(), path=path)
+    weekdays = np.arange('2030-01-01', '2030-01-15', dtype='datetime64[D]')
+    weekdays = weekdays[np.is_busday(weekdays)]
+    bars = weekdays[weekdays != np.datetime64('2030-01-07')]
+    assert calendar.update_from_bars(bars) == 1
+
+    reloaded = TradingCalendar(holidays=('2030-01-08',), path=path)
+    assert not reloaded.is_session('2030-01-07')
+    assert reloaded.is_session('2030-01-08')
+    assert reloaded.count('2030-01-01', '2030-01-14') == 9